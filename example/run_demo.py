@@ -31,72 +31,70 @@ SAMPLE_APP_DIR = "./coolstore"
 # 2) Limit to specific rulesets/violations we are interested in
 
 
-def _generate_fix(params: PostGetIncidentSolutionsForFileParams):
-    headers = {"Content-type": "application/json", "Accept": "text/plain"}
+# Seconds between polls of a job's status
+POLL_INTERVAL = 5
+
+
+def _submit_fix(params: PostGetIncidentSolutionsForFileParams) -> str:
+    headers = {"Content-type": "application/json", "Accept": "application/json"}
     response = requests.post(
-        ###
-        # If we are sending only one incident, we can use this endpoint
-        # f"{SERVER_URL}/get_incident_solution",
-        ###
-        f"{SERVER_URL}/get_incident_solutions_for_file",
+        f"{SERVER_URL}/jobs/get_incident_solutions_for_file",
         data=params.model_dump_json(),
         headers=headers,
-        timeout=3600,
+        timeout=60,
     )
-    return response
+    response.raise_for_status()
+    return response.json()["job_id"]
+
+
+def _wait_for_job(job_id: str, file_name: str) -> dict:
+    completed_batches = 0
+    while True:
+        time.sleep(POLL_INTERVAL)
+
+        try:
+            response = requests.get(f"{SERVER_URL}/jobs/{job_id}", timeout=60)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            # The job carries on in the server, so just poll again
+            KAI_LOG.warning(f"[{file_name}] Failed to poll job {job_id}: {e}")
+            continue
+
+        job = response.json()
+
+        progress = job["progress"]
+        if len(progress.get("completed_batches", [])) != completed_batches:
+            completed_batches = len(progress["completed_batches"])
+            KAI_LOG.info(
+                f"[{file_name}] Completed {completed_batches} of {progress['batch_count']} batches"
+            )
+
+        match job["status"]:
+            case "succeeded":
+                return job["result"]
+            case "failed":
+                raise RuntimeError(job["error"])
 
 
-def generate_fix(params: PostGetIncidentSolutionsForFileParams):
+def generate_fix(params: PostGetIncidentSolutionsForFileParams) -> dict:
     retries_left = 6
     for i in range(retries_left):
         try:
-            response = _generate_fix(params)
-            if response.status_code == 200:
-                return response
-            else:
-                KAI_LOG.info(
-                    f"[{params.file_name}] Received status code {response.status_code}"
-                )
+            job_id = _submit_fix(params)
+            KAI_LOG.info(f"[{params.file_name}] Submitted job {job_id}")
+            return _wait_for_job(job_id, params.file_name)
         except requests.exceptions.RequestException as e:
-            KAI_LOG.error(f"[{params.file_name}] Received exception: {e}")
-            # This is what a timeout exception will look like:
-            # requests.exceptions.ReadTimeout: HTTPConnectionPool(host='0.0.0.0', port=8080): Read timed out. (read timeout=600)
+            KAI_LOG.error(f"[{params.file_name}] Failed to submit job: {e}")
+        except RuntimeError as e:
+            KAI_LOG.error(f"[{params.file_name}] Job failed: {e}")
         KAI_LOG.error(
-            f"[{params.file_name}] Failed to get a '200' response from the server.  Retrying {retries_left-i} more times"
+            f"[{params.file_name}] Failed to get a result from the server.  Retrying {retries_left-i} more times"
         )
     sys.exit(
-        f"[{params.file_name}] Failed to get a '200' response from the server.  Parameters = {params}"
+        f"[{params.file_name}] Failed to get a result from the server.  Parameters = {params}"
     )
 
 
-def parse_response(response: requests.Response):
-    try:
-        result = response.json()
-
-        if isinstance(result, str):
-            return json.loads(result)
-        elif isinstance(result, dict):
-            return result
-        else:
-            KAI_LOG.error(f"Unexpected response type: {type(result)}")
-            KAI_LOG.error(f"Response: {response}")
-            sys.exit(1)
-
-    except Exception as e:
-        KAI_LOG.error(f"Failed to parse response with error: {e}")
-        KAI_LOG.error(f"Response: {response}")
-        sys.exit(1)
-
-    ## TODO:  Below is rough guess at error handling, need to confirm
-    # if "error" in response_json:
-    #    print(f"Error: {response_json['error']}")
-    #    return ""
-
-    # TODO: When we are batching incidents we get back a parse result so we dont
-    # need below return
-    # pydantic_models.parse_file_solution_content(response_json["updated_file"])
-
-
 def write_to_disk(file_path: Path, updated_file_contents: dict):
     file_path = str(file_path)  # Temporary fix for Path object
 
@@ -194,10 +192,7 @@ def process_file(
         include_llm_results=True,
     )
 
-    response = generate_fix(params)
-    KAI_LOG.info(f"Response StatusCode: {response.status_code} for {file_path}\n")
-
-    updated_file_contents: dict = parse_response(response)
+    updated_file_contents = generate_fix(params)
     if os.getenv("WRITE_TO_DISK", "").lower() not in ("false", "0", "no"):
         write_to_disk(file_path, updated_file_contents)
 
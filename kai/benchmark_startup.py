@@ -0,0 +1,100 @@
+#!/usr/bin/python3
+
+"""
+Measures how long a server worker takes to start, and how much memory it
+uses once started. Each worker is a fresh interpreter that imports
+`kai.server` and calls `app()`, like a gunicorn worker does.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Run by every worker. Prints its measurements as JSON on the last line.
+WORKER_SCRIPT = """
+import json
+import time
+
+start = time.perf_counter()
+import kai.server
+imported = time.perf_counter()
+kai.server.app()
+ready = time.perf_counter()
+
+rss_kib = 0
+with open("/proc/self/status") as f:
+    for line in f:
+        if line.startswith("VmRSS:"):
+            rss_kib = int(line.split()[1])
+
+print(
+    json.dumps(
+        {
+            "import_seconds": imported - start,
+            "app_seconds": ready - imported,
+            "rss_mib": rss_kib / 1024,
+            "modules": len(__import__("sys").modules),
+        }
+    )
+)
+"""
+
+
+def run_worker(config_filepath: str | None) -> dict:
+    args = [sys.executable, "-c", WORKER_SCRIPT]
+    if config_filepath is not None:
+        # `kai.server.get_config` parses the worker's own command line
+        args += ["--config_filepath", config_filepath]
+
+    result = subprocess.run(args, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"Worker failed to start:\n{result.stderr}")
+
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--config_filepath",
+        help="Path to the config file the workers start with.",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--workers",
+        help="Number of workers to start, one after the other.",
+        type=int,
+        default=8,
+    )
+    args = parser.parse_args()
+
+    results = [run_worker(args.config_filepath) for _ in range(args.workers)]
+
+    for i, r in enumerate(results, 1):
+        print(
+            f"worker {i}: import {r['import_seconds']:.2f}s, "
+            f"app() {r['app_seconds']:.2f}s, RSS {r['rss_mib']:.1f} MiB, "
+            f"{r['modules']} modules"
+        )
+
+    for key, unit in [
+        ("import_seconds", "s"),
+        ("app_seconds", "s"),
+        ("rss_mib", " MiB"),
+    ]:
+        values = [r[key] for r in results]
+        print(
+            f"{key}: median {statistics.median(values):.2f}{unit}, "
+            f"max {max(values):.2f}{unit}"
+        )
+
+    total_rss = sum(r["rss_mib"] for r in results)
+    print(f"Total RSS of {len(results)} workers: {total_rss:.1f} MiB")
+
+
+if __name__ == "__main__":
+    # example: python kai/benchmark_startup.py --config_filepath kai/config.toml --workers 8
+    main()
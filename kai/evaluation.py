@@ -233,7 +233,7 @@ def evaluate(
 
                 print(f"{example_path} - {config_path}\n{prompt[:15]}...\n")
 
-                llm_result = model_provider.llm.invoke(prompt)
+                llm_result = model_provider.invoke(prompt)
                 content = parse_file_solution_content(
                     src_file_language, llm_result.content
                 )
@@ -127,6 +127,15 @@ class KaiTrace:
             del data["model_provider"]
             f.write(json.dumps(data, indent=4))
 
+    @enabled_check
+    def prompt_budget(self, current_batch_count: int, report: dict):
+        prompt_budget_file_path = os.path.join(
+            self.trace_dir, f"{current_batch_count}", "prompt_budget.json"
+        )
+        os.makedirs(os.path.dirname(prompt_budget_file_path), exist_ok=True)
+        with open(prompt_budget_file_path, "w") as f:
+            f.write(json.dumps(report, indent=4))
+
     @enabled_check
     def llm_result(
         self, current_batch_count: int, retry_count: int, result: BaseMessage
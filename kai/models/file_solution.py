@@ -1,5 +1,11 @@
+import functools
+import hashlib
 import logging
+import os
 import re
+import threading
+from collections import OrderedDict
+from typing import Optional
 
 from pydantic import BaseModel
 from pygments import lexers
@@ -14,20 +20,95 @@ class FileSolutionContent(BaseModel):
     additional_info: str
 
 
-def guess_language(code: str, filename: str = None) -> str:
+# Languages (pygments aliases) of common file types, by lowercased file name
+# or extension. Files with these don't need their contents looked at.
+FILENAME_LANGUAGES = {
+    "pom.xml": "xml",
+}
+EXTENSION_LANGUAGES = {
+    ".java": "java",
+    ".xml": "xml",
+    ".properties": "properties",
+    ".jsp": "jsp",
+    ".xhtml": "html",
+    ".gradle": "groovy",
+    ".groovy": "groovy",
+    ".kt": "kotlin",
+    ".py": "python",
+    ".go": "go",
+    ".cs": "csharp",
+    ".rb": "ruby",
+    ".js": "javascript",
+    ".ts": "typescript",
+    ".json": "json",
+    ".yaml": "yaml",
+    ".yml": "yaml",
+    ".toml": "toml",
+    ".md": "markdown",
+    ".sh": "bash",
+}
+
+# Guesses made by pygments, which are slow, keyed by the file's extension and
+# the sha256 of its contents. Least recently used entries are evicted.
+LANGUAGE_CACHE_SIZE = 1024
+_language_cache: OrderedDict[tuple[str, str], str] = OrderedDict()
+_language_cache_lock = threading.Lock()
+
+
+def guess_language(code: str, filename: Optional[str] = None) -> str:
+    """
+    Returns the pygments alias of the language of `code`, or "unknown". Common
+    file types are recognized by `filename` alone. Otherwise pygments looks at
+    the code, with `filename` narrowing it down if given.
+    """
+    extension = ""
+    if filename:
+        name = os.path.basename(filename).lower()
+        extension = os.path.splitext(name)[1]
+
+        language = FILENAME_LANGUAGES.get(name) or EXTENSION_LANGUAGES.get(extension)
+        if language is not None:
+            KAI_LOG.debug(f"{filename} classified as {language}")
+            return language
+
+    key = (extension, hashlib.sha256(code.encode()).hexdigest())
+
+    with _language_cache_lock:
+        language = _language_cache.get(key)
+        if language is not None:
+            _language_cache.move_to_end(key)
+            return language
+
     try:
         if filename:
             lexer = lexers.guess_lexer_for_filename(filename, code)
             KAI_LOG.debug(f"{filename} classified as {lexer.aliases[0]}")
         else:
             lexer = lexers.guess_lexer(code)
-            KAI_LOG.debug(f"Code content classified as {lexer.aliases[0]}\n{code}")
-        return lexer.aliases[0]
+            KAI_LOG.debug(f"Code content classified as {lexer.aliases[0]}")
+        language = lexer.aliases[0]
+    except ClassNotFound:
+        KAI_LOG.debug(f"Code content for filename {filename} could not be classified")
+        language = "unknown"
+
+    with _language_cache_lock:
+        _language_cache[key] = language
+        while len(_language_cache) > LANGUAGE_CACHE_SIZE:
+            _language_cache.popitem(last=False)
+
+    return language
+
+
+@functools.lru_cache(maxsize=256)
+def fence_language(info: str) -> Optional[str]:
+    """
+    Returns the pygments alias of the language named by a code fence's info
+    string (e.g. "py" for Python), or None if pygments doesn't know it.
+    """
+    try:
+        return lexers.get_lexer_by_name(info).aliases[0]
     except ClassNotFound:
-        KAI_LOG.debug(
-            f"Code content for filename {filename} could not be classified\n{code}"
-        )
-        return "unknown"
+        return None
 
 
 def separate_sections(document):
@@ -57,19 +138,25 @@ def separate_sections(document):
 
 
 def parse_file_solution_content(language: str, content: str) -> FileSolutionContent:
-    code_block_pattern = r"```(?:\w+)?\s+(.+?)```"
+    # The optional info string after the opening fence names the language
+    code_block_pattern = r"```(\w+)?\s+(.+?)```"
 
     sections = separate_sections(content)
     reasoning = sections.get("## Reasoning", "")
     updated_file_content = sections.get("## Updated File", "")
     additional_info = sections.get("## Additional Information", "")
 
-    code_block_matches = re.findall(code_block_pattern, updated_file_content, re.DOTALL)
-
+    code_block_matches: list[str] = []
     matching_blocks = []
-    for block in code_block_matches:
-        guessed_language = guess_language(block)
-        if language == guessed_language:
+    for info, block in re.findall(code_block_pattern, updated_file_content, re.DOTALL):
+        code_block_matches.append(block)
+
+        # Only look at the code if the fence doesn't name a known language
+        block_language = fence_language(info) if info else None
+        if block_language is None:
+            block_language = guess_language(block)
+
+        if language == block_language:
             matching_blocks.append(block)
 
     if matching_blocks:
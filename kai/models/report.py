@@ -5,21 +5,87 @@ import os
 import pathlib
 import shutil
 from io import StringIO, TextIOWrapper
+from typing import Any, Iterator, Optional
 from urllib.parse import urlparse
 
 import yaml
 
-from kai.models.report_types import ExtendedIncident, Incident, RuleSet
+from kai.models.report_types import (
+    ExtendedIncident,
+    Incident,
+    ReportIncident,
+    ReportRuleSet,
+)
 from kai.models.util import remove_known_prefixes
 
 KAI_LOG = logging.getLogger(__name__)
 
+# libyaml's loader is many times faster than the pure Python one, but PyYAML
+# may be built without it
+YAML_LOADER: Any = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def iter_report_rulesets(
+    file_name: str | pathlib.Path, hasher: Optional[Any] = None
+) -> Iterator[dict]:
+    """
+    Yields the rulesets of a report file one at a time, so only one is ever
+    parsed at once. The raw bytes of the file are fed to `hasher` (e.g. a
+    `hashlib` object), if given, as they're read.
+
+    Relies on the layout analyzers write reports in: a top-level sequence
+    whose items start with "- " at the beginning of a line. Any other file is
+    parsed in one go.
+    """
+    with open(file_name, "rb") as f:
+        chunk: list[bytes] = []
+        in_sequence = False
+
+        for line in f:
+            if hasher is not None:
+                hasher.update(line)
+
+            is_item = line.startswith(b"- ") or line.rstrip() == b"-"
+
+            if not in_sequence:
+                stripped = line.strip()
+                if is_item:
+                    in_sequence = True
+                elif stripped and not stripped.startswith((b"#", b"---")):
+                    # Not a sequence of rulesets, so read the rest and parse
+                    # the whole document
+                    rest = f.read()
+                    if hasher is not None:
+                        hasher.update(rest)
+
+                    data = yaml.load(b"".join(chunk) + line + rest, Loader=YAML_LOADER)
+                    yield from [data] if isinstance(data, dict) else data or []
+                    return
+
+            if is_item and chunk:
+                yield from yaml.load(b"".join(chunk), Loader=YAML_LOADER) or []
+                chunk = []
+
+            chunk.append(line)
+
+        if in_sequence and chunk:
+            yield from yaml.load(b"".join(chunk), Loader=YAML_LOADER) or []
+
 
 class Report:
+    """
+    An analysis report. Each ruleset is validated once, as it's added. The
+    incidents of its violations are kept apart, in `incidents`, as compact
+    `ReportIncident`s. The rulesets in `rulesets` are `ReportRuleSet`s, whose
+    violations have no incidents field; use `violation_incidents`.
+    """
+
     def __init__(self, report_data: dict | list[dict], report_id: str):
         self.workaround_counter_for_missing_ruleset_name = 0
         self.report_id = report_id
-        self.rulesets: dict[str, RuleSet] = {}
+        self.rulesets: dict[str, ReportRuleSet] = {}
+        # ruleset name -> violation name -> incidents
+        self.incidents: dict[str, dict[str, list[ReportIncident]]] = {}
 
         if isinstance(report_data, dict):
             self.add_ruleset(report_data)
@@ -50,10 +116,33 @@ class Report:
         return cls(report_data=report_data, report_id=report_id)
 
     @classmethod
-    def load_report_from_file(cls, file_name: str | pathlib.Path):
-        with open(file_name, "r") as f:
-            report: dict = yaml.safe_load(f)
-        report_data = report
+    def load_report_from_file(
+        cls, file_name: str | pathlib.Path, incremental: bool = False
+    ):
+        """
+        Loads a report from a YAML file.
+
+        If `incremental` is set, the report is parsed one ruleset at a time
+        (see `iter_report_rulesets`) and its report_id is the sha256 of the
+        file's bytes, which differs from the report_id of loading the same
+        file otherwise. The parsed YAML of only one ruleset is held at a time
+        and the whole document is never serialized to compute the id, so the
+        memory used on top of the returned Report scales with the largest
+        ruleset. The Report itself still holds every ruleset and its compact
+        incidents; consume `iter_report_rulesets` directly to avoid that.
+        """
+        if incremental:
+            hasher = hashlib.sha256()
+            report = cls([], "")
+
+            for ruleset in iter_report_rulesets(file_name, hasher):
+                report.add_ruleset(ruleset)
+
+            report.report_id = hasher.hexdigest()
+            return report
+
+        with open(file_name, "rb") as f:
+            report_data = yaml.load(f, Loader=YAML_LOADER)
 
         # report_id is the hash of the json.dumps of the report_data
         return cls(
@@ -70,39 +159,76 @@ class Report:
             )
             self.workaround_counter_for_missing_ruleset_name += 1
 
-        ruleset = RuleSet.model_validate(ruleset_dict)
+        violations: dict[str, Any] = {}
+        incidents: dict[str, list[ReportIncident]] = {}
+
+        for violation_name, violation in (ruleset_dict.get("violations") or {}).items():
+            if isinstance(violation, dict):
+                incidents[violation_name] = [
+                    ReportIncident.from_raw(x) for x in violation.get("incidents") or []
+                ]
+                violation = {k: v for k, v in violation.items() if k != "incidents"}
+            violations[violation_name] = violation
+
+        ruleset = ReportRuleSet.model_validate(
+            {**ruleset_dict, "violations": violations}
+        )
         self.rulesets[ruleset.name] = ruleset
+        self.incidents[ruleset.name] = incidents
+
+    def violation_incidents(
+        self, ruleset_name: str, violation_name: str
+    ) -> list[ReportIncident]:
+        return self.incidents.get(ruleset_name, {}).get(violation_name, [])
+
+    def ruleset_dict(self, ruleset_name: str) -> dict:
+        """
+        Returns the ruleset, with its incidents, as `RuleSet.model_dump` would.
+        """
+        ruleset_dict = self.rulesets[ruleset_name].model_dump(mode="json")
+
+        for violation_name, violation_dict in ruleset_dict["violations"].items():
+            violation_dict["incidents"] = [
+                x.to_dict()
+                for x in self.violation_incidents(ruleset_name, violation_name)
+            ]
+
+        return ruleset_dict
 
     def get_impacted_files(self) -> dict[pathlib.Path, list[ExtendedIncident]]:
         impacted_files: dict[pathlib.Path, list[ExtendedIncident]] = {}
 
+        # Many incidents share a uri, so each is only parsed once. None means
+        # the file is skipped.
+        file_paths: dict[str, Optional[str]] = {}
+
         for ruleset_name, ruleset in self.rulesets.items():
             for violation_name, violation in ruleset.violations.items():
-                for incident in violation.incidents:
-                    if self.should_we_skip_incident(incident):
-                        continue
-
-                    file_path = remove_known_prefixes(urlparse(incident.uri).path)
-                    if file_path.startswith("root/.m2/"):
-                        ## Workaround for bug found in Kantra 0.5.0
-                        ## See:  https://github.com/konveyor/kantra/issues/321
-                        ## Extra files are being reported in the analysis
-                        ## from the dependencies.
-                        ## We will skip these files for now.
+                for incident in self.violation_incidents(ruleset_name, violation_name):
+                    if incident.uri not in file_paths:
+                        file_path = remove_known_prefixes(urlparse(incident.uri).path)
+
+                        if self.should_we_skip_incident(incident):
+                            file_paths[incident.uri] = None
+                        elif file_path.startswith("root/.m2/"):
+                            ## Workaround for bug found in Kantra 0.5.0
+                            ## See:  https://github.com/konveyor/kantra/issues/321
+                            ## Extra files are being reported in the analysis
+                            ## from the dependencies.
+                            ## We will skip these files for now.
+                            file_paths[incident.uri] = None
+                        else:
+                            file_paths[incident.uri] = file_path
+
+                    file_path = file_paths[incident.uri]
+                    if file_path is None:
                         continue
 
-                    current_entry = ExtendedIncident.model_validate(
-                        {
-                            "uri": incident.uri,
-                            "message": incident.message,
-                            "codeSnip": incident.code_snip,
-                            "lineNumber": incident.line_number,
-                            "variables": incident.variables,
-                            "ruleset_name": ruleset_name,
-                            "violation_name": violation_name,
-                            "ruleset_description": ruleset.description,
-                            "violation_description": violation.description,
-                        }
+                    current_entry = incident.to_extended_incident(
+                        ruleset_name,
+                        violation_name,
+                        ruleset.description,
+                        violation.description,
                     )
 
                     if impacted_files.get(file_path) is None:
@@ -140,7 +266,7 @@ class Report:
 
     # TODO: Migrate to a jinja template
     def _write_markdown_snippet(
-        self, ruleset_name: str, ruleset: RuleSet, f: TextIOWrapper
+        self, ruleset_name: str, ruleset: ReportRuleSet, f: TextIOWrapper
     ):
         f.write(f"# {ruleset_name}\n")
         f.write("## Description\n")
@@ -171,9 +297,10 @@ class Report:
                 f.write("* Links\n")
                 for link in items.links:
                     f.write(f"  * {link.title}: {link.url}\n")
-            if items.incidents:
+            incidents = self.violation_incidents(ruleset_name, key)
+            if incidents:
                 f.write("* Incidents\n")
-                for incident in items.incidents:
+                for incident in incidents:
                     # Possible keys of 'uri', 'message', 'codeSnip'
                     if incident.uri:
                         f.write(f"  * {incident.uri}\n")
@@ -197,7 +324,7 @@ class Report:
         buffer.write(f"{ruleset.description}\n")
         buffer.write("* Source of rules:")
 
-    def should_we_skip_incident(self, incident: Incident) -> bool:
+    def should_we_skip_incident(self, incident: Incident | ReportIncident) -> bool:
         """
         Filter out known issues
         """
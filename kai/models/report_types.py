@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import os
+from dataclasses import dataclass, field
 from enum import StrEnum
 from pathlib import Path
 from typing import Any, Optional
@@ -62,6 +63,93 @@ class ExtendedIncident(Incident):
     violation_description: Optional[str] = None
 
 
+@dataclass(slots=True)
+class ReportIncident:
+    """
+    Compact form of an `Incident`, used while processing a report. Pydantic
+    models are only built from it where incidents leave Kai, e.g. in API
+    responses.
+    """
+
+    uri: str
+    message: str
+    code_snip: str = ""
+    # 0-indexed line number
+    line_number: int = -1
+    variables: dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_raw(cls, raw: Any) -> ReportIncident:
+        """
+        Validates an incident as found in a report, accepting the same fields
+        and aliases as `Incident`. Well-formed incidents are checked directly;
+        anything else goes through `Incident` for its coercion and errors.
+        """
+        if isinstance(raw, dict):
+            uri = raw.get("uri")
+            message = _first_of(raw, ("message", "analysis_message"))
+            code_snip = _first_of(raw, ("code_snip", "codeSnip", "incident_snip"), "")
+            line_number = _first_of(raw, ("line_number", "lineNumber"), -1)
+            variables = _first_of(raw, ("variables", "incident_variables"), {})
+
+            if (
+                type(uri) is str
+                and type(message) is str
+                and type(code_snip) is str
+                and type(line_number) is int
+                and type(variables) is dict
+            ):
+                return cls(uri, message, code_snip, line_number, variables)
+
+        incident = Incident.model_validate(raw)
+        return cls(
+            incident.uri,
+            incident.message,
+            incident.code_snip,
+            incident.line_number,
+            incident.variables,
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Same as `Incident.model_dump()`.
+        """
+        return {
+            "uri": self.uri,
+            "message": self.message,
+            "code_snip": self.code_snip,
+            "line_number": self.line_number,
+            "variables": self.variables,
+        }
+
+    def to_extended_incident(
+        self,
+        ruleset_name: str,
+        violation_name: str,
+        ruleset_description: Optional[str] = None,
+        violation_description: Optional[str] = None,
+    ) -> ExtendedIncident:
+        # Already validated, so skip validating again
+        return ExtendedIncident.model_construct(
+            uri=self.uri,
+            message=self.message,
+            code_snip=self.code_snip,
+            line_number=self.line_number,
+            variables=self.variables,
+            ruleset_name=ruleset_name,
+            ruleset_description=ruleset_description,
+            violation_name=violation_name,
+            violation_description=violation_description,
+        )
+
+
+def _first_of(raw: dict, keys: tuple[str, ...], default: Any = None) -> Any:
+    for key in keys:
+        if key in raw:
+            return raw[key]
+    return default
+
+
 class Link(BaseModel):
     """
     Link defines an external hyperlink.
@@ -102,6 +190,21 @@ class Violation(BaseModel):
     effort: Optional[int] = None
 
 
+class ReportViolation(BaseModel):
+    """
+    A `Violation` as kept by a `Report`, which holds its incidents apart as
+    `ReportIncident`s. It has no `incidents` field, so code looking for them
+    here fails instead of finding none.
+    """
+
+    description: str = ""
+    category: Category = Category.POTENTIAL
+    labels: list[str] = []
+    links: list[Link] = []
+    extras: Optional[str] = None
+    effort: Optional[int] = None
+
+
 class RuleSet(BaseModel):
     """
     A RuleSet is a collection of rules that are evaluated together. It different
@@ -135,6 +238,14 @@ class RuleSet(BaseModel):
     skipped: Optional[list[str]] = None
 
 
+class ReportRuleSet(RuleSet):
+    """
+    A `RuleSet` as kept by a `Report`, with `ReportViolation`s.
+    """
+
+    violations: dict[str, ReportViolation] = {}  # type: ignore[assignment]
+
+
 class AnalysisReport(RootModel[list[RuleSet]]):
     """
     An analysis report is simply a list of rule sets.
@@ -3,9 +3,12 @@ from aiohttp import web
 from kai.routes.get_incident_solution import post_get_incident_solution
 from kai.routes.get_incident_solutions_for_file import (
     post_get_incident_solutions_for_file,
+    post_get_incident_solutions_for_file_stream,
 )
 from kai.routes.health_check import post_health_check
+from kai.routes.jobs import get_job, post_jobs_get_incident_solutions_for_file
 from kai.routes.load_analysis_report import post_load_analysis_report
+from kai.routes.migrate_application import post_migrate_application
 from kai.routes.ws.get_incident_solution import get_ws_get_incident_solution
 
 kai_routes: list[web.RouteDef] = [
@@ -13,6 +16,10 @@ kai_routes: list[web.RouteDef] = [
     post_load_analysis_report,
     post_get_incident_solution,
     post_get_incident_solutions_for_file,
+    post_get_incident_solutions_for_file_stream,
+    post_jobs_get_incident_solutions_for_file,
+    get_job,
+    post_migrate_application,
     get_ws_get_incident_solution,
 ]
 
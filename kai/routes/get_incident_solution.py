@@ -33,14 +33,13 @@ async def post_get_incident_solution(request: Request):
 
     params = PostGetIncidentSolutionParams.model_validate(await request.json())
 
-    llm_output = (
-        request.app[web.AppKey("kai_application", KaiApplication)]
-        .get_incident_solution(
-            stream=False,
-            **params.model_dump(),
-        )
-        .content
+    llm_result = await request.app[
+        web.AppKey("kai_application", KaiApplication)
+    ].aget_incident_solution(
+        stream=False,
+        **params.model_dump(),
     )
+    llm_output = llm_result.content
 
     return web.json_response(
         {
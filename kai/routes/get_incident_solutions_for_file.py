@@ -8,12 +8,12 @@ from pydantic import BaseModel
 
 from kai.kai_trace import KaiTrace
 from kai.models.report_types import ExtendedIncident
-from kai.routes.util import to_route
+from kai.routes.util import event_stream, to_route
 from kai.service.kai_application.kai_application import (
     KaiApplication,
     UpdatedFileContent,
 )
-from kai.service.kai_application.util import BatchMode
+from kai.service.kai_application.util import BatchMode, BatchStrategy
 
 KAI_LOG = logging.getLogger(__name__)
 
@@ -25,6 +25,7 @@ class PostGetIncidentSolutionsForFileParams(BaseModel):
     incidents: list[ExtendedIncident]
 
     batch_mode: BatchMode = BatchMode.SINGLE_GROUP
+    batch_strategy: BatchStrategy = BatchStrategy.SEQUENTIAL
     include_solved_incidents: bool = True
     include_llm_results: bool = False
 
@@ -54,7 +55,66 @@ async def post_get_incident_solutions_for_file(request: Request):
     trace.params(params)
 
     try:
-        result: UpdatedFileContent = kai_application.get_incident_solutions_for_file(
+        result: UpdatedFileContent = (
+            await kai_application.aget_incident_solutions_for_file(
+                file_name=params.file_name,
+                file_contents=params.file_contents,
+                application_name=params.application_name,
+                incidents=params.incidents,
+                batch_mode=params.batch_mode,
+                include_solved_incidents=params.include_solved_incidents,
+                include_llm_results=params.include_llm_results,
+                trace=trace,
+                batch_strategy=params.batch_strategy,
+            )
+        )
+    except Exception as e:
+        trace.exception(-1, -1, e, traceback.format_exc())
+        raise e
+    finally:
+        end = time.time()
+        trace.end(end)
+        KAI_LOG.info(
+            f"END - completed in '{end-start}s:  - App: '{params.application_name}', File: '{params.file_name}' with {len(params.incidents)} incidents'"
+        )
+
+    return web.json_response(result.model_dump_json())
+
+
+@to_route("post", "/get_incident_solutions_for_file/stream")
+async def post_get_incident_solutions_for_file_stream(request: Request):
+    """
+    Streaming version of `/get_incident_solutions_for_file`. Sends the events
+    of `KaiApplication.astream_incident_solutions_for_file` as they happen,
+    as server-sent events if the client accepts `text/event-stream`, and as
+    newline-delimited JSON otherwise. A failure is sent as an "error" event.
+    """
+    start = time.time()
+    KAI_LOG.debug(f"get_incident_solutions_for_file/stream recv'd: {request}")
+    params = PostGetIncidentSolutionsForFileParams.model_validate(await request.json())
+
+    KAI_LOG.info(
+        f"START - App: '{params.application_name}', File: '{params.file_name}' with {len(params.incidents)} incidents' (streaming)"
+    )
+
+    kai_application: KaiApplication = request.app["kai_application"]
+
+    trace = KaiTrace(
+        trace_enabled=kai_application.config.trace_enabled,
+        log_dir=kai_application.config.log_dir,
+        model_id=kai_application.model_provider.model_id,
+        batch_mode=params.batch_mode,
+        application_name=params.application_name,
+        file_name=params.file_name,
+    )
+
+    trace.start(start)
+    trace.params(params)
+
+    response, send = await event_stream(request)
+
+    try:
+        async for event in kai_application.astream_incident_solutions_for_file(
             file_name=params.file_name,
             file_contents=params.file_contents,
             application_name=params.application_name,
@@ -63,15 +123,23 @@ async def post_get_incident_solutions_for_file(request: Request):
             include_solved_incidents=params.include_solved_incidents,
             include_llm_results=params.include_llm_results,
             trace=trace,
-        )
+            batch_strategy=params.batch_strategy,
+        ):
+            await send(event)
     except Exception as e:
         trace.exception(-1, -1, e, traceback.format_exc())
-        raise e
+        KAI_LOG.error(f"Streaming {params.file_name} failed: {e}")
+
+        # The status was already sent, so report the error in the stream
+        error = e.text if isinstance(e, web.HTTPException) and e.text else str(e)
+        await send({"event": "error", "error": error})
     finally:
         end = time.time()
         trace.end(end)
         KAI_LOG.info(
-            f"END - completed in '{end-start}s:  - App: '{params.application_name}', File: '{params.file_name}' with {len(params.incidents)} incidents'"
+            f"END - completed in '{end-start}s:  - App: '{params.application_name}', File: '{params.file_name}' with {len(params.incidents)} incidents' (streaming)"
         )
 
-    return web.json_response(result.model_dump_json())
+    await response.write_eof()
+
+    return response
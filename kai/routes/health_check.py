@@ -14,4 +14,16 @@ async def post_health_check(request: Request):
 
     request_json: dict = await request.json()
 
-    return web.json_response({"status": "OK!", "recv'd": request_json})
+    response = {"status": "OK!", "recv'd": request_json}
+
+    # Queue depth and wait times of requests to the LLM
+    kai_application = request.app.get("kai_application")
+    if kai_application is not None:
+        model_provider = kai_application.model_provider
+        response["llm_requests"] = model_provider.limiter.stats()
+        if model_provider.cache is not None:
+            response["llm_cache"] = model_provider.cache.stats()
+        # Files being migrated by /migrate_application, and waiting their turn
+        response["migration_files"] = kai_application.file_limiter.stats()
+
+    return web.json_response(response)
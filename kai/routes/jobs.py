@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import time
+import traceback
+
+from aiohttp import web
+from aiohttp.web_request import Request
+
+from kai.kai_trace import KaiTrace
+from kai.routes.get_incident_solutions_for_file import (
+    PostGetIncidentSolutionsForFileParams,
+)
+from kai.routes.util import to_route
+from kai.service.kai_application.kai_application import (
+    EventCallback,
+    KaiApplication,
+    UpdatedFileContent,
+)
+
+KAI_LOG = logging.getLogger(__name__)
+
+
+@to_route("post", "/jobs/get_incident_solutions_for_file")
+async def post_jobs_get_incident_solutions_for_file(request: Request):
+    """
+    Job version of `/get_incident_solutions_for_file`. Responds right away
+    with the id of a job that does the work in the background. Poll
+    `/jobs/{job_id}` for its progress and result.
+    """
+    KAI_LOG.debug(f"jobs/get_incident_solutions_for_file recv'd: {request}")
+    params = PostGetIncidentSolutionsForFileParams.model_validate(await request.json())
+
+    kai_application: KaiApplication = request.app["kai_application"]
+
+    async def run(events: EventCallback) -> UpdatedFileContent:
+        start = time.time()
+
+        KAI_LOG.info(
+            f"START - App: '{params.application_name}', File: '{params.file_name}' with {len(params.incidents)} incidents' (job)"
+        )
+
+        trace = KaiTrace(
+            trace_enabled=kai_application.config.trace_enabled,
+            log_dir=kai_application.config.log_dir,
+            model_id=kai_application.model_provider.model_id,
+            batch_mode=params.batch_mode,
+            application_name=params.application_name,
+            file_name=params.file_name,
+        )
+
+        trace.start(start)
+        trace.params(params)
+
+        try:
+            return await kai_application.aget_incident_solutions_for_file(
+                file_name=params.file_name,
+                file_contents=params.file_contents,
+                application_name=params.application_name,
+                incidents=params.incidents,
+                batch_mode=params.batch_mode,
+                include_solved_incidents=params.include_solved_incidents,
+                include_llm_results=params.include_llm_results,
+                trace=trace,
+                batch_strategy=params.batch_strategy,
+                events=events,
+            )
+        except Exception as e:
+            trace.exception(-1, -1, e, traceback.format_exc())
+            raise e
+        finally:
+            end = time.time()
+            trace.end(end)
+            KAI_LOG.info(
+                f"END - completed in '{end-start}s:  - App: '{params.application_name}', File: '{params.file_name}' with {len(params.incidents)} incidents' (job)"
+            )
+
+    job_id = await kai_application.job_runner.submit(
+        "get_incident_solutions_for_file",
+        params.model_dump(mode="json"),
+        run,
+    )
+
+    return web.json_response({"job_id": job_id}, status=202)
+
+
+@to_route("get", "/jobs/{job_id}")
+async def get_job(request: Request):
+    """
+    Returns a job's status ("pending", "running", "succeeded" or "failed"),
+    its progress so far and, once it's finished, its result or error. Any
+    server worker can answer, as jobs are kept in the incident store.
+    """
+    job_id = request.match_info["job_id"]
+    kai_application: KaiApplication = request.app["kai_application"]
+
+    job = await asyncio.to_thread(kai_application.incident_store.jobs.get, job_id)
+
+    if job is None:
+        raise web.HTTPNotFound(text=f"No job with id {job_id}")
+
+    return web.json_response(job)
@@ -1,3 +1,4 @@
+import asyncio
 import datetime
 
 from aiohttp import web
@@ -33,8 +34,12 @@ async def post_load_analysis_report(request: Request):
     application = Application(**params.application.model_dump())
     report = Report(params.report_data, params.report_id)
 
-    count = request.app["kai_application"].incident_store.load_report(
-        application, report
+    # Loading a report is long-running, blocking work. Run it on a thread so
+    # the worker keeps serving other requests.
+    count = await asyncio.to_thread(
+        request.app["kai_application"].incident_store.load_report,
+        application,
+        report,
     )
 
     return web.json_response(
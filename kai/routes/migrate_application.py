@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import time
+
+from aiohttp.web_request import Request
+from pydantic import BaseModel
+
+from kai.models.report import Report
+from kai.routes.util import event_stream, to_route
+from kai.service.kai_application.kai_application import KaiApplication
+from kai.service.kai_application.util import BatchMode, BatchStrategy, FileOrder
+
+KAI_LOG = logging.getLogger(__name__)
+
+
+class PostMigrateApplicationParams(BaseModel):
+    application_name: str
+    # Path or file:// URI of a checkout of the application on the server. See
+    # `KaiApplication.application_repo_path` for the ones accepted.
+    repo_uri_local: str
+    report_data: dict | list[dict]
+    report_id: str
+
+    batch_mode: BatchMode = BatchMode.SINGLE_GROUP
+    batch_strategy: BatchStrategy = BatchStrategy.SEQUENTIAL
+    include_solved_incidents: bool = True
+    include_llm_results: bool = False
+    file_order: FileOrder = FileOrder.TOKEN_SIZE
+
+
+@to_route("post", "/migrate_application")
+async def post_migrate_application(request: Request):
+    """
+    Migrates every file of the application with incidents in the report, and
+    streams the result of each file as it's done. See
+    `KaiApplication.amigrate_application` for the events. They're sent like
+    those of `/get_incident_solutions_for_file/stream`.
+    """
+    start = time.time()
+    KAI_LOG.debug(f"migrate_application recv'd: {request}")
+    params = PostMigrateApplicationParams.model_validate(await request.json())
+
+    kai_application: KaiApplication = request.app["kai_application"]
+
+    repo_path = await asyncio.to_thread(
+        kai_application.application_repo_path,
+        params.application_name,
+        params.repo_uri_local,
+    )
+
+    report = Report(params.report_data, params.report_id)
+    impacted_files = await asyncio.to_thread(report.get_impacted_files)
+
+    KAI_LOG.info(
+        f"START - App: '{params.application_name}' with {len(impacted_files)} files"
+    )
+
+    response, send = await event_stream(request)
+
+    try:
+        async for event in kai_application.amigrate_application(
+            application_name=params.application_name,
+            repo_path=repo_path,
+            impacted_files=impacted_files,
+            batch_mode=params.batch_mode,
+            include_solved_incidents=params.include_solved_incidents,
+            include_llm_results=params.include_llm_results,
+            batch_strategy=params.batch_strategy,
+            file_order=params.file_order,
+        ):
+            await send(event)
+    except Exception as e:
+        KAI_LOG.error(f"Migrating {params.application_name} failed: {e}")
+        await send({"event": "error", "error": str(e)})
+    finally:
+        end = time.time()
+        KAI_LOG.info(
+            f"END - completed in '{end-start}s:  - App: '{params.application_name}' with {len(impacted_files)} files"
+        )
+
+    await response.write_eof()
+
+    return response
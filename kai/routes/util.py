@@ -1,6 +1,8 @@
-from typing import Callable
+import json
+from typing import Awaitable, Callable
 
 from aiohttp import web
+from aiohttp.web_request import Request
 
 
 def to_route(method: str, path: str):
@@ -8,3 +10,34 @@ def to_route(method: str, path: str):
         return web.route(method, path, func)
 
     return decorator
+
+
+async def event_stream(
+    request: Request,
+) -> tuple[web.StreamResponse, Callable[[dict], Awaitable[None]]]:
+    """
+    Starts a streamed response to `request` and returns it, with a function
+    that sends an event (a dict with an "event" key). Events are sent as
+    server-sent events if the client accepts `text/event-stream`, and as
+    newline-delimited JSON otherwise.
+    """
+    server_sent_events = "text/event-stream" in request.headers.get("Accept", "")
+
+    response = web.StreamResponse(
+        headers={
+            "Content-Type": (
+                "text/event-stream" if server_sent_events else "application/x-ndjson"
+            ),
+            "Cache-Control": "no-cache",
+        }
+    )
+    await response.prepare(request)
+
+    async def send(event: dict):
+        data = json.dumps(event)
+        if server_sent_events:
+            await response.write(f"event: {event['event']}\ndata: {data}\n\n".encode())
+        else:
+            await response.write(f"{data}\n".encode())
+
+    return response, send
@@ -1,5 +1,5 @@
 import json
-from typing import Iterator
+from typing import AsyncIterator
 
 from aiohttp import web
 from aiohttp.web_request import Request
@@ -26,14 +26,14 @@ async def get_ws_get_incident_solution(request: Request):
         try:
             request_json: dict = json.loads(msg.data)
 
-            chunks: Iterator[BaseMessageChunk] = request.app[
+            chunks: AsyncIterator[BaseMessageChunk] = await request.app[
                 web.AppKey("kai_application", KaiApplication)
-            ].get_incident_solution(
+            ].aget_incident_solution(
                 application_name=request_json["application_name"],
                 ruleset_name=request_json["ruleset_name"],
                 violation_name=request_json["violation_name"],
                 incident_snip=request_json.get("incident_snip", ""),
-                incident_vars=request_json["incident_variables"],
+                incident_variables=request_json["incident_variables"],
                 file_name=request_json["file_name"],
                 file_contents=request_json["file_contents"],
                 line_number=request_json["line_number"],
@@ -41,7 +41,7 @@ async def get_ws_get_incident_solution(request: Request):
                 stream=True,
             )
 
-            for chunk in chunks:
+            async for chunk in chunks:
                 await ws.send_str(
                     json.dumps(
                         {
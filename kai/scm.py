@@ -1,12 +1,72 @@
-__all__ = ["GitDiff"]
+__all__ = ["GitDiff", "RepoBlobReader"]
 
 import logging
+from typing import Optional
 
 from git import BadName, Repo
 
 KAI_LOG = logging.getLogger(__name__)
 
 
+class RepoBlobReader:
+    """
+    Memoizing reader for file contents and diffs in a git repository.
+
+    File contents are read through the repository's long-lived
+    `git cat-file --batch` process instead of spawning `git show` for every
+    lookup, and both contents and diffs are cached per (commit, path). Meant to
+    be scoped to a single unit of work, e.g. loading one report, and closed
+    afterwards to stop the batch process.
+    """
+
+    def __init__(self, repo: Repo):
+        self.repo = repo
+        self._contents: dict[tuple[str, str], Optional[str]] = {}
+        self._diffs: dict[tuple[str, str, str], str] = {}
+
+    def __enter__(self) -> "RepoBlobReader":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def file_contents(self, commit: str, path: str) -> Optional[str]:
+        """
+        Returns the contents of `path` (relative to the repository root) at
+        `commit`, or None if the file does not exist there. Invalid utf-8 is
+        replaced rather than raising.
+        """
+        key = (commit, path)
+        if key not in self._contents:
+            try:
+                _, _, _, data = self.repo.git.get_object_data(f"{commit}:{path}")
+                self._contents[key] = data.decode("utf-8", errors="replace")
+            except ValueError:
+                # cat-file reports the object as missing
+                self._contents[key] = None
+
+        return self._contents[key]
+
+    def file_diff(self, old_commit: str, new_commit: str, path: str) -> str:
+        """
+        Returns the diff of `path` between `old_commit` and `new_commit`.
+        """
+        key = (old_commit, new_commit, path)
+        if key not in self._diffs:
+            self._diffs[key] = (
+                self.repo.git.diff(old_commit, new_commit, "--", path)
+                .encode("utf-8", errors="ignore")
+                .decode()
+            )
+
+        return self._diffs[key]
+
+    def close(self):
+        self._contents.clear()
+        self._diffs.clear()
+        self.repo.git.clear_cache()
+
+
 class GitDiff:
     def __init__(self, repo_path):
         self.repo_path = repo_path
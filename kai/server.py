@@ -54,11 +54,26 @@ def app() -> web.Application:
     webapp["kai_application"] = KaiApplication(config)
     webapp["kai_config"] = config
     webapp.add_routes(kai_routes)
+    webapp.on_cleanup.append(cleanup)
 
     log.info("Kai server is ready to receive requests.")
     return webapp
 
 
+async def cleanup(webapp: web.Application):
+    await webapp["kai_application"].aclose()
+
+
+def post_fork(server, worker):
+    """
+    Gunicorn hook run in each worker right after it's forked. With
+    `preload_app`, the application was created in the master, so give the
+    worker its own connections.
+    """
+    webapp: web.Application = worker.app.wsgi()
+    webapp["kai_application"].after_fork()
+
+
 class StandaloneApplication(WSGIApplication):
     """
     This class is used to run the aiohttp app with gunicorn. While we could use
@@ -90,4 +105,10 @@ if __name__ == "__main__":
         "worker_class": "aiohttp.GunicornWebWorker",
     }
 
+    if config.gunicorn_preload:
+        # Imports, config validation and template compilation happen once in
+        # the master. Workers share those pages until they write to them.
+        options["preload_app"] = True
+        options["post_fork"] = post_fork
+
     StandaloneApplication("kai.server:app()", options).run()
@@ -1,7 +1,10 @@
-import json
+import threading
 from abc import ABC, abstractmethod
 
-from sqlalchemy import and_, bindparam, create_engine, text
+from sqlalchemy import Engine, Insert, Table, create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import ConnectionPoolEntry, StaticPool
 
 from kai.models.kai_config import (
     KaiConfigIncidentStoreArgs,
@@ -9,7 +12,6 @@ from kai.models.kai_config import (
     KaiConfigIncidentStoreProvider,
     KaiConfigIncidentStoreSQLiteArgs,
 )
-from kai.service.incident_store.sql_types import SQLIncident
 
 
 class IncidentStoreBackend(ABC):
@@ -18,7 +20,11 @@ class IncidentStoreBackend(ABC):
         pass
 
     @abstractmethod
-    def json_exactly_equal(self):
+    def insert_or_ignore(self, table: Table) -> Insert:
+        """
+        Returns an INSERT statement for `table` that silently skips rows whose
+        primary key already exists. Used for batch upserts during ingest.
+        """
         pass
 
 
@@ -27,19 +33,55 @@ class PSQLBackend(IncidentStoreBackend):
         self.args = args
 
     def create_engine(self):
+        engine_args: dict = {
+            "pool_size": self.args.pool_size,
+            "max_overflow": self.args.max_overflow,
+            "pool_timeout": self.args.pool_timeout,
+            "pool_recycle": self.args.pool_recycle,
+            "pool_pre_ping": self.args.pool_pre_ping,
+        }
+
+        if self.args.statement_timeout_ms is not None:
+            engine_args["connect_args"] = {
+                "options": f"-c statement_timeout={self.args.statement_timeout_ms}"
+            }
+
         if self.args.connection_string:
-            return create_engine(self.args.connection_string)
+            return create_engine(self.args.connection_string, **engine_args)
         else:
             return create_engine(
                 f"postgresql://{self.args.user}:{self.args.password}@{self.args.host}:5432/{self.args.database}",
                 client_encoding="utf8",
+                **engine_args,
             )
 
-    def json_exactly_equal(self, json_dict: dict):
-        return and_(
-            SQLIncident.incident_variables.op("<@")(json_dict),
-            SQLIncident.incident_variables.op("@>")(json_dict),
-        )
+    def insert_or_ignore(self, table: Table) -> Insert:
+        return postgresql.insert(table).on_conflict_do_nothing()
+
+
+class SerializedStaticPool(StaticPool):
+    """
+    A StaticPool that only hands its connection to one thread at a time. A
+    sqlite3 connection has a single transaction, so threads using it together
+    would commit or roll back each other's work.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Reentrant, as a thread may already hold the connection
+        self._lock = threading.RLock()
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        self._lock.acquire()
+        try:
+            return super()._do_get()
+        except BaseException:
+            self._lock.release()
+            raise
+
+    def _do_return_conn(self, record: ConnectionPoolEntry) -> None:
+        super()._do_return_conn(record)
+        self._lock.release()
 
 
 class SQLiteBackend(IncidentStoreBackend):
@@ -47,7 +89,23 @@ class SQLiteBackend(IncidentStoreBackend):
         self.args = args
 
     def create_engine(self):
+        engine = self._create_engine()
+        event.listen(engine, "connect", self._set_pragmas)
+
+        return engine
+
+    def _create_engine(self) -> Engine:
         if self.args.connection_string:
+            # In-memory databases only live as long as their connection, so
+            # every thread (e.g. post-processing workers) must share one, one
+            # thread at a time.
+            if make_url(self.args.connection_string).database in (None, "", ":memory:"):
+                return create_engine(
+                    self.args.connection_string,
+                    connect_args={"check_same_thread": False},
+                    poolclass=SerializedStaticPool,
+                )
+
             return create_engine(self.args.connection_string)
         else:
             return create_engine(
@@ -55,22 +113,16 @@ class SQLiteBackend(IncidentStoreBackend):
                 client_encoding="utf8",
             )
 
-    def json_exactly_equal(self, json_dict: dict):
-        return text(
-            """
-        (
-            SELECT key, value
-            FROM json_tree(incidents.incident_variables)
-            WHERE type != 'object'
-            ORDER BY key, value
-        ) = (
-            SELECT key, value
-            FROM json_tree(json(:json_dict))
-            WHERE type != 'object'
-            ORDER BY key, value
-        )
-        """
-        ).bindparams(bindparam("json_dict", json.dumps(json_dict)))
+    def _set_pragmas(self, dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode = {self.args.journal_mode}")
+        cursor.execute(f"PRAGMA synchronous = {self.args.synchronous}")
+        cursor.execute(f"PRAGMA mmap_size = {int(self.args.mmap_size)}")
+        cursor.execute(f"PRAGMA busy_timeout = {int(self.args.busy_timeout_ms)}")
+        cursor.close()
+
+    def insert_or_ignore(self, table: Table) -> Insert:
+        return sqlite.insert(table).prefix_with("OR IGNORE")
 
 
 def incident_store_backend_factory(args: KaiConfigIncidentStoreArgs):
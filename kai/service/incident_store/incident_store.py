@@ -1,22 +1,37 @@
 import argparse
 import datetime
+import hashlib
+import json
 import logging
+import multiprocessing
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import Optional, TypeVar
+from typing import Any, Iterable, Optional, TypeVar
 from urllib.parse import unquote, urlparse
 
 import yaml
 from git import Repo
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, inspect, select, tuple_
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy.pool import StaticPool
 
 from kai.constants import PATH_GIT_ROOT, PATH_LOCAL_REPO
 from kai.kai_logging import initLogging
-from kai.models.kai_config import KaiConfig
+from kai.models.kai_config import KaiConfig, SolutionBlobCompression
 from kai.models.report import Report
+from kai.models.report_types import ExtendedIncident, ReportRuleSet
 from kai.models.util import filter_incident_vars
+from kai.scm import RepoBlobReader
+from kai.service.incident_store import migrate
 from kai.service.incident_store.backend import IncidentStoreBackend
+from kai.service.incident_store.jobs import JobStore
+from kai.service.incident_store.post_processing import SolutionPostProcessingQueue
+from kai.service.incident_store.solution_blobs import (
+    load_solution_blobs,
+    store_solutions,
+)
 from kai.service.incident_store.sql_types import (
     SQLAcceptedSolution,
     SQLApplication,
@@ -37,6 +52,22 @@ KAI_LOG = logging.getLogger(__name__)
 
 T = TypeVar("T")
 
+# The incident columns solution detection compares, which are all that's
+# loaded of the open incidents on ingest
+OPEN_INCIDENT_COLUMNS = [
+    SQLIncident.violation_name,
+    SQLIncident.ruleset_name,
+    SQLIncident.application_name,
+    SQLIncident.incident_uri,
+    SQLIncident.incident_line,
+    SQLIncident.incident_variables,
+]
+OPEN_INCIDENT_DEFERRED_COLUMNS = [
+    "incident_message",
+    "incident_snip",
+    "incident_variables_hash",
+]
+
 
 def deep_sort(obj: T) -> T:
     if isinstance(obj, dict):
@@ -46,6 +77,38 @@ def deep_sort(obj: T) -> T:
     return obj
 
 
+def incident_variables_hash(incident_variables: dict) -> str:
+    """
+    Returns a stable hash of already filtered and deep-sorted incident
+    variables. Stored alongside each incident so exact-match lookups in
+    `find_solutions` can be answered with an index seek.
+    """
+    return hashlib.sha256(
+        json.dumps(
+            incident_variables, sort_keys=True, separators=(",", ":"), default=str
+        ).encode()
+    ).hexdigest()
+
+
+def sql_incident_to_row(incident: SQLIncident) -> dict[str, Any]:
+    """
+    Returns the column values of a transient SQLIncident as a dict suitable for
+    a bulk `insert(SQLIncident)`.
+    """
+    return {
+        "violation_name": incident.violation_name,
+        "ruleset_name": incident.ruleset_name,
+        "application_name": incident.application_name,
+        "incident_uri": incident.incident_uri,
+        "incident_message": incident.incident_message,
+        "incident_snip": incident.incident_snip,
+        "incident_line": incident.incident_line,
+        "incident_variables": incident.incident_variables,
+        "incident_variables_hash": incident.incident_variables_hash,
+        "solution_id": incident.solution_id,
+    }
+
+
 def __get_repo_path(app_name):
     """
     Get the repo path
@@ -126,7 +189,9 @@ def load_reports_from_directory(store: "IncidentStore", path: str):
             generated_at=datetime.datetime.now(),
         )
 
-        store.load_report(app_initial, Report.load_report_from_file(report_path))
+        store.load_report(
+            app_initial, Report.load_report_from_file(report_path, incremental=True)
+        )
         KAI_LOG.info(f"Loaded application - initial {app}\n")
 
         solved_folder = os.path.join(app_path, "solved")
@@ -152,7 +217,9 @@ def load_reports_from_directory(store: "IncidentStore", path: str):
             current_commit=commit.hexsha,
             generated_at=datetime.datetime.now(),
         )
-        store.load_report(app_solved, Report.load_report_from_file(report_path))
+        store.load_report(
+            app_solved, Report.load_report_from_file(report_path, incremental=True)
+        )
 
         KAI_LOG.info(f"Loaded application - solved {app}\n")
 
@@ -174,40 +241,103 @@ class IncidentStore:
         backend: IncidentStoreBackend,
         solution_detector: SolutionDetectionAlgorithm,
         solution_producer: SolutionProducer,
+        post_processing_workers: int = 2,
+        post_process_on_ingest: bool = False,
+        solution_detection_workers: int = 1,
+        solution_blob_compression: SolutionBlobCompression = SolutionBlobCompression.ZLIB,
+        job_retention_seconds: Optional[float] = None,
     ):
         self.backend = backend
         self.engine = self.backend.create_engine()
 
+        # State of background jobs, shared by every server worker
+        self.jobs = JobStore(self.engine, job_retention_seconds)
+
         self.solution_detector = solution_detector
         self.solution_producer = solution_producer
 
+        self.solution_blob_compression = solution_blob_compression
+
+        # Deferred work on solutions (e.g. LLM summaries) happens off the
+        # request path, either when a solution is first returned by
+        # `find_solutions` or, optionally, right after ingest.
+        self.post_processing_queue = SolutionPostProcessingQueue(
+            self.engine,
+            self.backend,
+            self.solution_producer,
+            post_processing_workers,
+            solution_blob_compression=solution_blob_compression,
+        )
+        self.post_process_on_ingest = post_process_on_ingest
+
+        # Created on first use, and only if detection should run in parallel
+        self.solution_detection_workers = solution_detection_workers
+        self._detection_executor: Optional[ProcessPoolExecutor] = None
+
         self.create_tables()  # This is a no-op if the tables already exist
 
+    def after_fork(self):
+        """
+        Call in a forked child (e.g. a gunicorn worker of a preloaded app)
+        before using the store. Drops the connections inherited from the
+        parent without closing them, since the parent still owns them. An
+        in-memory SQLite database only exists in its one connection, which
+        the child gets its own copy of, so it's kept.
+        """
+        if not isinstance(self.engine.pool, StaticPool):
+            self.engine.dispose(close=False)
+
+    def close(self):
+        """
+        Stops the background workers of the store, after storing what's left
+        to post-process, and closes its connections. Call when shutting down.
+        """
+        if self._detection_executor is not None:
+            self._detection_executor.shutdown()
+            self._detection_executor = None
+
+        self.post_processing_queue.shutdown()
+        self.engine.dispose()
+
+    def detection_executor(self) -> Optional[ProcessPoolExecutor]:
+        """
+        Returns the process pool used for solution detection, or None if
+        detection should run in this process.
+        """
+        if self.solution_detection_workers <= 1:
+            return None
+
+        if self._detection_executor is None:
+            # Spawn rather than fork, since the server has threads running
+            self._detection_executor = ProcessPoolExecutor(
+                max_workers=self.solution_detection_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+        return self._detection_executor
+
     def load_report(self, app: Application, report: Report) -> tuple[int, int, int]:
         """
         Load incidents from a report and given application object. Returns a
         tuple containing (# of new incidents, # of unsolved incidents, # of
         solved incidents) in that order.
 
+        Rulesets and violations are fetched and upserted in batches, new
+        incidents are bulk-inserted, and the whole report is committed in a
+        single transaction. File contents and diffs are read from the repo at
+        most once per report and shared between detection and production.
 
         TODO: Only does stuff within the same application. Maybe fixed?
         """
 
-        # NEW: Store whole report in table
-        # - if we get the same report again, we should skip adding it. Have some identifier
-        # - But should still check incidents.
-
-        # - have two tables `unsolved_incidents` and `solved_incidents`
-
-        # Iterate through all incidents in the report
-        # - change so theres an identified like "commit application ruleset violation"
+        start = time.perf_counter()
 
         repo = Repo(unquote(urlparse(app.repo_uri_local).path))
         old_commit: str
         new_commit = app.current_commit
         report_incidents: list[SQLIncident] = []
 
-        with Session(self.engine) as session:
+        with Session(self.engine) as session, RepoBlobReader(repo) as blob_reader:
             select_application_stmt = select(SQLApplication).where(
                 SQLApplication.application_name == app.application_name
             )
@@ -224,7 +354,7 @@ class IncidentStore:
                     generated_at=app.generated_at,
                 )
                 session.add(application)
-                session.commit()
+                session.flush()
 
             # TODO: Determine if we want to have this check
             # if application.generated_at >= app.generated_at:
@@ -232,69 +362,47 @@ class IncidentStore:
 
             old_commit = application.current_commit
 
-            for ruleset_name, ruleset_obj in report.rulesets.items():
-                if ruleset_obj is None:
-                    continue
-
-                ruleset_obj.model_dump_json()
-
-                select_ruleset_stmt = select(SQLRuleset).where(
-                    SQLRuleset.ruleset_name == ruleset_name
-                )
-
-                ruleset = session.scalars(select_ruleset_stmt).first()
+            rulesets = {
+                name: obj for name, obj in report.rulesets.items() if obj is not None
+            }
 
-                if ruleset is None:
-                    ruleset = SQLRuleset(
-                        ruleset_name=ruleset_name,
-                        tags=ruleset_obj.tags,
-                    )
-                    session.add(ruleset)
-                    session.commit()
+            self._upsert_rulesets_and_violations(session, rulesets)
 
+            for ruleset_name, ruleset_obj in rulesets.items():
                 for violation_name, violation_obj in ruleset_obj.violations.items():
                     if violation_obj is None:
                         continue
 
-                    select_violation_stmt = (
-                        select(SQLViolation)
-                        .where(SQLViolation.violation_name == violation_name)
-                        .where(SQLViolation.ruleset_name == ruleset.ruleset_name)
-                    )
-
-                    violation = session.scalars(select_violation_stmt).first()
-
-                    if violation is None:
-                        violation = SQLViolation(
-                            violation_name=violation_name,
-                            ruleset_name=ruleset.ruleset_name,
-                            category=violation_obj.category,
-                            labels=violation_obj.labels,
+                    for incident in report.violation_incidents(
+                        ruleset_name, violation_name
+                    ):
+                        sorted_vars = deep_sort(
+                            filter_incident_vars(incident.variables)
                         )
-                        session.add(violation)
-                        session.commit()
-
-                    for incident in violation_obj.incidents:
-                        filtered_vars = filter_incident_vars(incident.variables)
                         report_incidents.append(
                             SQLIncident(
-                                violation_name=violation.violation_name,
-                                ruleset_name=ruleset.ruleset_name,
+                                violation_name=violation_name,
+                                ruleset_name=ruleset_name,
                                 application_name=application.application_name,
                                 incident_uri=incident.uri,
                                 incident_snip=incident.code_snip,
                                 incident_line=incident.line_number,
-                                incident_variables=deep_sort(filtered_vars),
+                                incident_variables=sorted_vars,
+                                incident_variables_hash=incident_variables_hash(
+                                    sorted_vars
+                                ),
                                 incident_message=incident.message,
                             )
                         )
 
             solution_detector_ctx = SolutionDetectorContext(
-                old_incidents=application.incidents,
+                old_incidents=self._open_incidents(session, app.application_name),
                 new_incidents=report_incidents,
                 repo=repo,
                 old_commit=old_commit,
                 new_commit=new_commit,
+                blob_reader=blob_reader,
+                executor=self.detection_executor(),
             )
 
             categorized_incidents = self.solution_detector(solution_detector_ctx)
@@ -308,8 +416,14 @@ class IncidentStore:
 
             # Add new incidents
 
-            session.add_all(categorized_incidents.new)
-            session.commit()
+            if categorized_incidents.new:
+                session.execute(
+                    insert(SQLIncident),
+                    [
+                        sql_incident_to_row(incident)
+                        for incident in categorized_incidents.new
+                    ],
+                )
 
             KAI_LOG.debug(
                 f"Number of solved incidents: {len(categorized_incidents.solved)}"
@@ -317,15 +431,22 @@ class IncidentStore:
 
             # Update solved incidents with their respective solutions
 
-            for solved_incident in categorized_incidents.solved:
-                solution = self.solution_producer.produce_one(
-                    solved_incident, repo, old_commit, new_commit
-                )
-                solved_incident.solution = SQLAcceptedSolution(
-                    solution=solution,
+            solutions = [
+                self.solution_producer.produce_one(
+                    solved_incident, repo, old_commit, new_commit, blob_reader
                 )
+                for solved_incident in categorized_incidents.solved
+            ]
 
-            session.commit()
+            # File bodies and diffs shared between solutions are stored once
+            solution_columns = store_solutions(
+                session, self.backend, solutions, self.solution_blob_compression
+            )
+
+            for solved_incident, columns in zip(
+                categorized_incidents.solved, solution_columns
+            ):
+                solved_incident.solution = SQLAcceptedSolution(**columns)
 
             application.repo_uri_origin = app.repo_uri_origin
             application.repo_uri_local = app.repo_uri_local
@@ -333,11 +454,7 @@ class IncidentStore:
             application.current_commit = app.current_commit
             application.generated_at = app.generated_at
 
-            session.commit()
-
-            report_dict = {
-                k: v.model_dump(mode="json") for k, v in report.rulesets.items()
-            }
+            report_dict = {k: report.ruleset_dict(k) for k in report.rulesets}
             unmodified_report = SQLUnmodifiedReport(
                 application_name=app.application_name,
                 report_id=report.report_id,
@@ -347,19 +464,152 @@ class IncidentStore:
 
             # Upsert the unmodified report
             session.merge(unmodified_report)
+            session.flush()
+
+            solutions_to_post_process: list[tuple[int, SQLIncident, Solution]] = []
+
+            if self.post_process_on_ingest:
+                solutions_to_post_process = [
+                    (x.solution_id, x, solution)
+                    for x, solution in zip(categorized_incidents.solved, solutions)
+                    if self.solution_producer.needs_post_processing(solution)
+                ]
+
+                # Keep the queued incidents usable after the session is closed.
+                # Everything has been flushed already, so this is safe. Only
+                # the columns detection needs were loaded, so load the rest.
+                for _, incident, _ in solutions_to_post_process:
+                    session.refresh(incident, OPEN_INCIDENT_DEFERRED_COLUMNS)
+                    session.expunge(incident)
+
             session.commit()
 
+        if solutions_to_post_process:
+            self.post_processing_queue.submit(solutions_to_post_process)
+
+        elapsed = time.perf_counter() - start
+        KAI_LOG.info(
+            f"Ingested {len(report_incidents)} incident(s) for {app.application_name} "
+            f"in {elapsed:.2f}s ({len(report_incidents) / max(elapsed, 1e-9):.1f} rows/s)"
+        )
+
         return (
             len(categorized_incidents.new),
             len(categorized_incidents.unsolved),
             len(categorized_incidents.solved),
         )
 
+    def _open_incidents(
+        self, session: Session, application_name: str
+    ) -> list[SQLIncident]:
+        """
+        Returns the application's incidents that don't have a solution yet.
+        Solved incidents can't be matched again, so they're left out. Only the
+        columns solution detection compares are loaded; the others are loaded
+        on access. Detection matches every open incident against the report
+        and keeps the unsolved and solved ones, so all of them are loaded.
+        """
+        stmt = (
+            select(SQLIncident)
+            .where(
+                SQLIncident.application_name == application_name,
+                SQLIncident.solution_id.is_(None),
+            )
+            .options(load_only(*OPEN_INCIDENT_COLUMNS))
+        )
+
+        return list(session.scalars(stmt))
+
+    def _upsert_rulesets_and_violations(
+        self, session: Session, rulesets: dict[str, ReportRuleSet]
+    ):
+        """
+        Make sure every ruleset and violation in `rulesets` exists in the store.
+        Existing rows are fetched with one query per table and only the missing
+        ones are inserted, in a single batch per table.
+        """
+        if not rulesets:
+            return
+
+        existing_rulesets = set(
+            session.scalars(
+                select(SQLRuleset.ruleset_name).where(
+                    SQLRuleset.ruleset_name.in_(rulesets.keys())
+                )
+            ).all()
+        )
+
+        existing_violations = set(
+            session.execute(
+                select(SQLViolation.ruleset_name, SQLViolation.violation_name).where(
+                    SQLViolation.ruleset_name.in_(rulesets.keys())
+                )
+            )
+            .tuples()
+            .all()
+        )
+
+        new_rulesets = [
+            {"ruleset_name": ruleset_name, "tags": ruleset_obj.tags}
+            for ruleset_name, ruleset_obj in rulesets.items()
+            if ruleset_name not in existing_rulesets
+        ]
+
+        new_violations = [
+            {
+                "violation_name": violation_name,
+                "ruleset_name": ruleset_name,
+                "category": violation_obj.category,
+                "labels": violation_obj.labels,
+            }
+            for ruleset_name, ruleset_obj in rulesets.items()
+            for violation_name, violation_obj in ruleset_obj.violations.items()
+            if violation_obj is not None
+            and (ruleset_name, violation_name) not in existing_violations
+        ]
+
+        if new_rulesets:
+            session.execute(
+                self.backend.insert_or_ignore(SQLRuleset.__table__), new_rulesets
+            )
+
+        if new_violations:
+            session.execute(
+                self.backend.insert_or_ignore(SQLViolation.__table__), new_violations
+            )
+
+        KAI_LOG.debug(
+            f"Inserted {len(new_rulesets)} ruleset(s) and {len(new_violations)} violation(s)"
+        )
+
     def create_tables(self):
         """
-        Create tables in the incident store.
+        Create tables in the incident store. New stores are created at the
+        latest migration and stores created before migrations existed are
+        stamped with the baseline. The tables of an existing store are never
+        altered: migrations are only applied with `migrate.py upgrade`, since
+        they may take long on large stores and must not run in every worker.
+        Raises a RuntimeError if the store isn't at the latest migration.
         """
-        SQLBase.metadata.create_all(self.engine)
+        with self.engine.begin() as conn:
+            if not inspect(conn).has_table(SQLIncident.__tablename__):
+                SQLBase.metadata.create_all(conn)
+                migrate.stamp(conn, "head")
+                return
+
+            revision = migrate.current_revision(conn)
+
+            if revision is None:
+                migrate.stamp(conn, migrate.BASELINE_REVISION)
+                revision = migrate.BASELINE_REVISION
+
+        head = migrate.head_revision(self.engine)
+        if revision != head:
+            raise RuntimeError(
+                f"Incident store is at revision {revision}, the latest is {head}. Run "
+                "`python kai/service/incident_store/migrate.py upgrade` to apply "
+                "the missing migrations before starting Kai."
+            )
 
     def delete_store(self):
         """
@@ -368,69 +618,144 @@ class IncidentStore:
         SQLBase.metadata.drop_all(self.engine)
         self.create_tables()
 
+    def application_repo_uri(self, application_name: str) -> Optional[str]:
+        """
+        Returns the `repo_uri_local` the application was last loaded from, or
+        None if there is no such application.
+        """
+        with Session(self.engine) as session:
+            return session.scalar(
+                select(SQLApplication.repo_uri_local).where(
+                    SQLApplication.application_name == application_name
+                )
+            )
+
     def find_solutions(
         self,
         ruleset_name: str,
         violation_name: str,
         incident_variables: dict,
         incident_snip: Optional[str] = None,
+        fields: Optional[Iterable[str]] = None,
     ) -> list[Solution]:
         """
         Returns a list of solutions for the given incident. Exact matches only.
-        """
-        incident_variables = deep_sort(filter_incident_vars(incident_variables))
 
-        if incident_snip is None:
-            incident_snip = ""
+        Only the blob fields (see `SOLUTION_BLOB_FIELDS`) listed in `fields`
+        are loaded, the others are left empty. All of them are loaded if
+        `fields` is None.
 
-        with Session(self.engine) as session:
-            select_violation_stmt = (
-                select(SQLViolation)
-                .where(SQLViolation.violation_name == violation_name)
-                .where(SQLViolation.ruleset_name == ruleset_name)
-            )
+        This is a pure read. Solutions that still need post-processing (e.g. an
+        LLM summary) are returned as they are stored and queued on
+        `post_processing_queue`, which writes the results back later.
+        """
+        key = (
+            ruleset_name,
+            violation_name,
+            incident_variables_hash(
+                deep_sort(filter_incident_vars(dict(incident_variables)))
+            ),
+        )
 
-            violation = session.scalars(select_violation_stmt).first()
+        return self._find_solutions_by_keys([key], fields)[key]
 
-            if violation is None:
-                return []
+    def find_solutions_many(
+        self,
+        incidents: list[ExtendedIncident],
+        fields: Optional[Iterable[str]] = None,
+    ) -> list[list[Solution]]:
+        """
+        Batched version of `find_solutions`. Returns one list of solutions per
+        incident, in the same order as `incidents`. All lookups are resolved in
+        a single session.
 
-            select_incidents_with_solutions_stmt = (
-                select(SQLIncident)
-                .where(SQLIncident.violation_name == violation.violation_name)
-                .where(SQLIncident.ruleset_name == violation.ruleset_name)
-                .where(SQLIncident.solution_id.isnot(None))
-                .where(self.backend.json_exactly_equal(incident_variables))
+        Like `find_solutions`, this is read-only. Solutions that still need
+        post-processing are returned as-is and queued on
+        `post_processing_queue`.
+        """
+        keys = [
+            (
+                incident.ruleset_name,
+                incident.violation_name,
+                incident_variables_hash(
+                    deep_sort(filter_incident_vars(dict(incident.variables)))
+                ),
             )
+            for incident in incidents
+        ]
 
-            result: list[Solution] = []
-            for incident in session.scalars(select_incidents_with_solutions_stmt).all():
-                select_accepted_solution_stmt = select(SQLAcceptedSolution).where(
-                    SQLAcceptedSolution.solution_id == incident.solution_id
-                )
+        solutions_by_key = self._find_solutions_by_keys(keys, fields)
 
-                accepted_solution = session.scalars(
-                    select_accepted_solution_stmt
-                ).first()
+        return [solutions_by_key[key] for key in keys]
 
-                processed_solution = self.solution_producer.post_process_one(
-                    incident, accepted_solution.solution
-                )
+    def _find_solutions_by_keys(
+        self,
+        keys: list[tuple[str, str, str]],
+        fields: Optional[Iterable[str]] = None,
+        chunk_size: int = 500,
+    ) -> dict[tuple[str, str, str], list[Solution]]:
+        """
+        Looks up the solutions for every (ruleset_name, violation_name,
+        incident_variables_hash) key with one joined query per `chunk_size`
+        keys.
+        """
+        result: dict[tuple[str, str, str], list[Solution]] = {key: [] for key in keys}
+        unique_keys = list(result.keys())
 
-                # TODO: This first line doesn't work for some reason. The second
-                # line is a hack to get around it.
-                accepted_solution.solution = processed_solution
-                session.query(SQLAcceptedSolution).filter(
-                    SQLAcceptedSolution.solution_id == incident.solution_id
-                ).update({"solution": processed_solution})
+        to_post_process: dict[int, tuple[int, SQLIncident, Solution]] = {}
+        accepted_solutions: list[SQLAcceptedSolution] = []
+        accepted_solutions_to_post_process: list[SQLAcceptedSolution] = []
 
-                result.append(processed_solution)
+        with Session(self.engine) as session:
+            for i in range(0, len(unique_keys), chunk_size):
+                select_incidents_with_solutions_stmt = (
+                    select(SQLIncident, SQLAcceptedSolution)
+                    .join(
+                        SQLAcceptedSolution,
+                        SQLIncident.solution_id == SQLAcceptedSolution.solution_id,
+                    )
+                    .where(
+                        tuple_(
+                            SQLIncident.ruleset_name,
+                            SQLIncident.violation_name,
+                            SQLIncident.incident_variables_hash,
+                        ).in_(unique_keys[i : i + chunk_size])
+                    )
+                    .order_by(SQLIncident.incident_id)
+                )
+
+                for incident, accepted_solution in session.execute(
+                    select_incidents_with_solutions_stmt
+                ).all():
+                    solution = accepted_solution.solution
+
+                    if self.solution_producer.needs_post_processing(solution):
+                        if accepted_solution.solution_id not in to_post_process:
+                            to_post_process[accepted_solution.solution_id] = (
+                                accepted_solution.solution_id,
+                                incident,
+                                solution,
+                            )
+                            accepted_solutions_to_post_process.append(accepted_solution)
+                    else:
+                        accepted_solutions.append(accepted_solution)
+
+                    result[
+                        (
+                            incident.ruleset_name,
+                            incident.violation_name,
+                            incident.incident_variables_hash,
+                        )
+                    ].append(solution)
 
-                session.commit()
+            # Post-processing works on the whole solution
+            load_solution_blobs(session, accepted_solutions, fields)
+            load_solution_blobs(session, accepted_solutions_to_post_process)
 
-            session.commit()
+        if to_post_process:
+            self.post_processing_queue.submit(list(to_post_process.values()))
 
-            return result
+        return result
 
 
 def cmd(provider: str = None):
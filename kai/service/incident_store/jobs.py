@@ -0,0 +1,178 @@
+import datetime
+import logging
+import uuid
+from enum import StrEnum
+from typing import Any, Optional
+
+from sqlalchemy import Engine, delete, update
+from sqlalchemy.orm import Session
+
+from kai.service.incident_store.sql_types import SQLJob
+
+KAI_LOG = logging.getLogger(__name__)
+
+
+class JobStatus(StrEnum):
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+def _utcnow() -> datetime.datetime:
+    # Stored without a timezone, like the rest of the store's timestamps
+    return datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+
+
+class JobStore:
+    """
+    Keeps the state of long-running jobs in the incident store's database, so
+    whichever server worker is asked about a job can answer, not only the one
+    running it.
+
+    Finished jobs are deleted `retention_seconds` after their last update, the
+    next time a job is created. None keeps them forever.
+
+    The runner of unfinished jobs touches them every `HEARTBEAT_SECONDS`.
+    Jobs it hasn't touched in `ABANDONED_AFTER_SECONDS` were left behind by a
+    server worker that stopped, and are failed by `fail_abandoned`.
+    """
+
+    HEARTBEAT_SECONDS = 30.0
+    ABANDONED_AFTER_SECONDS = 3 * HEARTBEAT_SECONDS
+
+    def __init__(self, engine: Engine, retention_seconds: Optional[float] = None):
+        self.engine = engine
+        self.retention_seconds = retention_seconds
+
+    def create(self, kind: str, params: dict[str, Any]) -> str:
+        """
+        Records a new pending job and returns its id.
+        """
+        job_id = uuid.uuid4().hex
+        now = _utcnow()
+
+        with Session(self.engine) as session:
+            session.add(
+                SQLJob(
+                    job_id=job_id,
+                    kind=kind,
+                    status=JobStatus.PENDING,
+                    params=params,
+                    progress={},
+                    result=None,
+                    error=None,
+                    created_at=now,
+                    updated_at=now,
+                )
+            )
+            session.commit()
+
+        self.purge()
+
+        return job_id
+
+    def _update(self, job_id: str, **values: Any):
+        with Session(self.engine) as session:
+            session.execute(
+                update(SQLJob)
+                .where(SQLJob.job_id == job_id)
+                .values({"updated_at": _utcnow(), **values})
+            )
+            session.commit()
+
+    def start(self, job_id: str):
+        self._update(job_id, status=JobStatus.RUNNING)
+
+    def progress(self, job_id: str, progress: dict[str, Any]):
+        self._update(job_id, progress=progress)
+
+    def succeed(self, job_id: str, result: dict[str, Any]):
+        self._update(job_id, status=JobStatus.SUCCEEDED, result=result)
+
+    def fail(self, job_id: str, error: str):
+        self._update(job_id, status=JobStatus.FAILED, error=error)
+
+    def heartbeat(self, job_ids: list[str]):
+        """
+        Records that the jobs are still owned by a live runner.
+        """
+        with Session(self.engine) as session:
+            session.execute(
+                update(SQLJob)
+                .where(SQLJob.job_id.in_(job_ids))
+                .values(updated_at=_utcnow())
+            )
+            session.commit()
+
+    def fail_abandoned(self) -> int:
+        """
+        Fails the unfinished jobs no runner has touched in
+        `ABANDONED_AFTER_SECONDS`. Returns how many.
+        """
+        cutoff = _utcnow() - datetime.timedelta(seconds=self.ABANDONED_AFTER_SECONDS)
+
+        with Session(self.engine) as session:
+            failed = session.execute(
+                update(SQLJob)
+                .where(
+                    SQLJob.status.in_([JobStatus.PENDING, JobStatus.RUNNING]),
+                    SQLJob.updated_at < cutoff,
+                )
+                .values(
+                    status=JobStatus.FAILED,
+                    error="The server running the job stopped before it finished",
+                    updated_at=_utcnow(),
+                )
+            ).rowcount
+            session.commit()
+
+        if failed:
+            KAI_LOG.warning(f"Failed {failed} abandoned jobs")
+
+        return failed
+
+    def get(self, job_id: str) -> Optional[dict[str, Any]]:
+        """
+        Returns the job's status, progress and, once it's finished, its result
+        or error. Returns None if there is no such job.
+        """
+        with Session(self.engine) as session:
+            job = session.get(SQLJob, job_id)
+
+            if job is None:
+                return None
+
+            return {
+                "job_id": job.job_id,
+                "kind": job.kind,
+                "status": job.status,
+                "progress": job.progress,
+                "result": job.result,
+                "error": job.error,
+                "created_at": job.created_at.isoformat(),
+                "updated_at": job.updated_at.isoformat(),
+            }
+
+    def purge(self) -> int:
+        """
+        Deletes finished jobs past their retention. Returns how many.
+        """
+        if self.retention_seconds is None:
+            return 0
+
+        cutoff = _utcnow() - datetime.timedelta(seconds=self.retention_seconds)
+
+        with Session(self.engine) as session:
+            deleted = session.execute(
+                delete(SQLJob).where(
+                    SQLJob.status.in_([JobStatus.SUCCEEDED, JobStatus.FAILED]),
+                    SQLJob.updated_at < cutoff,
+                )
+            ).rowcount
+            session.commit()
+
+        if deleted:
+            KAI_LOG.info(f"Deleted {deleted} finished jobs")
+
+        return deleted
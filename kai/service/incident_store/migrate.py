@@ -0,0 +1,131 @@
+import argparse
+import logging
+from typing import Optional
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import Connection, Engine
+
+from kai.kai_logging import initLogging
+from kai.models.kai_config import KaiConfig
+from kai.service.incident_store.backend import incident_store_backend_factory
+
+KAI_LOG = logging.getLogger(__name__)
+
+MIGRATIONS_LOCATION = "kai.service.incident_store:migrations"
+
+# Revision of stores created before migrations existed
+BASELINE_REVISION = "0001"
+
+
+def alembic_config(engine: Engine, connection: Optional[Connection] = None) -> Config:
+    """
+    Returns the Alembic config for the incident store behind `engine`.
+    Migrations run on `connection` if given, in its transaction.
+    """
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_LOCATION)
+    config.attributes["engine"] = engine
+    config.attributes["connection"] = connection
+
+    return config
+
+
+def current_revision(connection: Connection) -> Optional[str]:
+    """
+    Returns the revision the store is at, or None if it was never stamped.
+    """
+    return MigrationContext.configure(connection).get_current_revision()
+
+
+def head_revision(engine: Engine) -> str:
+    return ScriptDirectory.from_config(alembic_config(engine)).get_current_head()
+
+
+def stamp(connection: Connection, revision: str = "head"):
+    """
+    Records that the store is at `revision` without running any migration.
+    """
+    command.stamp(alembic_config(connection.engine, connection), revision)
+
+
+def upgrade(engine: Engine, revision: str = "head"):
+    command.upgrade(alembic_config(engine), revision)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Migrate the schema of the incident store."
+    )
+    parser.add_argument(
+        "--config_filepath",
+        type=str,
+        default=None,
+        required=False,
+        help="Path to the config file.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    upgrade_parser = subparsers.add_parser(
+        "upgrade", help="Apply migrations up to a revision."
+    )
+    upgrade_parser.add_argument("revision", nargs="?", default="head")
+    upgrade_parser.add_argument(
+        "--sql", action="store_true", help="Print the SQL instead of running it."
+    )
+
+    downgrade_parser = subparsers.add_parser(
+        "downgrade", help="Revert migrations down to a revision."
+    )
+    downgrade_parser.add_argument("revision")
+
+    stamp_parser = subparsers.add_parser(
+        "stamp", help="Record a revision without running migrations."
+    )
+    stamp_parser.add_argument("revision")
+
+    subparsers.add_parser("current", help="Show the store's revision.")
+    subparsers.add_parser("history", help="List the migrations.")
+
+    revision_parser = subparsers.add_parser(
+        "revision",
+        help="Generate a migration from the differences between the models and the store.",
+    )
+    revision_parser.add_argument("-m", "--message", required=True)
+
+    args = parser.parse_args()
+
+    if args.config_filepath:
+        config = KaiConfig.model_validate_filepath(args.config_filepath)
+    else:
+        config = KaiConfig()
+
+    initLogging(
+        config.log_level.upper(),
+        config.file_log_level.upper(),
+        config.log_dir,
+        "kai_migrate.log",
+    )
+
+    engine = incident_store_backend_factory(config.incident_store.args).create_engine()
+    alembic = alembic_config(engine)
+
+    match args.command:
+        case "upgrade":
+            command.upgrade(alembic, args.revision, sql=args.sql)
+        case "downgrade":
+            command.downgrade(alembic, args.revision)
+        case "stamp":
+            command.stamp(alembic, args.revision)
+        case "current":
+            command.current(alembic)
+        case "history":
+            command.history(alembic)
+        case "revision":
+            command.revision(alembic, message=args.message, autogenerate=True)
+
+
+if __name__ == "__main__":
+    main()
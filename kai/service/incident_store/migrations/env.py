@@ -0,0 +1,49 @@
+from alembic import context
+
+from kai.service.incident_store.sql_types import SQLBase
+
+# Run through `kai.service.incident_store.migrate`, which passes the store's
+# engine, or a connection to use instead, in the config's attributes.
+config = context.config
+
+target_metadata = SQLBase.metadata
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # Tables of other components may share the database, e.g. the LLM response
+    # cache. Leave them alone.
+    return not (type_ == "table" and reflected and compare_to is None)
+
+
+def run_migrations_offline():
+    context.configure(
+        url=config.attributes["engine"].url,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online(connection):
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        # SQLite can't alter most things in place
+        render_as_batch=True,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+elif config.attributes.get("connection") is not None:
+    run_migrations_online(config.attributes["connection"])
+else:
+    with config.attributes["engine"].connect() as connection:
+        run_migrations_online(connection)
@@ -0,0 +1,26 @@
+"""Baseline
+
+The schema as created by `create_all` before migrations existed. Existing
+stores without a revision are stamped with this one.
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-09-02 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    pass
+
+
+def downgrade() -> None:
+    pass
@@ -0,0 +1,49 @@
+"""Index incidents by violation and by application
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2024-09-02 00:00:01.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    "ix_incidents_violation_solution": [
+        "ruleset_name",
+        "violation_name",
+        "solution_id",
+    ],
+    "ix_incidents_application_solution": ["application_name", "solution_id"],
+}
+
+
+def upgrade() -> None:
+    # Build the indexes without blocking writes to the table on PostgreSQL,
+    # which can't be done in a transaction
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES.items():
+            op.create_index(
+                name,
+                "incidents",
+                columns,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.drop_index(
+                name,
+                table_name="incidents",
+                postgresql_concurrently=True,
+            )
@@ -0,0 +1,122 @@
+"""Hash incident variables for exact-match solution lookups
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-09-03 00:00:00.000000
+
+"""
+
+import hashlib
+import json
+from typing import Any, Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX_NAME = "ix_incidents_solution_lookup"
+INDEX_COLUMNS = [
+    "ruleset_name",
+    "violation_name",
+    "incident_variables_hash",
+    "solution_id",
+]
+
+# Frozen copies of the hashing in `kai.service.incident_store.incident_store`
+# at the time of this revision, so later changes to it don't change what the
+# migration does
+FILTERED_INCIDENT_VARS = ["file", "package", "name"]
+BACKFILL_BATCH_SIZE = 1000
+
+incidents = sa.table(
+    "incidents",
+    sa.column("incident_id", sa.Integer()),
+    sa.column("incident_variables", sa.JSON()),
+    sa.column("incident_variables_hash", sa.String()),
+)
+
+
+def deep_sort(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        return {k: deep_sort(v) for k, v in sorted(obj.items())}
+    if isinstance(obj, list):
+        return sorted(deep_sort(x) for x in obj)
+    return obj
+
+
+def incident_variables_hash(incident_variables: dict) -> str:
+    incident_variables = {
+        k: v for k, v in incident_variables.items() if k not in FILTERED_INCIDENT_VARS
+    }
+
+    return hashlib.sha256(
+        json.dumps(
+            deep_sort(incident_variables),
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        ).encode()
+    ).hexdigest()
+
+
+def backfill_incident_variables_hash(connection: sa.Connection):
+    while True:
+        rows = connection.execute(
+            sa.select(incidents.c.incident_id, incidents.c.incident_variables)
+            .where(incidents.c.incident_variables_hash.is_(None))
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+
+        if not rows:
+            break
+
+        connection.execute(
+            sa.update(incidents)
+            .where(incidents.c.incident_id == sa.bindparam("b_incident_id"))
+            .values(incident_variables_hash=sa.bindparam("b_hash")),
+            [
+                {
+                    "b_incident_id": incident_id,
+                    "b_hash": incident_variables_hash(variables),
+                }
+                for incident_id, variables in rows
+            ],
+        )
+
+        if len(rows) < BACKFILL_BATCH_SIZE:
+            break
+
+
+def upgrade() -> None:
+    op.add_column(
+        "incidents",
+        sa.Column("incident_variables_hash", sa.String(), nullable=True),
+    )
+
+    backfill_incident_variables_hash(op.get_bind())
+
+    # Index the backfilled column without blocking writes on PostgreSQL
+    with op.get_context().autocommit_block():
+        op.create_index(
+            INDEX_NAME,
+            "incidents",
+            INDEX_COLUMNS,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            INDEX_NAME,
+            table_name="incidents",
+            postgresql_concurrently=True,
+        )
+
+    with op.batch_alter_table("incidents") as batch_op:
+        batch_op.drop_column("incident_variables_hash")
@@ -0,0 +1,44 @@
+"""Reference solution bodies stored in solution_blobs
+
+Solutions stored before this keep their bodies inline and are read as before.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-09-03 00:00:01.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = ["file_diff_hash", "original_code_hash", "updated_code_hash"]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "solution_blobs",
+        sa.Column("blob_hash", sa.String(), primary_key=True),
+        sa.Column("encoding", sa.String(), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+    )
+
+    for column in COLUMNS:
+        op.add_column(
+            "accepted_solutions", sa.Column(column, sa.String(), nullable=True)
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("accepted_solutions") as batch_op:
+        for column in COLUMNS:
+            batch_op.drop_column(column)
+
+    op.drop_table("solution_blobs")
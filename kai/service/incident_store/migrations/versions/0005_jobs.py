@@ -0,0 +1,58 @@
+"""Keep the state of long-running jobs in jobs
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-09-04 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql, sqlite
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def json_type() -> sa.types.TypeEngine:
+    return (
+        sa.JSON()
+        .with_variant(postgresql.JSONB(), "postgresql")
+        .with_variant(sqlite.JSON(), "sqlite")
+    )
+
+
+def upgrade() -> None:
+    op.create_table(
+        "jobs",
+        sa.Column("job_id", sa.String(), primary_key=True),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("params", json_type(), nullable=False),
+        sa.Column("progress", json_type(), nullable=False),
+        sa.Column("result", json_type(), nullable=True),
+        sa.Column("error", sa.String(), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+    )
+    op.create_index("ix_jobs_updated_at", "jobs", ["updated_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_jobs_updated_at", table_name="jobs")
+    op.drop_table("jobs")
@@ -0,0 +1,169 @@
+import concurrent.futures
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+from sqlalchemy import Engine, update
+from sqlalchemy.orm import Session
+
+from kai.models.kai_config import SolutionBlobCompression
+from kai.service.incident_store.backend import IncidentStoreBackend
+from kai.service.incident_store.solution_blobs import store_solutions
+from kai.service.incident_store.sql_types import SQLAcceptedSolution, SQLIncident
+from kai.service.solution_handling.production import SolutionProducer
+from kai.service.solution_handling.solution_types import Solution
+
+KAI_LOG = logging.getLogger(__name__)
+
+
+class SolutionPostProcessingQueue:
+    """
+    Runs `SolutionProducer.post_process_one` in the background so that reading
+    solutions from the store never waits on labor-intensive work such as LLM
+    summaries.
+
+    At most `max_workers` solutions are processed concurrently. Processed
+    solutions are written back to the store in batches of `batch_size`, or
+    as soon as the queue runs dry. A solution is only queued once until its
+    result has been written back.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        backend: IncidentStoreBackend,
+        solution_producer: SolutionProducer,
+        max_workers: int = 2,
+        batch_size: int = 16,
+        solution_blob_compression: SolutionBlobCompression = SolutionBlobCompression.ZLIB,
+    ):
+        self.engine = engine
+        self.backend = backend
+        self.solution_producer = solution_producer
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.solution_blob_compression = solution_blob_compression
+
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: set[Future] = set()
+
+        # Solutions that are queued, being processed, or waiting to be written
+        self._pending: set[int] = set()
+        self._in_flight = 0
+        self._results: dict[int, Solution] = {}
+
+    def submit(self, items: list[tuple[int, SQLIncident, Solution]]) -> int:
+        """
+        Queue (solution_id, incident, solution) triples for post-processing.
+        Every blob field of the solutions must be loaded. Solutions that are
+        already queued are skipped. Returns the number of solutions that were
+        queued.
+        """
+        queued = 0
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="solution-post-processing",
+                )
+
+            for solution_id, incident, solution in items:
+                if solution_id in self._pending:
+                    continue
+
+                self._pending.add(solution_id)
+                self._in_flight += 1
+
+                # The caller keeps using `solution`, so hand the worker a copy
+                future = self._executor.submit(
+                    self._process, solution_id, incident, solution.model_copy()
+                )
+                self._futures.add(future)
+                future.add_done_callback(self._futures.discard)
+
+                queued += 1
+
+        if queued:
+            KAI_LOG.debug(f"Queued {queued} solution(s) for post-processing")
+
+        return queued
+
+    def _process(self, solution_id: int, incident: SQLIncident, solution: Solution):
+        try:
+            processed = self.solution_producer.post_process_one(incident, solution)
+        except Exception as e:
+            KAI_LOG.warning(f"Post-processing failed for solution {solution_id}: {e}")
+            processed = None
+
+        with self._lock:
+            self._in_flight -= 1
+
+            if processed is None:
+                self._pending.discard(solution_id)
+            else:
+                self._results[solution_id] = processed
+
+            should_flush = len(self._results) >= self.batch_size or (
+                self._in_flight == 0 and len(self._results) > 0
+            )
+
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        """
+        Write every processed solution that has not been stored yet.
+        """
+        with self._lock:
+            results, self._results = self._results, {}
+
+        if not results:
+            return
+
+        try:
+            with Session(self.engine) as session:
+                columns = store_solutions(
+                    session,
+                    self.backend,
+                    list(results.values()),
+                    self.solution_blob_compression,
+                )
+                session.execute(
+                    update(SQLAcceptedSolution),
+                    [
+                        {"solution_id": solution_id, **solution_columns}
+                        for solution_id, solution_columns in zip(
+                            results.keys(), columns
+                        )
+                    ],
+                )
+                session.commit()
+
+            KAI_LOG.debug(f"Stored {len(results)} post-processed solution(s)")
+        except Exception as e:
+            KAI_LOG.warning(f"Failed to store post-processed solutions: {e}")
+        finally:
+            with self._lock:
+                self._pending.difference_update(results.keys())
+
+    def wait(self):
+        """
+        Block until everything queued so far has been processed and stored.
+        """
+        with self._lock:
+            futures = list(self._futures)
+
+        concurrent.futures.wait(futures)
+        self.flush()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+        self.flush()
@@ -0,0 +1,132 @@
+import hashlib
+import zlib
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from kai.models.kai_config import SolutionBlobCompression
+from kai.service.incident_store.backend import IncidentStoreBackend
+from kai.service.incident_store.sql_types import SQLAcceptedSolution, SQLSolutionBlob
+from kai.service.solution_handling.solution_types import Solution
+
+# The large text fields of a `Solution`. They are stored once per distinct
+# content in the `solution_blobs` table and referenced from
+# `accepted_solutions` by hash, in the `<field>_hash` column.
+SOLUTION_BLOB_FIELDS = ("file_diff", "original_code", "updated_code")
+
+
+def solution_blob_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def encode_solution_blob(
+    content: str, compression: SolutionBlobCompression
+) -> dict[str, Any]:
+    """
+    Returns a `solution_blobs` row for `content`. Content that doesn't get
+    smaller when compressed is stored as-is.
+    """
+    raw = content.encode("utf-8")
+    encoding, data = SolutionBlobCompression.NONE, raw
+
+    if compression == SolutionBlobCompression.ZLIB:
+        compressed = zlib.compress(raw)
+        if len(compressed) < len(raw):
+            encoding, data = SolutionBlobCompression.ZLIB, compressed
+
+    return {
+        "blob_hash": solution_blob_hash(content),
+        "encoding": str(encoding),
+        "data": data,
+    }
+
+
+def decode_solution_blob(encoding: str, data: bytes) -> str:
+    match encoding:
+        case SolutionBlobCompression.NONE:
+            return data.decode("utf-8")
+        case SolutionBlobCompression.ZLIB:
+            return zlib.decompress(data).decode("utf-8")
+        case _:
+            raise ValueError(f"Unknown solution blob encoding: {encoding}")
+
+
+def store_solutions(
+    session: Session,
+    backend: IncidentStoreBackend,
+    solutions: list[Solution],
+    compression: SolutionBlobCompression,
+) -> list[dict[str, Any]]:
+    """
+    Inserts the blobs of every solution that are not stored yet, in one batch.
+    Returns the `accepted_solutions` column values for each solution: the
+    solution without its blob fields, and the hashes referencing them.
+    """
+    blobs: dict[str, dict[str, Any]] = {}
+    columns: list[dict[str, Any]] = []
+
+    for solution in solutions:
+        solution_columns: dict[str, Any] = {
+            "solution": solution.model_copy(
+                update={field: "" for field in SOLUTION_BLOB_FIELDS}
+            )
+        }
+
+        for field in SOLUTION_BLOB_FIELDS:
+            content: str = getattr(solution, field)
+            blob_hash = solution_blob_hash(content)
+
+            if blob_hash not in blobs:
+                blobs[blob_hash] = encode_solution_blob(content, compression)
+
+            solution_columns[f"{field}_hash"] = blob_hash
+
+        columns.append(solution_columns)
+
+    if blobs:
+        session.execute(
+            backend.insert_or_ignore(SQLSolutionBlob.__table__), list(blobs.values())
+        )
+
+    return columns
+
+
+def load_solution_blobs(
+    session: Session,
+    accepted_solutions: list[SQLAcceptedSolution],
+    fields: Optional[Iterable[str]] = None,
+):
+    """
+    Fills in the blob fields of each accepted solution's `solution` in place,
+    with a single query for all of them. Only `fields` are loaded, all of them
+    if None. Solutions stored before blobs existed are left untouched.
+    """
+    fields = SOLUTION_BLOB_FIELDS if fields is None else tuple(fields)
+
+    wanted: set[str] = set()
+    for accepted_solution in accepted_solutions:
+        for field in fields:
+            blob_hash = getattr(accepted_solution, f"{field}_hash")
+            if blob_hash is not None:
+                wanted.add(blob_hash)
+
+    if not wanted:
+        return
+
+    contents = {
+        blob_hash: decode_solution_blob(encoding, data)
+        for blob_hash, encoding, data in session.execute(
+            select(
+                SQLSolutionBlob.blob_hash,
+                SQLSolutionBlob.encoding,
+                SQLSolutionBlob.data,
+            ).where(SQLSolutionBlob.blob_hash.in_(wanted))
+        ).tuples()
+    }
+
+    for accepted_solution in accepted_solutions:
+        for field in fields:
+            blob_hash = getattr(accepted_solution, f"{field}_hash")
+            if blob_hash is not None:
+                setattr(accepted_solution.solution, field, contents[blob_hash])
@@ -9,6 +9,8 @@ from sqlalchemy import (
     Dialect,
     ForeignKey,
     ForeignKeyConstraint,
+    Index,
+    LargeBinary,
     String,
     TypeDecorator,
     func,
@@ -124,11 +126,26 @@ class SQLViolation(SQLBase):
     )
 
 
+class SQLSolutionBlob(SQLBase):
+    __tablename__ = "solution_blobs"
+
+    # sha256 of the uncompressed, utf-8 encoded content
+    blob_hash: Mapped[str] = mapped_column(primary_key=True)
+    encoding: Mapped[str]  # a SolutionBlobCompression value
+    data: Mapped[bytes] = mapped_column(LargeBinary)
+
+
 class SQLAcceptedSolution(SQLBase):
     __tablename__ = "accepted_solutions"
 
     solution_id: Mapped[int] = mapped_column(primary_key=True)
+    # The solution's large text fields are stored in solution_blobs and
+    # referenced by the hashes below. They are empty in `solution` unless the
+    # hashes are NULL, as in stores created before solution_blobs existed.
     solution: Mapped[Solution]
+    file_diff_hash: Mapped[Optional[str]]
+    original_code_hash: Mapped[Optional[str]]
+    updated_code_hash: Mapped[Optional[str]]
 
     incidents: Mapped[list["SQLIncident"]] = relationship(
         back_populates="solution", cascade="all, delete-orphan"
@@ -150,6 +167,9 @@ class SQLIncident(SQLBase):
     incident_snip: Mapped[str]
     incident_line: Mapped[int]  # 0-indexed!
     incident_variables: Mapped[dict[str, Any]]
+    # sha256 of the filtered, deep-sorted incident_variables. Lets exact-match
+    # lookups use an index instead of comparing JSON documents row by row.
+    incident_variables_hash: Mapped[Optional[str]]
     solution_id: Mapped[Optional[str]] = mapped_column(
         ForeignKey("accepted_solutions.solution_id")
     )
@@ -159,6 +179,26 @@ class SQLIncident(SQLBase):
             [violation_name, ruleset_name],
             [SQLViolation.violation_name, SQLViolation.ruleset_name],
         ),
+        Index(
+            "ix_incidents_solution_lookup",
+            ruleset_name,
+            violation_name,
+            "incident_variables_hash",
+            "solution_id",
+        ),
+        # Open (or solved) incidents of a violation
+        Index(
+            "ix_incidents_violation_solution",
+            ruleset_name,
+            violation_name,
+            "solution_id",
+        ),
+        # An application's incidents, e.g. the open ones checked on ingest
+        Index(
+            "ix_incidents_application_solution",
+            "application_name",
+            "solution_id",
+        ),
         {},
     )
 
@@ -167,4 +207,23 @@ class SQLIncident(SQLBase):
     solution: Mapped[SQLAcceptedSolution] = relationship(back_populates="incidents")
 
     def __repr__(self) -> str:
-        return f"SQLIncident(violation_name={self.violation_name}, ruleset_name={self.ruleset_name}, application_name={self.application_name}, incident_uri={self.incident_uri}, incident_snip={self.incident_snip:.10}, incident_line={self.incident_line}, incident_variables={self.incident_variables}, solution_id={self.solution_id})"
+        return f"SQLIncident(violation_name={self.violation_name}, ruleset_name={self.ruleset_name}, application_name={self.application_name}, incident_uri={self.incident_uri}, incident_snip={self.incident_snip:.10}, incident_line={self.incident_line}, incident_variables={self.incident_variables}, incident_variables_hash={self.incident_variables_hash}, solution_id={self.solution_id})"
+
+
+class SQLJob(SQLBase):
+    __tablename__ = "jobs"
+
+    job_id: Mapped[str] = mapped_column(primary_key=True)  # uuid4 hex
+    kind: Mapped[str]
+    status: Mapped[str]  # a JobStatus value
+    params: Mapped[dict[str, Any]]
+    # Partial results, updated as the job runs
+    progress: Mapped[dict[str, Any]]
+    result: Mapped[Optional[dict[str, Any]]]
+    error: Mapped[Optional[str]]
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(), server_default=func.now()
+    )
+    updated_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(), server_default=func.now(), index=True
+    )
@@ -6,7 +6,7 @@ from typing import Callable
 
 import git
 import yaml
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 
 from kai.constants import PATH_TEST_DATA
@@ -16,6 +16,7 @@ from kai.models.kai_config import (
     KaiConfigModels,
 )
 from kai.models.report import Report
+from kai.models.report_types import ExtendedIncident
 from kai.service.incident_store.backend import incident_store_backend_factory
 from kai.service.incident_store.incident_store import Application, IncidentStore
 from kai.service.incident_store.sql_types import (
@@ -24,6 +25,7 @@ from kai.service.incident_store.sql_types import (
     SQLBase,
     SQLIncident,
     SQLRuleset,
+    SQLSolutionBlob,
     SQLViolation,
 )
 from kai.service.llm_interfacing.model_provider import ModelProvider
@@ -35,6 +37,7 @@ from kai.service.solution_handling.production import (
     SolutionProducerLLMLazy,
     SolutionProducerTextOnly,
 )
+from kai.service.solution_handling.solution_types import Solution
 
 
 class Fixture:
@@ -146,7 +149,7 @@ class GitRepo(Fixture):
 class TestIncidentStore(unittest.TestCase):
     def check_number_of_entities(self, cls: SQLBase, expected: int, where_clause=None):
         with Session(self.incident_store.engine) as session:
-            if where_clause:
+            if where_clause is not None:
                 stmt = select(cls).where(where_clause)
             else:
                 stmt = select(cls)
@@ -204,6 +207,281 @@ class TestIncidentStore(unittest.TestCase):
             incidents = session.query(SQLIncident).all()
             self.assertTrue(len(incidents) == 0)
 
+    def commit_file(self, file_path: str, contents: str) -> str:
+        with open(self.repo_path / file_path, "w") as f:
+            f.write(contents)
+        self.repo.git.add(file_path)
+        self.repo.git.commit("-m", f"Update {file_path}")
+        return self.repo.head.commit.hexsha
+
+    def local_application(self, commit: str) -> Application:
+        return Application(
+            "sample",
+            self.repo_path.as_uri(),
+            self.repo_path.as_uri(),
+            "master",
+            commit,
+            datetime.datetime.now(),
+        )
+
+    @staticmethod
+    def local_report(incident_lines: list[int], report_id: str) -> Report:
+        return Report.load_report_from_object(
+            [
+                {
+                    "name": "test_ruleset",
+                    "tags": ["tag"],
+                    "violations": {
+                        "test_violation": {
+                            "category": "mandatory",
+                            "labels": ["label"],
+                            "incidents": [
+                                {
+                                    "uri": "file:///Main.java",
+                                    "message": "test_message",
+                                    "codeSnip": "test_snip",
+                                    "lineNumber": line,
+                                    "variables": {"file": "Main.java", "x": [2, 1]},
+                                }
+                                for line in incident_lines
+                            ],
+                        },
+                    },
+                },
+                {"name": "empty_ruleset", "violations": {}},
+            ],
+            report_id,
+        )
+
+    @fixture(BasicIncidentStore, GitRepo)
+    def test_load_report_bulk_ingest(self):
+        self.repo = git.Repo.init(self.repo_path)
+        old_commit = self.commit_file("Main.java", "class Main {\n  int a;\n}\n")
+        new_commit = self.commit_file("Main.java", "class Main {\n}\n")
+
+        count = self.incident_store.load_report(
+            self.local_application(old_commit), self.local_report([0, 1], "initial")
+        )
+
+        self.assertEqual(count, (2, 0, 0))
+        self.check_number_of_entities(SQLRuleset, 2)
+        self.check_number_of_entities(SQLViolation, 1)
+        self.check_number_of_entities(SQLIncident, 2)
+
+        with Session(self.incident_store.engine) as session:
+            incident = session.scalars(select(SQLIncident)).first()
+            self.assertEqual(incident.incident_variables, {"x": [1, 2]})
+
+        count = self.incident_store.load_report(
+            self.local_application(new_commit), self.local_report([0], "solved")
+        )
+
+        self.assertEqual(count, (0, 1, 1))
+        self.check_number_of_entities(SQLRuleset, 2)
+        self.check_number_of_entities(SQLViolation, 1)
+        self.check_number_of_entities(SQLIncident, 2)
+        self.check_number_of_entities(SQLAcceptedSolution, 1)
+
+    @fixture(BasicIncidentStore, GitRepo)
+    def test_load_report_open_incidents_only(self):
+        self.repo = git.Repo.init(self.repo_path)
+        old_commit = self.commit_file("Main.java", "class Main {\n  int a;\n}\n")
+        new_commit = self.commit_file("Main.java", "class Main {\n}\n")
+
+        self.incident_store.load_report(
+            self.local_application(old_commit), self.local_report([0, 1], "initial")
+        )
+        self.incident_store.load_report(
+            self.local_application(new_commit), self.local_report([0], "solved")
+        )
+
+        # The solved incident isn't matched again, so it's reported as new
+        count = self.incident_store.load_report(
+            self.local_application(new_commit), self.local_report([0, 1], "reopened")
+        )
+
+        self.assertEqual(count, (1, 1, 0))
+        self.check_number_of_entities(SQLIncident, 3)
+        self.check_number_of_entities(SQLIncident, 2, SQLIncident.solution_id.is_(None))
+
+        # Solving it again doesn't touch the first solution
+        count = self.incident_store.load_report(
+            self.local_application(new_commit), self.local_report([0], "solved_again")
+        )
+
+        self.assertEqual(count, (0, 1, 1))
+        self.check_number_of_entities(SQLAcceptedSolution, 2)
+
+    @fixture(BasicIncidentStore, GitRepo)
+    def test_find_solutions_by_variables_hash(self):
+        self.repo = git.Repo.init(self.repo_path)
+        old_commit = self.commit_file("Main.java", "class Main {\n  int a;\n}\n")
+        new_commit = self.commit_file("Main.java", "class Main {\n}\n")
+
+        self.incident_store.load_report(
+            self.local_application(old_commit), self.local_report([0, 1], "initial")
+        )
+        self.incident_store.load_report(
+            self.local_application(new_commit), self.local_report([0], "solved")
+        )
+
+        def find(variables: dict):
+            return self.incident_store.find_solutions(
+                "test_ruleset", "test_violation", variables
+            )
+
+        self.assertEqual(len(find({"x": [1, 2], "file": "Other.java"})), 1)
+        self.assertEqual(len(find({"x": [2, 1]})), 1)
+        self.assertEqual(len(find({"x": [1, 2, 3]})), 0)
+
+    @fixture(BasicIncidentStore, GitRepo)
+    def test_solution_blobs(self):
+        self.repo = git.Repo.init(self.repo_path)
+        old_commit = self.commit_file("Main.java", "class Main {\n  int a;\n}\n")
+        new_commit = self.commit_file("Main.java", "class Main {\n}\n")
+
+        self.incident_store.load_report(
+            self.local_application(old_commit), self.local_report([0, 1], "initial")
+        )
+        self.incident_store.load_report(
+            self.local_application(new_commit), self.local_report([], "solved")
+        )
+
+        # Both solutions share the same diff and file bodies
+        self.check_number_of_entities(SQLAcceptedSolution, 2)
+        self.check_number_of_entities(SQLSolutionBlob, 3)
+
+        with Session(self.incident_store.engine) as session:
+            for accepted_solution in session.scalars(select(SQLAcceptedSolution)):
+                self.assertEqual(accepted_solution.solution.original_code, "")
+                self.assertIsNotNone(accepted_solution.original_code_hash)
+
+        def find(fields=None) -> list[Solution]:
+            return self.incident_store.find_solutions(
+                "test_ruleset",
+                "test_violation",
+                {"file": "Main.java", "x": [2, 1]},
+                fields=fields,
+            )
+
+        solutions = find()
+        self.assertEqual(len(solutions), 2)
+        for solution in solutions:
+            self.assertEqual(solution.original_code, "class Main {\n  int a;\n}\n")
+            self.assertEqual(solution.updated_code, "class Main {\n}\n")
+            self.assertIn("-  int a;", solution.file_diff)
+
+        for solution in find({"file_diff"}):
+            self.assertEqual(solution.original_code, "")
+            self.assertEqual(solution.updated_code, "")
+            self.assertIn("-  int a;", solution.file_diff)
+
+        # Solutions stored before solution_blobs existed are still read as-is
+        with Session(self.incident_store.engine) as session:
+            session.execute(
+                update(SQLAcceptedSolution),
+                [
+                    {
+                        "solution_id": solution_id,
+                        "solution": Solution(
+                            uri="file:///Main.java",
+                            file_diff="inline diff",
+                            original_code="inline before",
+                            updated_code="inline after",
+                        ),
+                        "file_diff_hash": None,
+                        "original_code_hash": None,
+                        "updated_code_hash": None,
+                    }
+                    for solution_id in session.scalars(
+                        select(SQLAcceptedSolution.solution_id)
+                    )
+                ],
+            )
+            session.commit()
+
+        for solution in find({"file_diff"}):
+            self.assertEqual(solution.file_diff, "inline diff")
+            self.assertEqual(solution.original_code, "inline before")
+
+    @fixture(BasicIncidentStore, GitRepo)
+    def test_find_solutions_many(self):
+        self.repo = git.Repo.init(self.repo_path)
+        old_commit = self.commit_file("Main.java", "class Main {\n  int a;\n}\n")
+        new_commit = self.commit_file("Main.java", "class Main {\n}\n")
+
+        self.incident_store.load_report(
+            self.local_application(old_commit), self.local_report([0, 1], "initial")
+        )
+        self.incident_store.load_report(
+            self.local_application(new_commit), self.local_report([0], "solved")
+        )
+
+        def incident(violation_name: str, variables: dict):
+            return ExtendedIncident(
+                uri="file:///Main.java",
+                message="test_message",
+                ruleset_name="test_ruleset",
+                violation_name=violation_name,
+                variables=variables,
+            )
+
+        incidents = [
+            incident("test_violation", {"x": [2, 1], "file": "Main.java"}),
+            incident("other_violation", {"x": [1, 2]}),
+            incident("test_violation", {"x": [1, 2]}),
+        ]
+
+        result = self.incident_store.find_solutions_many(incidents)
+
+        self.assertEqual([len(x) for x in result], [1, 0, 1])
+        self.assertEqual(result[0][0].uri, "file:///Main.java")
+        self.assertEqual(incidents[0].variables, {"x": [2, 1], "file": "Main.java"})
+        self.assertEqual(self.incident_store.find_solutions_many([]), [])
+
+    @fixture(FakeLLMIncidentStore, GitRepo)
+    def test_find_solutions_defers_post_processing(self):
+        self.repo = git.Repo.init(self.repo_path)
+        old_commit = self.commit_file("Main.java", "class Main {\n  int a;\n}\n")
+        new_commit = self.commit_file("Main.java", "class Main {\n}\n")
+
+        self.incident_store.load_report(
+            self.local_application(old_commit), self.local_report([0, 1], "initial")
+        )
+        self.incident_store.load_report(
+            self.local_application(new_commit), self.local_report([0], "solved")
+        )
+
+        solutions = self.incident_store.find_solutions(
+            "test_ruleset", "test_violation", {"x": [1, 2]}
+        )
+
+        self.assertEqual(len(solutions), 1)
+        self.assertIs(solutions[0].llm_summary_generated, False)
+        self.assertIsNone(solutions[0].llm_summary)
+
+        self.incident_store.post_processing_queue.wait()
+
+        solutions = self.incident_store.find_solutions(
+            "test_ruleset", "test_violation", {"x": [1, 2]}
+        )
+
+        self.assertIs(solutions[0].llm_summary_generated, True)
+        self.assertIn("Frobinate the widget", solutions[0].llm_summary)
+
+    @fixture(BasicIncidentStore)
+    def test_close(self):
+        self.incident_store.solution_detection_workers = 2
+        executor = self.incident_store.detection_executor()
+        self.assertEqual(executor.submit(sum, [1, 2]).result(), 3)
+
+        self.incident_store.close()
+
+        self.assertIsNone(self.incident_store._detection_executor)
+        with self.assertRaises(RuntimeError):
+            executor.submit(sum, [1, 2])
+        self.assertIsNone(self.incident_store.post_processing_queue._executor)
+
     @fixture(BasicIncidentStore, GitRepo)
     def test_load_store(self):
         initial_report = Report.load_report_from_file(
@@ -320,6 +598,18 @@ class TestIncidentStore(unittest.TestCase):
                     )
                 )
 
+        # find_solutions is read-only, summaries are generated in the background
+
+        for query in queries:
+            solutions = self.incident_store.find_solutions(
+                query[0], query[1], query[2], query[3]
+            )
+
+            for solution in solutions:
+                self.assertTrue(solution.llm_summary_generated is False)
+
+        self.incident_store.post_processing_queue.wait()
+
         for query in queries:
             solutions = self.incident_store.find_solutions(
                 query[0], query[1], query[2], query[3]
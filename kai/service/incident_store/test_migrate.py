@@ -0,0 +1,177 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import Engine, create_engine, inspect, text
+
+from kai.models.kai_config import KaiConfigIncidentStoreSQLiteArgs
+from kai.service.incident_store import migrate
+from kai.service.incident_store.backend import SQLiteBackend
+from kai.service.incident_store.incident_store import (
+    IncidentStore,
+    incident_variables_hash,
+)
+from kai.service.incident_store.sql_types import SQLBase
+
+NEW_INDEXES = ["ix_incidents_violation_solution", "ix_incidents_application_solution"]
+BLOB_COLUMNS = ["file_diff_hash", "original_code_hash", "updated_code_hash"]
+NEW_TABLES = ["solution_blobs", "jobs"]
+
+
+class TestMigrate(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.connection_string = f"sqlite:///{os.path.join(tmp.name, 'kai.db')}"
+
+    def incident_store(self) -> IncidentStore:
+        store = IncidentStore(
+            SQLiteBackend(
+                KaiConfigIncidentStoreSQLiteArgs(
+                    connection_string=self.connection_string
+                )
+            ),
+            MagicMock(),
+            MagicMock(),
+        )
+        self.addCleanup(store.engine.dispose)
+
+        return store
+
+    def baseline_store(self) -> Engine:
+        """
+        Creates a store as it was before migrations existed.
+        """
+        engine = create_engine(self.connection_string)
+        self.addCleanup(engine.dispose)
+
+        SQLBase.metadata.create_all(engine)
+        with engine.begin() as conn:
+            for index in NEW_INDEXES + ["ix_incidents_solution_lookup"]:
+                conn.execute(text(f"DROP INDEX {index}"))
+            conn.execute(
+                text("ALTER TABLE incidents DROP COLUMN incident_variables_hash")
+            )
+            for column in BLOB_COLUMNS:
+                conn.execute(
+                    text(f"ALTER TABLE accepted_solutions DROP COLUMN {column}")
+                )
+            for table in NEW_TABLES:
+                conn.execute(text(f"DROP TABLE {table}"))
+
+        return engine
+
+    def tables(self, engine: Engine) -> set[str]:
+        return set(inspect(engine).get_table_names())
+
+    def incident_indexes(self, engine: Engine) -> set[str]:
+        return {i["name"] for i in inspect(engine).get_indexes("incidents")}
+
+    def incident_columns(self, engine: Engine) -> set[str]:
+        return {c["name"] for c in inspect(engine).get_columns("incidents")}
+
+    def solution_columns(self, engine: Engine) -> set[str]:
+        return {c["name"] for c in inspect(engine).get_columns("accepted_solutions")}
+
+    def test_new_store(self):
+        store = self.incident_store()
+
+        with store.engine.connect() as conn:
+            self.assertEqual(
+                migrate.current_revision(conn), migrate.head_revision(store.engine)
+            )
+            # The migrations and the models agree
+            self.assertEqual(
+                compare_metadata(MigrationContext.configure(conn), SQLBase.metadata),
+                [],
+            )
+
+        self.assertTrue(set(NEW_INDEXES) <= self.incident_indexes(store.engine))
+
+    def test_existing_store(self):
+        engine = self.baseline_store()
+
+        with self.assertRaisesRegex(RuntimeError, "migrate.py upgrade"):
+            self.incident_store()
+
+        with engine.connect() as conn:
+            self.assertEqual(migrate.current_revision(conn), migrate.BASELINE_REVISION)
+        # Startup leaves the schema to the migrations
+        self.assertFalse(set(NEW_TABLES) & self.tables(engine))
+        self.assertFalse(set(NEW_INDEXES) & self.incident_indexes(engine))
+        self.assertFalse(set(BLOB_COLUMNS) & self.solution_columns(engine))
+
+        migrate.upgrade(engine)
+
+        store = self.incident_store()
+        with store.engine.connect() as conn:
+            self.assertEqual(
+                migrate.current_revision(conn), migrate.head_revision(store.engine)
+            )
+            self.assertEqual(
+                compare_metadata(MigrationContext.configure(conn), SQLBase.metadata),
+                [],
+            )
+
+    def test_behind_store(self):
+        store = self.incident_store()
+        command.downgrade(migrate.alembic_config(store.engine), "-1")
+
+        with self.assertRaisesRegex(RuntimeError, "migrate.py upgrade"):
+            self.incident_store()
+
+    def test_downgrade(self):
+        store = self.incident_store()
+
+        command.downgrade(
+            migrate.alembic_config(store.engine), migrate.BASELINE_REVISION
+        )
+
+        self.assertFalse(set(NEW_TABLES) & self.tables(store.engine))
+        self.assertFalse(set(NEW_INDEXES) & self.incident_indexes(store.engine))
+        self.assertFalse(set(BLOB_COLUMNS) & self.solution_columns(store.engine))
+        self.assertNotIn("incident_variables_hash", self.incident_columns(store.engine))
+
+        migrate.upgrade(store.engine)
+
+        with store.engine.connect() as conn:
+            self.assertEqual(
+                compare_metadata(MigrationContext.configure(conn), SQLBase.metadata),
+                [],
+            )
+
+    def test_delete_store(self):
+        store = self.incident_store()
+        store.delete_store()
+
+        with store.engine.connect() as conn:
+            self.assertEqual(
+                migrate.current_revision(conn), migrate.head_revision(store.engine)
+            )
+
+    def test_incident_variables_hash(self):
+        engine = self.baseline_store()
+        with engine.begin() as conn:
+            conn.execute(
+                text(
+                    "INSERT INTO incidents (violation_name, ruleset_name, "
+                    "application_name, incident_uri, incident_message, incident_snip, "
+                    "incident_line, incident_variables) VALUES ('v', 'r', 'a', "
+                    """'file:///Main.java', 'm', 's', 0, '{"x": [2, 1], "file": "f"}')"""
+                )
+            )
+
+        migrate.upgrade(engine)
+
+        self.assertIn("ix_incidents_solution_lookup", self.incident_indexes(engine))
+        with engine.connect() as conn:
+            self.assertEqual(
+                conn.execute(
+                    text("SELECT incident_variables_hash FROM incidents")
+                ).scalar(),
+                incident_variables_hash({"x": [1, 2]}),
+            )
@@ -0,0 +1,146 @@
+import asyncio
+import copy
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+from aiohttp import web
+from pydantic import BaseModel
+
+from kai.service.incident_store.jobs import JobStore
+from kai.service.llm_interfacing.request_limiter import RequestLimiter
+
+KAI_LOG = logging.getLogger(__name__)
+
+# Does the work of a job. Receives a callback for the progress events of
+# `KaiApplication.astream_incident_solutions_for_file` and returns the result.
+JobFunction = Callable[[Callable[[dict], Awaitable[None]]], Awaitable[BaseModel]]
+
+
+class JobRunner:
+    """
+    Runs jobs in the background as tasks on the server's event loop, at most
+    `max_workers` at a time, and records their state in `job_store`. Jobs
+    share the loop (and its LLM clients) with the requests, so they must not
+    block it.
+
+    As a job runs, its progress holds the number of batches, the batches
+    completed so far with the file as updated by the latest one, and the
+    number of retries. Tokens aren't recorded.
+
+    Unfinished jobs left behind by a runner that stopped are failed when the
+    next one starts.
+    """
+
+    def __init__(self, job_store: JobStore, max_workers: int = 4):
+        self.job_store = job_store
+        self.max_workers = max_workers
+
+        self.limiter = RequestLimiter(max_concurrent_requests=max_workers)
+
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._heartbeat: Optional[asyncio.Task] = None
+
+        self.job_store.fail_abandoned()
+
+    async def submit(self, kind: str, params: dict[str, Any], run: JobFunction) -> str:
+        """
+        Records a job of `kind`, queues `run` and returns the job's id. `params`
+        are stored with the job for reference.
+        """
+        job_id = await asyncio.to_thread(self.job_store.create, kind, params)
+
+        task = asyncio.create_task(self._run(job_id, run), name=f"kai-job-{job_id}")
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+        if self._heartbeat is None:
+            self._heartbeat = asyncio.create_task(self._send_heartbeats())
+
+        KAI_LOG.info(f"Queued {kind} job {job_id}")
+
+        return job_id
+
+    async def _run(self, job_id: str, run: JobFunction):
+        progress: dict[str, Any] = {
+            "batch_count": 0,
+            "completed_batches": [],
+            "retries": 0,
+            "updated_file": None,
+            "reasoning": [],
+        }
+        # Parallel batches report at the same time, so store their progress
+        # in order
+        progress_lock = asyncio.Lock()
+
+        async def on_event(event: dict):
+            async with progress_lock:
+                match event["event"]:
+                    case "batch_start":
+                        progress["batch_count"] = max(
+                            progress["batch_count"], event["batch_count"]
+                        )
+                    case "batch_end":
+                        progress["completed_batches"].append(event["batch"])
+                        progress["updated_file"] = event["updated_file"]
+                        progress["reasoning"].append(event["reasoning"])
+                    case "retry":
+                        progress["retries"] += 1
+                    case _:
+                        return
+
+                await asyncio.to_thread(
+                    self.job_store.progress, job_id, copy.deepcopy(progress)
+                )
+
+        try:
+            async with self.limiter.aslot():
+                await asyncio.to_thread(self.job_store.start, job_id)
+                result = await run(on_event)
+        except asyncio.CancelledError:
+            KAI_LOG.warning(f"Job {job_id} cancelled")
+            await asyncio.to_thread(
+                self.job_store.fail,
+                job_id,
+                "The server stopped before the job finished",
+            )
+            raise
+        except Exception as e:
+            error = e.text if isinstance(e, web.HTTPException) and e.text else str(e)
+            KAI_LOG.error(f"Job {job_id} failed: {error}")
+            await asyncio.to_thread(self.job_store.fail, job_id, error)
+            return
+
+        await asyncio.to_thread(self.job_store.succeed, job_id, result.model_dump())
+        KAI_LOG.info(f"Job {job_id} succeeded")
+
+    async def _send_heartbeats(self):
+        while True:
+            await asyncio.sleep(self.job_store.HEARTBEAT_SECONDS)
+
+            if not self._tasks:
+                continue
+
+            try:
+                await asyncio.to_thread(self.job_store.heartbeat, list(self._tasks))
+            except Exception as e:
+                KAI_LOG.warning(f"Failed to record job heartbeat: {e}")
+
+    async def join(self):
+        """
+        Waits for the jobs submitted so far to finish.
+        """
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def shutdown(self):
+        """
+        Cancels the unfinished jobs, which are failed, and stops the runner.
+        """
+        tasks = list(self._tasks.values())
+        if self._heartbeat is not None:
+            tasks.append(self._heartbeat)
+            self._heartbeat = None
+
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,31 +1,55 @@
+import asyncio
 import logging
+import os
 import time
 import traceback
-from typing import Iterator, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, Optional
+from urllib.parse import unquote, urlparse
 
 from aiohttp import web
 from langchain_core.messages import BaseMessage, BaseMessageChunk
 from pydantic import BaseModel, ConfigDict
 
+from kai.constants import PATH_TEMPLATES
 from kai.kai_trace import KaiTrace
 from kai.models.file_solution import guess_language, parse_file_solution_content
 from kai.models.kai_config import KaiConfig
 from kai.models.report_types import ExtendedIncident
 from kai.service.incident_store.backend import incident_store_backend_factory
 from kai.service.incident_store.incident_store import IncidentStore
+from kai.service.kai_application.jobs import JobRunner
+from kai.service.kai_application.prompt_budget import (
+    PromptBudgeter,
+    expand_omitted_lines,
+)
 from kai.service.kai_application.util import (
     BatchMode,
+    BatchStrategy,
+    FileOrder,
     batch_incidents,
     get_prompt,
+    merge_file_edits,
     playback_if_demo_mode,
 )
 from kai.service.llm_interfacing.model_provider import ModelProvider
-from kai.service.solution_handling.consumption import solution_consumer_factory
+from kai.service.llm_interfacing.request_limiter import RequestLimiter
+from kai.service.solution_handling.consumption import (
+    solution_consumer_downgrades,
+    solution_consumer_factory,
+    solution_consumer_fields,
+)
 from kai.service.solution_handling.detection import solution_detection_factory
 from kai.service.solution_handling.production import solution_producer_factory
+from kai.service.solution_handling.solution_types import Solution
+from kai.template_registry import TEMPLATE_REGISTRY
 
 KAI_LOG = logging.getLogger(__name__)
 
+# Receives progress events while a file is processed, see
+# `KaiApplication.astream_incident_solutions_for_file`
+EventCallback = Callable[[dict], Awaitable[None]]
+
 
 # TODO: Possibly merge with FileSolutionContent?
 class UpdatedFileContent(BaseModel):
@@ -56,6 +80,17 @@ class KaiApplication:
         if config.demo_mode:
             KAI_LOG.info("KAI__DEMO_MODE enabled. LLM responses will be cached.")
 
+        # Prompt templates
+
+        TEMPLATE_REGISTRY.auto_reload = config.template_auto_reload
+
+        if config.precompile_templates:
+            template_count = TEMPLATE_REGISTRY.precompile(PATH_TEMPLATES)
+            template_count += TEMPLATE_REGISTRY.precompile(
+                os.path.join(PATH_TEMPLATES, "solution_handling")
+            )
+            KAI_LOG.info(f"Precompiled {template_count} prompt templates")
+
         # Create model provider
 
         self.model_provider = ModelProvider(config.models)
@@ -79,6 +114,11 @@ class KaiApplication:
             backend,
             solution_detector,
             solution_producer,
+            config.incident_store.post_processing_workers,
+            config.incident_store.post_process_on_ingest,
+            config.incident_store.solution_detection_workers,
+            config.incident_store.solution_blob_compression,
+            config.job_retention_seconds,
         )
 
         KAI_LOG.info(f"Selected incident store: {config.incident_store.args.provider}")
@@ -86,6 +126,63 @@ class KaiApplication:
         # Create solution consumer
 
         self.solution_consumer = solution_consumer_factory(config.solution_consumers)
+        # Only these parts of a solution are loaded from the store
+        self.solution_fields = solution_consumer_fields(config.solution_consumers)
+
+        # Create prompt budgeter. Solutions are downgraded to cheaper consumers
+        # when the prompt is too large for the model, so load their fields too.
+
+        solution_consumers = [self.solution_consumer]
+
+        if config.models.max_prompt_tokens is not None:
+            for kinds in solution_consumer_downgrades(config.solution_consumers):
+                solution_consumers.append(solution_consumer_factory(kinds))
+
+                downgrade_fields = solution_consumer_fields(kinds)
+                if self.solution_fields is None or downgrade_fields is None:
+                    self.solution_fields = None
+                else:
+                    self.solution_fields |= downgrade_fields
+
+        self.prompt_budgeter = PromptBudgeter(
+            self.model_provider,
+            solution_consumers,
+            config.models.max_prompt_tokens,
+            count_tokens=config.trace_enabled,
+        )
+
+        # Create job runner
+
+        self.job_runner = JobRunner(self.incident_store.jobs, config.job_workers)
+
+        # Budget of files migrated at once by `amigrate_application`, shared
+        # by every migration
+
+        self.file_limiter = RequestLimiter(
+            max_concurrent_requests=config.migration_max_concurrent_files
+        )
+
+    def after_fork(self):
+        """
+        Re-initializes the per-process resources (database connections and
+        LLM clients) of an application created before forking, e.g. by the
+        gunicorn master when preloading. Thread pools are only created on
+        first use, so a child never inherits one.
+        """
+        self.model_provider.after_fork()
+        self.incident_store.after_fork()
+
+        KAI_LOG.info(f"Re-initialized after fork in process {os.getpid()}")
+
+    async def aclose(self):
+        """
+        Stops the background work of the application (jobs, solution
+        detection and post-processing) and releases its resources. Called
+        when the server shuts down.
+        """
+        await self.job_runner.shutdown()
+        # Waits for post-processing to finish, so keep the event loop free
+        await asyncio.to_thread(self.incident_store.close)
 
     def get_incident_solutions_for_file(
         self,
@@ -97,14 +194,649 @@ class KaiApplication:
         include_solved_incidents: bool = True,
         include_llm_results: bool = False,
         trace: Optional[KaiTrace] = None,
+        batch_strategy: BatchStrategy = BatchStrategy.SEQUENTIAL,
     ):
         """
         Get the updated file content for a given file and set of incidents.
 
+        With `BatchStrategy.PARALLEL_MERGE`, the batches are sent to the LLM
+        concurrently against the original file and the results merged, instead
+        of one after the other.
+
         TODO: Add checks on the incidents' uri to ensure they all match
         file_name.
         """
 
+        trace, src_file_language, result, batched_incidents = self._start_file(
+            file_name,
+            file_contents,
+            application_name,
+            incidents,
+            batch_mode,
+            include_llm_results,
+            trace,
+        )
+
+        solutions_by_incident: dict[int, list[Solution]] = {}
+        if include_solved_incidents:
+            solutions_by_incident = self._find_solutions_by_incident(batched_incidents)
+
+        def run_batch(count: int, batch_result: UpdatedFileContent):
+            prompt, source_windowed = self._batch_prompt(
+                count,
+                batched_incidents,
+                solutions_by_incident,
+                file_name,
+                src_file_language,
+                batch_result,
+                trace,
+            )
+            self._invoke_with_retries(
+                count,
+                prompt,
+                batched_incidents,
+                application_name,
+                file_name,
+                src_file_language,
+                include_llm_results,
+                batch_result,
+                trace,
+                source_windowed=source_windowed,
+            )
+
+        if not self._use_parallel_merge(batch_strategy, batched_incidents):
+            for count in range(1, len(batched_incidents) + 1):
+                run_batch(count, result)
+
+            return result
+
+        batch_results = [
+            self._new_result(file_contents, include_llm_results)
+            for _ in batched_incidents
+        ]
+
+        with ThreadPoolExecutor(max_workers=len(batched_incidents)) as executor:
+            futures = [
+                executor.submit(run_batch, count, batch_result)
+                for count, batch_result in enumerate(batch_results, start=1)
+            ]
+            for future in futures:
+                future.result()
+
+        consolidation_prompt = self._merge_batch_results(
+            batched_incidents,
+            batch_results,
+            file_name,
+            src_file_language,
+            result,
+            trace,
+        )
+
+        if consolidation_prompt is not None:
+            self._invoke_with_retries(
+                len(batched_incidents) + 1,
+                consolidation_prompt,
+                batched_incidents,
+                application_name,
+                file_name,
+                src_file_language,
+                include_llm_results,
+                result,
+                trace,
+            )
+
+        return result
+
+    async def aget_incident_solutions_for_file(
+        self,
+        file_name: str,
+        file_contents: str,
+        application_name: str,
+        incidents: list[ExtendedIncident],
+        batch_mode: BatchMode = BatchMode.SINGLE_GROUP,
+        include_solved_incidents: bool = True,
+        include_llm_results: bool = False,
+        trace: Optional[KaiTrace] = None,
+        batch_strategy: BatchStrategy = BatchStrategy.SEQUENTIAL,
+        events: Optional[EventCallback] = None,
+    ):
+        """
+        Async version of `get_incident_solutions_for_file`. The incident store
+        is queried on a worker thread and the LLM is called with `ainvoke`, so
+        the event loop keeps serving other requests in the meantime.
+
+        If `events` is set, progress is reported to it as the batches run. See
+        `astream_incident_solutions_for_file`.
+        """
+
+        trace, src_file_language, result, batched_incidents = self._start_file(
+            file_name,
+            file_contents,
+            application_name,
+            incidents,
+            batch_mode,
+            include_llm_results,
+            trace,
+        )
+
+        solutions_by_incident: dict[int, list[Solution]] = {}
+        if include_solved_incidents:
+            solutions_by_incident = await asyncio.to_thread(
+                self._find_solutions_by_incident, batched_incidents
+            )
+
+        async def batch_start(count: int, incident_count: int):
+            if events is not None:
+                await events(
+                    {
+                        "event": "batch_start",
+                        "batch": count,
+                        "batch_count": len(batched_incidents),
+                        "incident_count": incident_count,
+                        "consolidation": count > len(batched_incidents),
+                    }
+                )
+
+        async def run_batch(count: int, batch_result: UpdatedFileContent):
+            await batch_start(count, len(batched_incidents[count - 1][1]))
+
+            prompt, source_windowed = self._batch_prompt(
+                count,
+                batched_incidents,
+                solutions_by_incident,
+                file_name,
+                src_file_language,
+                batch_result,
+                trace,
+            )
+            await self._ainvoke_with_retries(
+                count,
+                prompt,
+                batched_incidents,
+                application_name,
+                file_name,
+                src_file_language,
+                include_llm_results,
+                batch_result,
+                trace,
+                events,
+                source_windowed=source_windowed,
+            )
+
+        if not self._use_parallel_merge(batch_strategy, batched_incidents):
+            for count in range(1, len(batched_incidents) + 1):
+                await run_batch(count, result)
+
+            return result
+
+        batch_results = [
+            self._new_result(file_contents, include_llm_results)
+            for _ in batched_incidents
+        ]
+
+        await asyncio.gather(
+            *(
+                run_batch(count, batch_result)
+                for count, batch_result in enumerate(batch_results, start=1)
+            )
+        )
+
+        consolidation_prompt = self._merge_batch_results(
+            batched_incidents,
+            batch_results,
+            file_name,
+            src_file_language,
+            result,
+            trace,
+        )
+
+        if consolidation_prompt is not None:
+            await batch_start(len(batched_incidents) + 1, 0)
+            await self._ainvoke_with_retries(
+                len(batched_incidents) + 1,
+                consolidation_prompt,
+                batched_incidents,
+                application_name,
+                file_name,
+                src_file_language,
+                include_llm_results,
+                result,
+                trace,
+                events,
+            )
+
+        return result
+
+    async def astream_incident_solutions_for_file(
+        self,
+        file_name: str,
+        file_contents: str,
+        application_name: str,
+        incidents: list[ExtendedIncident],
+        batch_mode: BatchMode = BatchMode.SINGLE_GROUP,
+        include_solved_incidents: bool = True,
+        include_llm_results: bool = False,
+        trace: Optional[KaiTrace] = None,
+        batch_strategy: BatchStrategy = BatchStrategy.SEQUENTIAL,
+    ) -> AsyncIterator[dict]:
+        """
+        Streaming version of `aget_incident_solutions_for_file`. Yields these
+        events, each a dict with an "event" key:
+
+        - "batch_start": a batch ("batch", 1-indexed, of "batch_count") was
+          sent to the LLM. With `BatchStrategy.PARALLEL_MERGE`, an extra batch
+          with "consolidation" set combines conflicting edits.
+        - "token": the LLM returned more of its response ("content") to the
+          batch.
+        - "retry": the response to the batch was unusable ("error"). Its
+          tokens should be discarded, as the batch is sent again.
+        - "batch_end": the batch is done, with the file as updated by it
+          ("updated_file").
+        - "result": the final `UpdatedFileContent`, as a dict ("result").
+
+        Raises like `aget_incident_solutions_for_file` if the file fails.
+        """
+        queue: asyncio.Queue[Optional[dict]] = asyncio.Queue()
+
+        async def run():
+            try:
+                result = await self.aget_incident_solutions_for_file(
+                    file_name,
+                    file_contents,
+                    application_name,
+                    incidents,
+                    batch_mode,
+                    include_solved_incidents,
+                    include_llm_results,
+                    trace,
+                    batch_strategy,
+                    events=queue.put,
+                )
+                await queue.put({"event": "result", "result": result.model_dump()})
+            finally:
+                await queue.put(None)
+
+        task = asyncio.create_task(run())
+
+        try:
+            while (event := await queue.get()) is not None:
+                yield event
+
+            await task
+        finally:
+            # The consumer stopped early, e.g. the client went away
+            task.cancel()
+
+    async def amigrate_application(
+        self,
+        application_name: str,
+        repo_path: str,
+        impacted_files: dict[str, list[ExtendedIncident]],
+        batch_mode: BatchMode = BatchMode.SINGLE_GROUP,
+        include_solved_incidents: bool = True,
+        include_llm_results: bool = False,
+        batch_strategy: BatchStrategy = BatchStrategy.SEQUENTIAL,
+        file_order: FileOrder = FileOrder.TOKEN_SIZE,
+    ) -> AsyncIterator[dict]:
+        """
+        Migrates every file in `impacted_files` (paths relative to `repo_path`,
+        with their incidents), as `aget_incident_solutions_for_file` would.
+        Files are started in `file_order` and run concurrently, at most
+        `migration_max_concurrent_files` at a time across every migration.
+        Yields these events, each a dict with an "event" key:
+
+        - "migration_start": the number of files ("file_count") and incidents
+          ("incident_count") to migrate.
+        - "file_start": a file ("file_name") was started.
+        - "file_end": a file is done, with its `UpdatedFileContent` as a dict
+          ("result").
+        - "file_error": a file couldn't be read or migrated ("error"). The
+          others carry on.
+        - "migration_end": the number of files that "succeeded" and "failed".
+        """
+        files = await asyncio.to_thread(
+            self._read_application_files, repo_path, impacted_files, file_order
+        )
+
+        queue: asyncio.Queue[dict] = asyncio.Queue()
+
+        async def migrate_file(
+            file_name: str, file_contents: str, incidents: list[ExtendedIncident]
+        ):
+            try:
+                async with self.file_limiter.aslot():
+                    await queue.put({"event": "file_start", "file_name": file_name})
+
+                    result = await self.aget_incident_solutions_for_file(
+                        file_name,
+                        file_contents,
+                        application_name,
+                        incidents,
+                        batch_mode,
+                        include_solved_incidents,
+                        include_llm_results,
+                        batch_strategy=batch_strategy,
+                    )
+
+                await queue.put(
+                    {
+                        "event": "file_end",
+                        "file_name": file_name,
+                        "result": result.model_dump(),
+                    }
+                )
+            except Exception as e:
+                KAI_LOG.error(f"Migrating {file_name} failed: {e}")
+                error = (
+                    e.text if isinstance(e, web.HTTPException) and e.text else str(e)
+                )
+                await queue.put(
+                    {"event": "file_error", "file_name": file_name, "error": error}
+                )
+
+        yield {
+            "event": "migration_start",
+            "file_count": len(files),
+            "incident_count": sum(len(incidents) for _, _, incidents, _ in files),
+        }
+
+        failed = 0
+        tasks: list[asyncio.Task] = []
+        for file_name, file_contents, incidents, error in files:
+            if error is not None:
+                failed += 1
+                yield {"event": "file_error", "file_name": file_name, "error": error}
+                continue
+
+            # Tasks queue for the file limiter in the order they're created
+            tasks.append(
+                asyncio.create_task(migrate_file(file_name, file_contents, incidents))
+            )
+
+        succeeded = 0
+        try:
+            while succeeded + failed < len(files):
+                event = await queue.get()
+                match event["event"]:
+                    case "file_end":
+                        succeeded += 1
+                    case "file_error":
+                        failed += 1
+
+                yield event
+        finally:
+            # The consumer stopped early, e.g. the client went away
+            for task in tasks:
+                task.cancel()
+
+        yield {"event": "migration_end", "succeeded": succeeded, "failed": failed}
+
+    def application_repo_path(self, application_name: str, repo_uri_local: str) -> str:
+        """
+        Returns the path of `repo_uri_local`, a path or file:// URI of a
+        checkout of the application, to read its files from. Only the checkout
+        the application was loaded into the incident store from, or one under
+        `migration_repo_roots`, are accepted. Raises HTTPBadRequest otherwise.
+        """
+
+        def local_path(uri: str) -> str:
+            return os.path.realpath(unquote(urlparse(uri).path))
+
+        repo_path = local_path(repo_uri_local)
+
+        stored_uri = self.incident_store.application_repo_uri(application_name)
+        if stored_uri is not None and local_path(stored_uri) == repo_path:
+            return repo_path
+
+        for root in self.config.migration_repo_roots:
+            root = os.path.realpath(root)
+            if os.path.commonpath([root, repo_path]) == root:
+                return repo_path
+
+        raise web.HTTPBadRequest(
+            text=f"repo_uri_local {repo_uri_local} is not a known checkout of {application_name}"
+        )
+
+    def _read_application_files(
+        self,
+        repo_path: str,
+        impacted_files: dict[str, list[ExtendedIncident]],
+        file_order: FileOrder,
+    ) -> list[tuple[str, str, list[ExtendedIncident], Optional[str]]]:
+        """
+        Reads the files of `impacted_files` from `repo_path` and sorts them by
+        `file_order`. Returns (file name, contents, incidents, error) for each,
+        where error is set instead of the contents if the file can't be read.
+        """
+        repo_root = os.path.realpath(repo_path)
+
+        files: list[tuple[str, str, list[ExtendedIncident], Optional[str]]] = []
+        for file_name, incidents in impacted_files.items():
+            file_name = str(file_name)
+            path = os.path.realpath(os.path.join(repo_root, file_name))
+
+            if os.path.commonpath([repo_root, path]) != repo_root:
+                files.append((file_name, "", incidents, "File is outside the repo"))
+                continue
+
+            try:
+                with open(path, "r") as f:
+                    files.append((file_name, f.read(), incidents, None))
+            except OSError as e:
+                files.append((file_name, "", incidents, str(e)))
+
+        match file_order:
+            case FileOrder.INCIDENT_COUNT:
+                files.sort(key=lambda file: len(file[2]), reverse=True)
+            case FileOrder.TOKEN_SIZE:
+                files.sort(
+                    key=lambda file: self.model_provider.count_tokens(file[1]),
+                    reverse=True,
+                )
+
+        return files
+
+    def _invoke_with_retries(
+        self,
+        count: int,
+        prompt: str,
+        batched_incidents: list[tuple[dict, list[ExtendedIncident]]],
+        application_name: str,
+        file_name: str,
+        src_file_language: str,
+        include_llm_results: bool,
+        result: UpdatedFileContent,
+        trace: KaiTrace,
+        source_windowed: bool = False,
+    ):
+        """
+        Sends the prompt for the `count`-th step to the LLM and applies the
+        response to `result`, retrying until a usable response comes back.
+        `source_windowed` tells whether the prompt only had part of the file.
+        """
+        llm_result = None
+        for retry_attempt_count in range(self.model_provider.llm_retries):
+            try:
+                with playback_if_demo_mode(
+                    self.config.demo_mode,
+                    self.model_provider.model_id,
+                    application_name,
+                    f'{file_name.replace("/", "-")}',
+                ):
+                    llm_result = self.model_provider.invoke(
+                        prompt, use_cache=retry_attempt_count == 0
+                    )
+                    trace.llm_result(count, retry_attempt_count, llm_result)
+
+                    self._apply_llm_result(
+                        llm_result,
+                        prompt,
+                        file_name,
+                        src_file_language,
+                        include_llm_results,
+                        result,
+                        source_windowed,
+                    )
+                    return
+            except Exception as e:
+                delay = self.model_provider.retry_delay(retry_attempt_count)
+                self._log_llm_failure(
+                    e,
+                    count,
+                    retry_attempt_count,
+                    batched_incidents,
+                    file_name,
+                    delay,
+                    trace,
+                )
+                time.sleep(delay)
+
+        self._raise_migration_failed(file_name, llm_result)
+
+    async def _ainvoke_with_retries(
+        self,
+        count: int,
+        prompt: str,
+        batched_incidents: list[tuple[dict, list[ExtendedIncident]]],
+        application_name: str,
+        file_name: str,
+        src_file_language: str,
+        include_llm_results: bool,
+        result: UpdatedFileContent,
+        trace: KaiTrace,
+        events: Optional[EventCallback] = None,
+        source_windowed: bool = False,
+    ):
+        """
+        Async version of `_invoke_with_retries`. If `events` is set, the
+        response is streamed and passed to it token by token, followed by the
+        updated file.
+        """
+        llm_result = None
+        for retry_attempt_count in range(self.model_provider.llm_retries):
+            try:
+                with playback_if_demo_mode(
+                    self.config.demo_mode,
+                    self.model_provider.model_id,
+                    application_name,
+                    f'{file_name.replace("/", "-")}',
+                ):
+                    use_cache = retry_attempt_count == 0
+
+                    if events is None:
+                        llm_result = await self.model_provider.ainvoke(
+                            prompt, use_cache=use_cache
+                        )
+                    else:
+                        llm_result = None
+                        async for chunk in self.model_provider.astream(
+                            prompt, use_cache=use_cache
+                        ):
+                            llm_result = (
+                                chunk if llm_result is None else llm_result + chunk
+                            )
+                            await events(
+                                {
+                                    "event": "token",
+                                    "batch": count,
+                                    "content": chunk.content,
+                                }
+                            )
+
+                        if llm_result is None:
+                            raise Exception("Error in LLM Response: Empty response")
+
+                    trace.llm_result(count, retry_attempt_count, llm_result)
+
+                    self._apply_llm_result(
+                        llm_result,
+                        prompt,
+                        file_name,
+                        src_file_language,
+                        include_llm_results,
+                        result,
+                        source_windowed,
+                    )
+
+                    if events is not None:
+                        await events(
+                            {
+                                "event": "batch_end",
+                                "batch": count,
+                                "updated_file": result.updated_file,
+                                "reasoning": result.total_reasoning[-1],
+                                "additional_information": result.additional_information[
+                                    -1
+                                ],
+                            }
+                        )
+                    return
+            except Exception as e:
+                delay = self.model_provider.retry_delay(retry_attempt_count)
+                self._log_llm_failure(
+                    e,
+                    count,
+                    retry_attempt_count,
+                    batched_incidents,
+                    file_name,
+                    delay,
+                    trace,
+                )
+
+                # Tokens streamed so far are to be discarded
+                if events is not None:
+                    await events(
+                        {
+                            "event": "retry",
+                            "batch": count,
+                            "attempt": retry_attempt_count + 1,
+                            "error": str(e),
+                        }
+                    )
+
+                await asyncio.sleep(delay)
+
+        self._raise_migration_failed(file_name, llm_result)
+
+    def _use_parallel_merge(
+        self,
+        batch_strategy: BatchStrategy,
+        batched_incidents: list[tuple[dict, list[ExtendedIncident]]],
+    ) -> bool:
+        if batch_strategy != BatchStrategy.PARALLEL_MERGE:
+            return False
+
+        if len(batched_incidents) < 2:
+            return False
+
+        # Demo mode replays LLM responses from a single cassette per file,
+        # which can't be shared by concurrent requests
+        if self.config.demo_mode:
+            KAI_LOG.info("Demo mode enabled, processing batches sequentially")
+            return False
+
+        return True
+
+    def _start_file(
+        self,
+        file_name: str,
+        file_contents: str,
+        application_name: str,
+        incidents: list[ExtendedIncident],
+        batch_mode: BatchMode,
+        include_llm_results: bool,
+        trace: Optional[KaiTrace],
+    ) -> tuple[
+        KaiTrace,
+        str,
+        UpdatedFileContent,
+        list[tuple[dict, list[ExtendedIncident]]],
+    ]:
+        """
+        Common setup of `get_incident_solutions_for_file` and its async
+        version. Returns the trace, the language of the file, the initial
+        result, and the incident batches.
+        """
         if trace is None:
             trace = KaiTrace(
                 trace_enabled=self.config.trace_enabled,
@@ -118,7 +850,14 @@ class KaiApplication:
         src_file_language = guess_language(file_contents, filename=file_name)
         KAI_LOG.debug(f"{file_name} classified as language {src_file_language}")
 
-        result = UpdatedFileContent(
+        result = self._new_result(file_contents, include_llm_results)
+
+        return trace, src_file_language, result, batch_incidents(incidents, batch_mode)
+
+    def _new_result(
+        self, file_contents: str, include_llm_results: bool
+    ) -> UpdatedFileContent:
+        return UpdatedFileContent(
             updated_file=file_contents,
             total_reasoning=[],
             used_prompts=[],
@@ -127,96 +866,193 @@ class KaiApplication:
             llm_results=[] if include_llm_results else None,
         )
 
-        batched_incidents = batch_incidents(incidents, batch_mode)
+    def _find_solutions_by_incident(
+        self, batched_incidents: list[tuple[dict, list[ExtendedIncident]]]
+    ) -> dict[int, list[Solution]]:
+        """
+        Look up the solutions for every incident in the file at once, keyed by
+        the id of the incident object.
+        """
+        all_incidents = [x for _, batch in batched_incidents for x in batch]
 
-        for count, (_group_by, incidents) in enumerate(batched_incidents, 1):
-            KAI_LOG.info(
-                f"Processing incident batch {count}/{len(batched_incidents)} with {len(incidents)} incident(s) for {file_name}"
+        return {
+            id(incident): solutions
+            for incident, solutions in zip(
+                all_incidents,
+                self.incident_store.find_solutions_many(
+                    all_incidents, self.solution_fields
+                ),
             )
+        }
+
+    def _batch_prompt(
+        self,
+        count: int,
+        batched_incidents: list[tuple[dict, list[ExtendedIncident]]],
+        solutions_by_incident: dict[int, list[Solution]],
+        file_name: str,
+        src_file_language: str,
+        result: UpdatedFileContent,
+        trace: KaiTrace,
+    ) -> tuple[str, bool]:
+        """
+        Renders the prompt for the `count`-th (1-indexed) batch of incidents,
+        against the file as updated by the previous batches. Returns the
+        prompt and whether the file was windowed to fit it.
+        """
+        incidents = batched_incidents[count - 1][1]
 
-            # Transform incidents into a format that can be passed to Jinja
+        KAI_LOG.info(
+            f"Processing incident batch {count}/{len(batched_incidents)} with {len(incidents)} incident(s) for {file_name}"
+        )
 
-            pb_incidents = [incident.model_dump() for incident in incidents]
+        # Transform incidents into a format that can be passed to Jinja
 
-            for pb_incident in pb_incidents:
-                if include_solved_incidents:
-                    solutions = self.incident_store.find_solutions(
-                        pb_incident["ruleset_name"],
-                        pb_incident["violation_name"],
-                        pb_incident["variables"],
-                        pb_incident["code_snip"],
-                    )
+        pb_incidents: list[dict] = []
+        solutions: list[Optional[Solution]] = []
 
-                    if len(solutions) != 0:
-                        solution_str = self.solution_consumer(solutions[0])
+        for incident in incidents:
+            pb_incidents.append(incident.model_dump())
 
-                        if len(solution_str) != 0:
-                            pb_incident["solution_str"] = solution_str
+            incident_solutions = solutions_by_incident.get(id(incident), [])
+            solutions.append(incident_solutions[0] if incident_solutions else None)
 
-            pb_vars = {
-                "src_file_name": file_name,
-                "src_file_language": src_file_language,
-                "src_file_contents": result.updated_file,
-                "incidents": pb_incidents,
-                "model_provider": self.model_provider,
-            }
+        pb_vars = {
+            "src_file_name": file_name,
+            "src_file_language": src_file_language,
+            "src_file_contents": result.updated_file,
+            "incidents": pb_incidents,
+            "model_provider": self.model_provider,
+        }
 
-            # Render the prompt
+        # Render the prompt, cutting it down if it doesn't fit the model
 
-            prompt = get_prompt(self.model_provider.template, pb_vars)
-            trace.prompt(count, prompt, pb_vars)
+        budgeted = self.prompt_budgeter.assemble(
+            lambda pb_vars: get_prompt(self.model_provider.template, pb_vars),
+            pb_vars,
+            solutions,
+        )
+        prompt = budgeted.prompt
 
-            # Send the prompt to the llm
+        trace.prompt(count, prompt, budgeted.pb_vars)
+        trace.prompt_budget(
+            count, budgeted.report(self.prompt_budgeter.max_prompt_tokens)
+        )
 
-            KAI_LOG.debug(f"Sending prompt: {prompt}")
-            llm_result = None
-            for retry_attempt_count in range(self.model_provider.llm_retries):
-                try:
-                    with playback_if_demo_mode(
-                        self.config.demo_mode,
-                        self.model_provider.model_id,
-                        application_name,
-                        f'{file_name.replace("/", "-")}',
-                    ):
-                        llm_result = self.model_provider.llm.invoke(prompt)
-                        trace.llm_result(count, retry_attempt_count, llm_result)
+        KAI_LOG.debug(f"Sending prompt: {prompt}")
 
-                        content = parse_file_solution_content(
-                            src_file_language, llm_result.content
-                        )
+        return prompt, budgeted.source_context_lines is not None
 
-                        if not content.updated_file:
-                            raise Exception(
-                                f"Error in LLM Response: The LLM did not provide an updated file for {file_name}"
-                            )
+    def _merge_batch_results(
+        self,
+        batched_incidents: list[tuple[dict, list[ExtendedIncident]]],
+        batch_results: list[UpdatedFileContent],
+        file_name: str,
+        src_file_language: str,
+        result: UpdatedFileContent,
+        trace: KaiTrace,
+    ) -> Optional[str]:
+        """
+        Merges the results of batches that were run against the original file
+        into `result`. If the updated files can't be merged cleanly, returns
+        the prompt asking the LLM to consolidate them, otherwise None.
+        """
+        for batch_result in batch_results:
+            result.used_prompts.extend(batch_result.used_prompts)
+            result.total_reasoning.extend(batch_result.total_reasoning)
+            result.additional_information.extend(batch_result.additional_information)
+            if result.llm_results is not None:
+                result.llm_results.extend(batch_result.llm_results)
 
-                        result.updated_file = content.updated_file
-                        result.used_prompts.append(prompt)
-                        result.total_reasoning.append(content.reasoning)
-                        result.additional_information.append(content.additional_info)
-                        if include_llm_results:
-                            result.llm_results.append(llm_result.content)
-
-                        break
-                except Exception as e:
-                    KAI_LOG.warn(
-                        f"Request to model failed for batch {count}/{len(batched_incidents)} for {file_name} with exception {e}, retrying in {self.model_provider.llm_retry_delay}s\n{e}"
-                    )
-                    KAI_LOG.debug(traceback.format_exc())
-                    trace.exception(
-                        count, retry_attempt_count, e, traceback.format_exc()
-                    )
-                    time.sleep(self.model_provider.llm_retry_delay)
-            else:
-                KAI_LOG.error(f"{file_name} failed to migrate")
-
-                # TODO: These should be real exceptions
-                raise web.HTTPInternalServerError(
-                    reason="Migration failed",
-                    text=f"The LLM did not generate a valid response: {llm_result}",
-                )
+        merged_file = merge_file_edits(
+            result.updated_file, [x.updated_file for x in batch_results]
+        )
 
-        return result
+        if merged_file is not None:
+            result.updated_file = merged_file
+            return None
+
+        KAI_LOG.info(
+            f"Edits of {len(batch_results)} batches conflict for {file_name}, consolidating"
+        )
+
+        pb_vars = {
+            "src_file_name": file_name,
+            "src_file_language": src_file_language,
+            "src_file_contents": result.updated_file,
+            "versions": [
+                {
+                    "incidents": [x.model_dump() for x in batch],
+                    "updated_file": batch_result.updated_file,
+                }
+                for (_, batch), batch_result in zip(batched_incidents, batch_results)
+            ],
+            "model_provider": self.model_provider,
+        }
+
+        prompt = get_prompt("batch_merge/consolidation", pb_vars, fallback=False)
+        trace.prompt(len(batched_incidents) + 1, prompt, pb_vars)
+
+        return prompt
+
+    def _apply_llm_result(
+        self,
+        llm_result: BaseMessage,
+        prompt: str,
+        file_name: str,
+        src_file_language: str,
+        include_llm_results: bool,
+        result: UpdatedFileContent,
+        source_windowed: bool = False,
+    ):
+        """
+        Parses the LLM's response to a batch into `result`. Raises if the
+        response doesn't contain an updated file, so the batch is retried.
+        """
+        content = parse_file_solution_content(src_file_language, llm_result.content)
+
+        if not content.updated_file:
+            raise Exception(
+                f"Error in LLM Response: The LLM did not provide an updated file for {file_name}"
+            )
+
+        if source_windowed:
+            # Put back the lines left out of the prompt
+            result.updated_file = expand_omitted_lines(
+                content.updated_file, result.updated_file
+            )
+        else:
+            result.updated_file = content.updated_file
+        result.used_prompts.append(prompt)
+        result.total_reasoning.append(content.reasoning)
+        result.additional_information.append(content.additional_info)
+        if include_llm_results:
+            result.llm_results.append(llm_result.content)
+
+    def _log_llm_failure(
+        self,
+        e: Exception,
+        count: int,
+        retry_attempt_count: int,
+        batched_incidents: list,
+        file_name: str,
+        delay: float,
+        trace: KaiTrace,
+    ):
+        KAI_LOG.warn(
+            f"Request to model failed for batch {count}/{len(batched_incidents)} for {file_name} with exception {e}, retrying in {delay}s\n{e}"
+        )
+        KAI_LOG.debug(traceback.format_exc())
+        trace.exception(count, retry_attempt_count, e, traceback.format_exc())
+
+    def _raise_migration_failed(self, file_name: str, llm_result: Any):
+        KAI_LOG.error(f"{file_name} failed to migrate")
+
+        # TODO: These should be real exceptions
+        raise web.HTTPInternalServerError(
+            reason="Migration failed",
+            text=f"The LLM did not generate a valid response: {llm_result}",
+        )
 
     # NOTE(@JonahSussman): This function should probably become deprecated at
     # some point. `get_incident_solutions_for_file` does everything this
@@ -245,33 +1081,96 @@ class KaiApplication:
             violation_name,
             incident_variables,
             incident_snip,
+            self.solution_fields,
         )
 
-        KAI_LOG.debug(f"Found {len(solved_incidents)} solved incident(s)")
+        prompt = self._incident_solution_prompt(
+            solved_incidents, file_name, file_contents, line_number, analysis_message
+        )
 
-        pb_vars = {
-            "src_file_name": file_name,
-            "src_file_contents": file_contents,
-            "line_number": str(line_number),
-            "analysis_message": analysis_message,
-        }
+        if stream:
+            end = time.time()
+            KAI_LOG.info(
+                f"END - completed in '{end-start}s: - App: '{application_name}', File: '{file_name}' '{ruleset_name}'/'{violation_name}' @ Line Number '{line_number}' using model_id '{self.model_provider.model_id}'"
+            )
+            return self.model_provider.stream(prompt)
+        else:
+            llm_result = self.model_provider.invoke(prompt)
 
-        if len(solved_incidents) >= 1:
-            pb_vars["solution_str"] = self.solution_consumer(solved_incidents[0])
+            end = time.time()
+            KAI_LOG.info(
+                f"END - completed in '{end-start}s: - App: '{application_name}', File: '{file_name}' '{ruleset_name}'/'{violation_name}' @ Line Number '{line_number}' using model_id '{self.model_provider.model_id}'"
+            )
+            return llm_result
+
+    async def aget_incident_solution(
+        self,
+        application_name: str,
+        ruleset_name: str,
+        violation_name: str,
+        incident_snip: Optional[str],
+        incident_variables: dict,
+        file_name: str,
+        file_contents: str,
+        line_number: int,
+        analysis_message: str,
+        stream: bool = False,
+    ) -> AsyncIterator[BaseMessageChunk] | BaseMessage:
+        """
+        Async version of `get_incident_solution`. Streams with `astream`.
+        """
+        KAI_LOG.info(
+            f"START - App: '{application_name}', File: '{file_name}' '{ruleset_name}'/'{violation_name}' @ Line Number '{line_number}' using model_id '{self.model_provider.model_id}'"
+        )
 
-        prompt = get_prompt(self.model_provider.template, pb_vars)
+        start = time.time()
+
+        solved_incidents = await asyncio.to_thread(
+            self.incident_store.find_solutions,
+            ruleset_name,
+            violation_name,
+            incident_variables,
+            incident_snip,
+            self.solution_fields,
+        )
+
+        prompt = self._incident_solution_prompt(
+            solved_incidents, file_name, file_contents, line_number, analysis_message
+        )
 
         if stream:
             end = time.time()
             KAI_LOG.info(
                 f"END - completed in '{end-start}s: - App: '{application_name}', File: '{file_name}' '{ruleset_name}'/'{violation_name}' @ Line Number '{line_number}' using model_id '{self.model_provider.model_id}'"
             )
-            return self.model_provider.llm.stream(prompt)
+            return self.model_provider.astream(prompt)
         else:
-            llm_result = self.model_provider.llm.invoke(prompt)
+            llm_result = await self.model_provider.ainvoke(prompt)
 
             end = time.time()
             KAI_LOG.info(
                 f"END - completed in '{end-start}s: - App: '{application_name}', File: '{file_name}' '{ruleset_name}'/'{violation_name}' @ Line Number '{line_number}' using model_id '{self.model_provider.model_id}'"
             )
             return llm_result
+
+    def _incident_solution_prompt(
+        self,
+        solved_incidents: list[Solution],
+        file_name: str,
+        file_contents: str,
+        line_number: int,
+        analysis_message: str,
+    ) -> str:
+        KAI_LOG.debug(f"Found {len(solved_incidents)} solved incident(s)")
+
+        pb_vars = {
+            "src_file_name": file_name,
+            "src_file_contents": file_contents,
+            "line_number": str(line_number),
+            "analysis_message": analysis_message,
+        }
+
+        if len(solved_incidents) >= 1:
+            pb_vars["solution_str"] = self.solution_consumer(solved_incidents[0])
+
+        return get_prompt(self.model_provider.template, pb_vars)
@@ -0,0 +1,222 @@
+import logging
+import re
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from kai.service.llm_interfacing.model_provider import ModelProvider
+from kai.service.solution_handling.consumption import SolutionConsumerAlgorithm
+from kai.service.solution_handling.solution_types import Solution
+
+KAI_LOG = logging.getLogger(__name__)
+
+# Stands in for lines of the source file left out of the prompt. The LLM is
+# asked to copy it to the updated file, where it's replaced by the original
+# lines again. Line numbers are 1-indexed, like the analyzer's, and inclusive.
+OMITTED_LINES_RE = re.compile(
+    r"^[ \t]*\.\.\. \[kai: lines (\d+)-(\d+) unchanged\] \.\.\.[ \t]*$", re.MULTILINE
+)
+
+
+def omitted_lines_marker(start: int, end: int) -> str:
+    return f"... [kai: lines {start}-{end} unchanged] ..."
+
+
+def window_source(source: str, line_numbers: list[int], context_lines: int) -> str:
+    """
+    Returns `source` with only the lines within `context_lines` of one of the
+    `line_numbers`, which are 1-indexed like the analyzer's. Each run of left
+    out lines is replaced by a single marker line.
+    """
+    lines = source.splitlines(keepends=True)
+
+    keep = [False] * len(lines)
+    for line_number in line_numbers:
+        for i in range(
+            max(0, line_number - 1 - context_lines),
+            min(len(lines), line_number + context_lines),
+        ):
+            keep[i] = True
+
+    windowed: list[str] = []
+    i = 0
+    while i < len(lines):
+        if keep[i]:
+            windowed.append(lines[i])
+            i += 1
+            continue
+
+        start = i
+        while i < len(lines) and not keep[i]:
+            i += 1
+        windowed.append(omitted_lines_marker(start + 1, i) + "\n")
+
+    return "".join(windowed)
+
+
+def expand_omitted_lines(updated_file: str, source: str) -> str:
+    """
+    Replaces the markers `window_source` left in `updated_file` with the lines
+    of `source` they stand for.
+    """
+    lines = source.splitlines(keepends=True)
+
+    def expand(match: re.Match) -> str:
+        start, end = int(match.group(1)), int(match.group(2))
+        return "".join(lines[start - 1 : end]).removesuffix("\n")
+
+    return OMITTED_LINES_RE.sub(expand, updated_file)
+
+
+@dataclass
+class BudgetedPrompt:
+    prompt: str
+    pb_vars: dict
+    # None if tokens weren't counted
+    prompt_tokens: Optional[int]
+    fits: bool
+    # Incidents whose solution was downgraded or left out
+    downgraded_solutions: int = 0
+    # Lines kept around each incident if the source file was windowed
+    source_context_lines: Optional[int] = None
+
+    def report(self, max_prompt_tokens: Optional[int]) -> dict:
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "max_prompt_tokens": max_prompt_tokens,
+            "fits": self.fits,
+            "downgraded_solutions": self.downgraded_solutions,
+            "source_context_lines": self.source_context_lines,
+        }
+
+
+class PromptBudgeter:
+    """
+    Assembles a prompt that fits in `max_prompt_tokens` tokens, as counted
+    for the configured model. Until it fits, solutions are rendered with the
+    next consumer in `solution_consumers` (e.g. before_and_after, then
+    diff_only), then left out, starting with the last incident. After that,
+    the source file is cut down to the lines around the incidents, with less
+    context each time.
+
+    If `max_prompt_tokens` is None the prompt is never changed, and tokens are
+    only counted if `count_tokens` is set.
+    """
+
+    # Lines of context kept around each incident when windowing the source
+    SOURCE_CONTEXT_LINES = (200, 100, 50, 20, 5)
+
+    def __init__(
+        self,
+        model_provider: ModelProvider,
+        solution_consumers: list[SolutionConsumerAlgorithm],
+        max_prompt_tokens: Optional[int] = None,
+        count_tokens: bool = False,
+    ):
+        self.model_provider = model_provider
+        self.solution_consumers = solution_consumers
+        self.max_prompt_tokens = max_prompt_tokens
+        self.count_tokens = count_tokens or max_prompt_tokens is not None
+
+    def assemble(
+        self,
+        render: Callable[[dict], str],
+        pb_vars: dict,
+        solutions: list[Optional[Solution]],
+    ) -> BudgetedPrompt:
+        """
+        Renders `pb_vars` with `render` until the prompt fits. `solutions` has
+        the solution to show for each of `pb_vars["incidents"]`, if any.
+        """
+        source: str = pb_vars["src_file_contents"]
+        line_numbers: list[int] = []
+
+        # Index into `self.solution_consumers` for each incident. Past the end
+        # means the solution is left out.
+        levels = [0] * len(solutions)
+        solution_strs: dict[tuple[int, int], str] = {}
+
+        def solution_str(i: int) -> str:
+            solution = solutions[i]
+            if solution is None or levels[i] >= len(self.solution_consumers):
+                return ""
+
+            key = (i, levels[i])
+            if key not in solution_strs:
+                solution_strs[key] = self.solution_consumers[levels[i]](solution)
+            return solution_strs[key]
+
+        def attempt(source_context_lines: Optional[int]) -> BudgetedPrompt:
+            pb_incidents: list[dict] = []
+            for i, pb_incident in enumerate(pb_vars["incidents"]):
+                pb_incident = {
+                    k: v for k, v in pb_incident.items() if k != "solution_str"
+                }
+                if s := solution_str(i):
+                    pb_incident["solution_str"] = s
+                pb_incidents.append(pb_incident)
+
+            attempt_vars = {
+                **pb_vars,
+                "src_file_contents": (
+                    source
+                    if source_context_lines is None
+                    else window_source(source, line_numbers, source_context_lines)
+                ),
+                "src_file_windowed": source_context_lines is not None,
+                "incidents": pb_incidents,
+            }
+
+            prompt = render(attempt_vars)
+            prompt_tokens = (
+                self.model_provider.count_tokens(prompt) if self.count_tokens else None
+            )
+
+            return BudgetedPrompt(
+                prompt=prompt,
+                pb_vars=attempt_vars,
+                prompt_tokens=prompt_tokens,
+                fits=(
+                    self.max_prompt_tokens is None
+                    or prompt_tokens <= self.max_prompt_tokens
+                ),
+                downgraded_solutions=sum(
+                    1
+                    for i, level in enumerate(levels)
+                    if level > 0 and solutions[i] is not None
+                ),
+                source_context_lines=source_context_lines,
+            )
+
+        budgeted = attempt(None)
+
+        for level in range(1, len(self.solution_consumers) + 1):
+            for i in reversed(range(len(solutions))):
+                if budgeted.fits:
+                    return budgeted
+
+                if solutions[i] is None:
+                    continue
+
+                previous_str = solution_str(i)
+                levels[i] = level
+                if solution_str(i) != previous_str:
+                    budgeted = attempt(None)
+
+        if not budgeted.fits:
+            line_numbers = [
+                x["line_number"] for x in pb_vars["incidents"] if x["line_number"] > 0
+            ]
+
+        if line_numbers:
+            for source_context_lines in self.SOURCE_CONTEXT_LINES:
+                if budgeted.fits:
+                    return budgeted
+
+                budgeted = attempt(source_context_lines)
+
+        if not budgeted.fits:
+            KAI_LOG.warning(
+                f"Prompt for {pb_vars['src_file_name']} takes {budgeted.prompt_tokens} tokens, over the limit of {self.max_prompt_tokens}"
+            )
+
+        return budgeted
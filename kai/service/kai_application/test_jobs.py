@@ -0,0 +1,219 @@
+import asyncio
+import datetime
+import unittest
+
+from kai.models.kai_config import KaiConfigIncidentStoreSQLiteArgs
+from kai.service.incident_store.backend import SQLiteBackend
+from kai.service.incident_store.jobs import JobStatus, JobStore
+from kai.service.incident_store.sql_types import SQLBase
+from kai.service.kai_application.jobs import JobRunner
+from kai.service.kai_application.kai_application import UpdatedFileContent
+
+
+def updated_file_content(updated_file: str) -> UpdatedFileContent:
+    return UpdatedFileContent(
+        updated_file=updated_file,
+        total_reasoning=["reasoning"],
+        used_prompts=["prompt"],
+        model_id="model",
+        additional_information=["info"],
+        llm_results=None,
+    )
+
+
+class TestJobs(unittest.TestCase):
+    def setUp(self):
+        engine = SQLiteBackend(
+            KaiConfigIncidentStoreSQLiteArgs(
+                provider="sqlite", connection_string="sqlite:///:memory:"
+            )
+        ).create_engine()
+        SQLBase.metadata.create_all(engine)
+
+        self.job_store = JobStore(engine)
+        self.job_runner = JobRunner(self.job_store, max_workers=2)
+
+    def run_jobs(self, *runs) -> list[str]:
+        """
+        Submits a job for each of `runs` and waits for them to finish.
+        """
+
+        async def main():
+            job_ids = [await self.job_runner.submit("test", {}, run) for run in runs]
+            await self.job_runner.join()
+            await self.job_runner.shutdown()
+            return job_ids
+
+        return asyncio.run(main())
+
+    def test_job_succeeds(self):
+        async def run(events):
+            await events({"event": "batch_start", "batch": 1, "batch_count": 2})
+            await events({"event": "token", "batch": 1, "content": "x"})
+            await events(
+                {"event": "retry", "batch": 1, "attempt": 1, "error": "bad response"}
+            )
+            await events(
+                {
+                    "event": "batch_end",
+                    "batch": 1,
+                    "updated_file": "partial",
+                    "reasoning": "first",
+                }
+            )
+            # Partial results are visible while the job runs
+            job = self.job_store.get(job_ids[0])
+            self.assertEqual(job["status"], JobStatus.RUNNING)
+            self.assertEqual(job["progress"]["updated_file"], "partial")
+
+            return updated_file_content("final")
+
+        job_ids: list[str] = []
+
+        async def main():
+            job_ids.append(
+                await self.job_runner.submit("test", {"file_name": "Main.java"}, run)
+            )
+            await self.job_runner.join()
+            await self.job_runner.shutdown()
+
+        asyncio.run(main())
+        job_id = job_ids[0]
+
+        job = self.job_store.get(job_id)
+        self.assertEqual(job["status"], JobStatus.SUCCEEDED)
+        self.assertEqual(job["kind"], "test")
+        self.assertEqual(
+            job["progress"],
+            {
+                "batch_count": 2,
+                "completed_batches": [1],
+                "retries": 1,
+                "updated_file": "partial",
+                "reasoning": ["first"],
+            },
+        )
+        self.assertEqual(
+            UpdatedFileContent.model_validate(job["result"]).updated_file, "final"
+        )
+        self.assertIsNone(job["error"])
+
+    def test_job_fails(self):
+        async def run(events):
+            raise Exception("LLM unavailable")
+
+        (job_id,) = self.run_jobs(run)
+
+        job = self.job_store.get(job_id)
+        self.assertEqual(job["status"], JobStatus.FAILED)
+        self.assertEqual(job["error"], "LLM unavailable")
+        self.assertIsNone(job["result"])
+
+    def test_jobs_run_on_the_server_loop(self):
+        loops = []
+
+        async def run(events):
+            loops.append(asyncio.get_running_loop())
+            return updated_file_content("final")
+
+        async def main():
+            await self.job_runner.submit("test", {}, run)
+            await self.job_runner.join()
+            await self.job_runner.shutdown()
+            return asyncio.get_running_loop()
+
+        self.assertEqual(loops, [asyncio.run(main())])
+
+    def test_max_workers(self):
+        running = 0
+        max_running = 0
+
+        async def run(events):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.05)
+            running -= 1
+            return updated_file_content("final")
+
+        job_ids = self.run_jobs(run, run, run, run)
+
+        self.assertEqual(max_running, 2)
+        for job_id in job_ids:
+            self.assertEqual(self.job_store.get(job_id)["status"], JobStatus.SUCCEEDED)
+
+    def test_shutdown(self):
+        async def run(events):
+            await asyncio.Event().wait()
+
+        async def main():
+            job_ids = [await self.job_runner.submit("test", {}, run) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            await self.job_runner.shutdown()
+            return job_ids
+
+        # Both running and queued jobs are failed
+        for job_id in asyncio.run(main()):
+            job = self.job_store.get(job_id)
+            self.assertEqual(job["status"], JobStatus.FAILED)
+            self.assertIn("stopped", job["error"])
+
+    def test_fail_abandoned(self):
+        abandoned = self.job_store.create("test", {})
+        self.job_store.start(abandoned)
+        self.job_store._update(abandoned, updated_at=datetime.datetime(2000, 1, 1))
+        pending = self.job_store.create("test", {})
+        self.job_store._update(pending, updated_at=datetime.datetime(2000, 1, 1))
+        live = self.job_store.create("test", {})
+        self.job_store.start(live)
+
+        # Checked when a runner starts
+        JobRunner(self.job_store)
+
+        for job_id in [abandoned, pending]:
+            job = self.job_store.get(job_id)
+            self.assertEqual(job["status"], JobStatus.FAILED)
+            self.assertIn("stopped", job["error"])
+        self.assertEqual(self.job_store.get(live)["status"], JobStatus.RUNNING)
+
+    def test_heartbeat(self):
+        self.job_store.HEARTBEAT_SECONDS = 0.01
+
+        async def run(events):
+            await asyncio.sleep(0.1)
+            return updated_file_content("final")
+
+        async def main():
+            job_id = await self.job_runner.submit("test", {}, run)
+            self.job_store._update(job_id, updated_at=datetime.datetime(2000, 1, 1))
+            await asyncio.sleep(0.05)
+            # Still owned by this runner
+            self.assertEqual(self.job_store.fail_abandoned(), 0)
+            await self.job_runner.join()
+            await self.job_runner.shutdown()
+            return job_id
+
+        job_id = asyncio.run(main())
+
+        self.assertEqual(self.job_store.get(job_id)["status"], JobStatus.SUCCEEDED)
+
+    def test_unknown_job(self):
+        self.assertIsNone(self.job_store.get("missing"))
+
+    def test_purge(self):
+        self.job_store.retention_seconds = 60
+
+        finished = self.job_store.create("test", {})
+        self.job_store.succeed(finished, {})
+        running = self.job_store.create("test", {})
+        self.job_store.start(running)
+
+        # Only finished jobs past their retention are deleted
+        self.assertEqual(self.job_store.purge(), 0)
+
+        self.job_store._update(finished, updated_at=datetime.datetime(2000, 1, 1))
+        self.job_store._update(running, updated_at=datetime.datetime(2000, 1, 1))
+
+        self.assertEqual(self.job_store.purge(), 1)
+        self.assertIsNone(self.job_store.get(finished))
+        self.assertIsNotNone(self.job_store.get(running))
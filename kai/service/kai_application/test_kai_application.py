@@ -1,15 +1,21 @@
+import asyncio
+import os
+import tempfile
 import unittest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import aiohttp.web as web
+from langchain_core.messages import AIMessageChunk
 
 from kai.models.kai_config import KaiConfig
 from kai.models.report_types import ExtendedIncident
-from kai.service.incident_store.sql_types import SQLIncident
 from kai.service.kai_application.kai_application import (
     KaiApplication,
     UpdatedFileContent,
 )
+from kai.service.kai_application.prompt_budget import omitted_lines_marker
+from kai.service.kai_application.util import BatchMode, BatchStrategy, FileOrder
+from kai.service.llm_interfacing.request_limiter import RequestLimiter
 
 
 class TestKaiApplication(unittest.TestCase):
@@ -19,8 +25,10 @@ class TestKaiApplication(unittest.TestCase):
     @patch("kai.service.kai_application.kai_application.solution_producer_factory")
     @patch("kai.service.kai_application.kai_application.solution_consumer_factory")
     @patch("kai.service.kai_application.kai_application.ModelProvider")
+    @patch("kai.service.kai_application.kai_application.IncidentStore.create_tables")
     def setUp(
         self,
+        mock_create_tables,
         MockModelProvider,
         mock_solution_consumer_factory,
         mock_solution_producer_factory,
@@ -39,14 +47,11 @@ class TestKaiApplication(unittest.TestCase):
             log_level="info",
             trace_enabled=False,
             demo_mode=False,
-            models=MagicMock(),
+            models=MagicMock(max_prompt_tokens=None),
             incident_store=MagicMock(),
             solution_consumers=MagicMock(),
         )
         self.app = KaiApplication(self.config)
-        self.app.incident_store.backend.json_exactly_equal.return_value = (
-            SQLIncident.solution_id.isnot(None)
-        )
 
     @patch(
         "kai.service.kai_application.kai_application.UpdatedFileContent",
@@ -136,6 +141,321 @@ class TestKaiApplication(unittest.TestCase):
                 file_name, file_contents, application_name, incidents
             )
 
+    @patch(
+        "kai.service.kai_application.kai_application.UpdatedFileContent",
+        wraps=UpdatedFileContent.model_construct,
+    )
+    @patch("kai.service.kai_application.kai_application.guess_language")
+    @patch("kai.service.kai_application.kai_application.get_prompt")
+    @patch("kai.service.kai_application.kai_application.playback_if_demo_mode")
+    @patch("kai.service.kai_application.kai_application.parse_file_solution_content")
+    @patch("kai.service.kai_application.kai_application.asyncio.sleep")
+    def test_aget_incident_solutions_for_file(
+        self,
+        mock_sleep,
+        mock_parse_file_solution_content,
+        mock_playback_if_demo_mode,
+        mock_get_prompt,
+        mock_guess_language,
+        mock_updated_file_content,
+    ):
+        mock_guess_language.return_value = "python"
+        mock_get_prompt.return_value = "mock_prompt"
+        mock_parse_file_solution_content.return_value = MagicMock(
+            updated_file="mock_updated_file",
+            reasoning="mock_reasoning",
+            additional_info="mock_additional_info",
+        )
+
+        self.mock_model_provider.llm_retries = 2
+        self.mock_model_provider.retry_delay.return_value = 10.0
+        self.mock_model_provider.ainvoke = AsyncMock(
+            side_effect=[Exception("LLM error"), MagicMock(content="mock_content")]
+        )
+        self.app.incident_store = MagicMock()
+        self.app.incident_store.find_solutions_many.return_value = [[]]
+
+        incidents = [
+            ExtendedIncident(
+                uri="uri",
+                message="message",
+                ruleset_name="ruleset_name",
+                violation_name="violation_name",
+            )
+        ]
+        result = asyncio.run(
+            self.app.aget_incident_solutions_for_file(
+                "test.py", 'print("Hello, world!")', "test_app", incidents
+            )
+        )
+
+        self.assertEqual(result.updated_file, "mock_updated_file")
+        self.assertEqual(result.used_prompts, ["mock_prompt"])
+        self.assertEqual(self.mock_model_provider.ainvoke.await_count, 2)
+        self.mock_model_provider.invoke.assert_not_called()
+        self.mock_model_provider.retry_delay.assert_called_once_with(0)
+        mock_sleep.assert_awaited_once_with(10.0)
+        self.app.incident_store.find_solutions_many.assert_called_once()
+
+    def parallel_merge_responses(self, second_updated_file: str):
+        def invoke(prompt: str, use_cache: bool = True):
+            if "Combine the updated versions" in prompt:
+                return MagicMock(content="consolidated")
+            if "fix-one" in prompt:
+                return MagicMock(content="A\nb\nc\n")
+            return MagicMock(content=second_updated_file)
+
+        self.mock_model_provider.invoke.side_effect = invoke
+        self.mock_model_provider.model_id = "model"
+        self.mock_model_provider.template = "main"
+        self.mock_model_provider.llama_header = False
+
+        incidents = [
+            ExtendedIncident(
+                uri="uri",
+                message=f"fix-{name}",
+                ruleset_name="ruleset_name",
+                violation_name=f"violation-{name}",
+            )
+            for name in ["one", "two"]
+        ]
+
+        with patch(
+            "kai.service.kai_application.kai_application.parse_file_solution_content",
+            side_effect=lambda language, content: MagicMock(
+                updated_file=content, reasoning="", additional_info=""
+            ),
+        ):
+            return self.app.get_incident_solutions_for_file(
+                "test.py",
+                "a\nb\nc\n",
+                "test_app",
+                incidents,
+                batch_mode=BatchMode.VIOLATION,
+                include_solved_incidents=False,
+                batch_strategy=BatchStrategy.PARALLEL_MERGE,
+            )
+
+    def test_get_incident_solutions_for_file_not_windowed(self):
+        # Looks like what a windowed prompt leaves out, but is part of the file
+        file_contents = "x = 1\n" + omitted_lines_marker(1, 1) + "\n"
+
+        self.mock_model_provider.invoke.return_value = MagicMock(content=file_contents)
+        self.mock_model_provider.model_id = "model"
+        self.mock_model_provider.template = "main"
+        self.mock_model_provider.llama_header = False
+
+        with patch(
+            "kai.service.kai_application.kai_application.parse_file_solution_content",
+            side_effect=lambda language, content: MagicMock(
+                updated_file=content, reasoning="", additional_info=""
+            ),
+        ):
+            result = self.app.get_incident_solutions_for_file(
+                "test.py",
+                file_contents,
+                "test_app",
+                [
+                    ExtendedIncident(
+                        uri="uri",
+                        message="message",
+                        ruleset_name="ruleset_name",
+                        violation_name="violation_name",
+                    )
+                ],
+                include_solved_incidents=False,
+            )
+
+        self.assertEqual(result.updated_file, file_contents)
+
+    def test_after_fork(self):
+        self.app.after_fork()
+
+        self.mock_model_provider.after_fork.assert_called_once_with()
+        self.app.incident_store.engine.dispose.assert_called_once_with(close=False)
+
+    def test_get_incident_solutions_for_file_parallel_merge(self):
+        result = self.parallel_merge_responses("a\nb\nC\n")
+
+        self.assertEqual(result.updated_file, "A\nb\nC\n")
+        self.assertEqual(len(result.used_prompts), 2)
+        self.assertEqual(self.mock_model_provider.invoke.call_count, 2)
+
+    def test_get_incident_solutions_for_file_parallel_merge_conflict(self):
+        result = self.parallel_merge_responses("X\nb\nc\n")
+
+        self.assertEqual(result.updated_file, "consolidated")
+        self.assertEqual(len(result.used_prompts), 3)
+        self.assertIn("Combine the updated versions", result.used_prompts[-1])
+        self.assertEqual(self.mock_model_provider.invoke.call_count, 3)
+
+    @patch("kai.service.kai_application.kai_application.asyncio.sleep")
+    def test_astream_incident_solutions_for_file(self, mock_sleep):
+        responses = [["## Updated File\n```\n", "broken"], ["updated", "\n```\n"]]
+
+        async def astream(prompt: str, use_cache: bool = True):
+            for content in responses.pop(0):
+                yield AIMessageChunk(content=content)
+
+        self.mock_model_provider.astream = astream
+        self.mock_model_provider.llm_retries = 2
+        self.mock_model_provider.retry_delay.return_value = 0
+        self.mock_model_provider.model_id = "model"
+        self.mock_model_provider.template = "main"
+        self.mock_model_provider.llama_header = False
+
+        incidents = [
+            ExtendedIncident(
+                uri="uri",
+                message="message",
+                ruleset_name="ruleset_name",
+                violation_name="violation_name",
+            )
+        ]
+
+        async def main():
+            events = []
+            with patch(
+                "kai.service.kai_application.kai_application.parse_file_solution_content",
+                side_effect=lambda language, content: MagicMock(
+                    updated_file="updated" if "updated" in content else "",
+                    reasoning="",
+                    additional_info="",
+                ),
+            ):
+                async for event in self.app.astream_incident_solutions_for_file(
+                    "test.py",
+                    "original",
+                    "test_app",
+                    incidents,
+                    include_solved_incidents=False,
+                ):
+                    events.append(event)
+            return events
+
+        events = asyncio.run(main())
+
+        self.assertEqual(
+            [x["event"] for x in events],
+            ["batch_start", "token", "token", "retry", "token", "token"]
+            + ["batch_end", "result"],
+        )
+        self.assertEqual(events[0]["batch_count"], 1)
+        self.assertEqual(events[4]["content"], "updated")
+        self.assertEqual(events[-2]["updated_file"], "updated")
+        self.assertEqual(events[-1]["result"]["updated_file"], "updated")
+        self.mock_model_provider.ainvoke.assert_not_called()
+
+    def test_amigrate_application(self):
+        self.mock_model_provider.count_tokens.side_effect = len
+        self.app.file_limiter = RequestLimiter(max_concurrent_requests=1)
+
+        async def aget_incident_solutions_for_file(
+            file_name, file_contents, *args, **kwargs
+        ):
+            if file_name == "Broken.java":
+                raise Exception("LLM unavailable")
+            return self.app._new_result(file_contents.upper(), False)
+
+        self.app.aget_incident_solutions_for_file = aget_incident_solutions_for_file
+        self.mock_model_provider.model_id = "model"
+
+        incident = ExtendedIncident(
+            uri="uri",
+            message="message",
+            ruleset_name="ruleset_name",
+            violation_name="violation_name",
+        )
+        impacted_files = {
+            "Small.java": [incident, incident],
+            "Large.java": [incident],
+            "Broken.java": [incident],
+            "Missing.java": [incident],
+            "../Outside.java": [incident],
+        }
+
+        async def main(repo_path: str, file_order: FileOrder):
+            return [
+                event
+                async for event in self.app.amigrate_application(
+                    "test_app", repo_path, impacted_files, file_order=file_order
+                )
+            ]
+
+        with tempfile.TemporaryDirectory() as repo_path:
+            for file_name, contents in [
+                ("Small.java", "small"),
+                ("Large.java", "much larger"),
+                ("Broken.java", "broken"),
+            ]:
+                with open(os.path.join(repo_path, file_name), "w") as f:
+                    f.write(contents)
+
+            events = asyncio.run(main(repo_path, FileOrder.TOKEN_SIZE))
+
+            self.assertEqual(
+                events[0],
+                {"event": "migration_start", "file_count": 5, "incident_count": 6},
+            )
+            self.assertEqual(
+                [x["event"] for x in events[1:3]], ["file_error", "file_error"]
+            )
+            self.assertEqual(
+                [(x["event"], x["file_name"]) for x in events[3:-1]],
+                [
+                    ("file_start", "Large.java"),
+                    ("file_end", "Large.java"),
+                    ("file_start", "Broken.java"),
+                    ("file_error", "Broken.java"),
+                    ("file_start", "Small.java"),
+                    ("file_end", "Small.java"),
+                ],
+            )
+            self.assertEqual(events[4]["result"]["updated_file"], "MUCH LARGER")
+            self.assertEqual(events[6]["error"], "LLM unavailable")
+            self.assertEqual(
+                events[-1], {"event": "migration_end", "succeeded": 2, "failed": 3}
+            )
+
+            events = asyncio.run(main(repo_path, FileOrder.INCIDENT_COUNT))
+
+            self.assertEqual(
+                [x["file_name"] for x in events if x["event"] == "file_start"],
+                ["Small.java", "Large.java", "Broken.java"],
+            )
+
+    def test_application_repo_path(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            checkout = os.path.join(tmp, "checkout")
+            root = os.path.join(tmp, "root")
+            for path in [checkout, root, os.path.join(root, "other")]:
+                os.mkdir(path)
+
+            self.config.migration_repo_roots = [root]
+            self.app.incident_store.application_repo_uri = MagicMock(
+                return_value=f"file://{checkout}"
+            )
+
+            # The checkout the application was loaded from
+            self.assertEqual(
+                self.app.application_repo_path("test_app", checkout),
+                os.path.realpath(checkout),
+            )
+            # Anything under a configured root
+            self.assertEqual(
+                self.app.application_repo_path("test_app", f"file://{root}/other"),
+                os.path.realpath(os.path.join(root, "other")),
+            )
+
+            for repo_uri_local in [tmp, "/etc", f"file://{root}/../checkout/.."]:
+                with self.assertRaises(web.HTTPBadRequest):
+                    self.app.application_repo_path("test_app", repo_uri_local)
+
+            # Unknown applications only get the configured roots
+            self.app.incident_store.application_repo_uri.return_value = None
+            with self.assertRaises(web.HTTPBadRequest):
+                self.app.application_repo_path("test_app", checkout)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,138 @@
+import unittest
+from unittest.mock import MagicMock
+
+from kai.service.kai_application.prompt_budget import (
+    PromptBudgeter,
+    expand_omitted_lines,
+    window_source,
+)
+from kai.service.solution_handling.consumption import solution_consumer_downgrades
+from kai.service.solution_handling.solution_types import Solution
+
+SOURCE = "".join(f"line {i}\n" for i in range(1, 61))
+
+
+def render(pb_vars: dict) -> str:
+    return "\n".join(
+        [pb_vars["src_file_contents"]]
+        + [x.get("solution_str", "") for x in pb_vars["incidents"]]
+    )
+
+
+class TestSourceWindow(unittest.TestCase):
+    def test_window_source(self):
+        windowed = window_source(SOURCE, [5, 7], context_lines=1)
+
+        self.assertEqual(
+            windowed,
+            "... [kai: lines 1-3 unchanged] ...\n"
+            "line 4\nline 5\nline 6\nline 7\nline 8\n"
+            "... [kai: lines 9-60 unchanged] ...\n",
+        )
+
+    def test_window_source_line_numbers(self):
+        # Line numbers are 1-indexed, in the incidents and in the markers
+        self.assertEqual(
+            window_source(SOURCE, [1], context_lines=0),
+            "line 1\n... [kai: lines 2-60 unchanged] ...\n",
+        )
+        self.assertEqual(
+            window_source(SOURCE, [60], context_lines=0),
+            "... [kai: lines 1-59 unchanged] ...\nline 60\n",
+        )
+
+    def test_expand_omitted_lines(self):
+        windowed = window_source(SOURCE, [5], context_lines=0)
+        updated = windowed.replace("line 5\n", "line five\n")
+
+        self.assertEqual(
+            expand_omitted_lines(updated, SOURCE),
+            SOURCE.replace("line 5\n", "line five\n"),
+        )
+        self.assertEqual(expand_omitted_lines(SOURCE, SOURCE), SOURCE)
+
+
+class TestPromptBudgeter(unittest.TestCase):
+    def budgeter(self, max_prompt_tokens) -> PromptBudgeter:
+        model_provider = MagicMock()
+        model_provider.count_tokens.side_effect = len
+
+        return PromptBudgeter(
+            model_provider,
+            [lambda solution: "B" * 100, lambda solution: "D" * 10],
+            max_prompt_tokens,
+            count_tokens=True,
+        )
+
+    def pb_vars(self) -> dict:
+        return {
+            "src_file_name": "Main.java",
+            "src_file_contents": SOURCE,
+            "incidents": [{"line_number": 2}, {"line_number": 50}],
+        }
+
+    def solutions(self) -> list:
+        return [MagicMock(spec=Solution), MagicMock(spec=Solution)]
+
+    def test_unlimited(self):
+        budgeted = self.budgeter(None).assemble(
+            render, self.pb_vars(), self.solutions()
+        )
+
+        self.assertTrue(budgeted.fits)
+        self.assertEqual(budgeted.prompt_tokens, len(SOURCE) + 202)
+        self.assertFalse(budgeted.pb_vars["src_file_windowed"])
+
+    def test_downgrades_last_solutions_first(self):
+        budgeted = self.budgeter(len(SOURCE) + 120).assemble(
+            render, self.pb_vars(), self.solutions()
+        )
+
+        self.assertTrue(budgeted.fits)
+        self.assertEqual(budgeted.downgraded_solutions, 1)
+        self.assertEqual(
+            [x["solution_str"] for x in budgeted.pb_vars["incidents"]],
+            ["B" * 100, "D" * 10],
+        )
+
+        budgeted = self.budgeter(len(SOURCE) + 20).assemble(
+            render, self.pb_vars(), self.solutions()
+        )
+
+        self.assertTrue(budgeted.fits)
+        self.assertEqual(budgeted.downgraded_solutions, 2)
+        self.assertIsNone(budgeted.source_context_lines)
+
+    def test_windows_source(self):
+        # Only fits with 5 lines of context around each incident
+        max_prompt_tokens = len(window_source(SOURCE, [2, 50], 5)) + 2
+        budgeted = self.budgeter(max_prompt_tokens).assemble(
+            render, self.pb_vars(), self.solutions()
+        )
+
+        self.assertTrue(budgeted.fits)
+        self.assertNotIn("solution_str", budgeted.pb_vars["incidents"][0])
+        self.assertTrue(budgeted.pb_vars["src_file_windowed"])
+        self.assertEqual(budgeted.source_context_lines, 5)
+        self.assertIn("line 2\n", budgeted.prompt)
+        self.assertIn("line 50\n", budgeted.prompt)
+        self.assertNotIn("line 30\n", budgeted.prompt)
+
+    def test_does_not_fit(self):
+        budgeted = self.budgeter(1).assemble(render, self.pb_vars(), self.solutions())
+
+        self.assertFalse(budgeted.fits)
+        self.assertEqual(budgeted.source_context_lines, 5)
+
+
+class TestSolutionConsumerDowngrades(unittest.TestCase):
+    def test_solution_consumer_downgrades(self):
+        self.assertEqual(solution_consumer_downgrades(["diff_only"]), [])
+        self.assertEqual(
+            solution_consumer_downgrades(["before_and_after", "llm_summary"]),
+            [["diff_only", "llm_summary"]],
+        )
+        self.assertEqual(
+            solution_consumer_downgrades(["diff_only", "before_and_after"]),
+            [["diff_only"]],
+        )
@@ -1,3 +1,5 @@
+import os
+import tempfile
 import unittest
 from unittest.mock import MagicMock, patch
 
@@ -8,13 +10,14 @@ from kai.service.kai_application.util import (
     BatchMode,
     batch_incidents,
     get_prompt,
+    merge_file_edits,
     playback_if_demo_mode,
 )
 
 
 class TestGetPrompt(unittest.TestCase):
 
-    @patch("kai.service.kai_application.util.Environment.get_template")
+    @patch("jinja2.Environment.get_template")
     def test_get_prompt_with_valid_template(self, mock_get_template):
         mock_template = MagicMock()
         mock_template.render.return_value = "rendered template"
@@ -25,29 +28,21 @@ class TestGetPrompt(unittest.TestCase):
         mock_get_template.assert_called_once_with("test_template.jinja")
         self.assertEqual(result, "rendered template")
 
-    @patch(
-        "kai.service.kai_application.util.Environment.get_template",
-        side_effect=TemplateNotFound("test_template.jinja"),
-    )
     @patch("kai.service.kai_application.util.KAI_LOG.warning")
-    def test_get_prompt_fallback(self, mock_warning, mock_get_template):
-        mock_fallback_template = MagicMock()
-        mock_fallback_template.render.return_value = "fallback template"
-        mock_env = MagicMock()
-        mock_env.get_template.side_effect = [
-            TemplateNotFound("test_template.jinja"),
-            mock_fallback_template,
-        ]
+    def test_get_prompt_fallback(self, mock_warning):
+        with tempfile.TemporaryDirectory() as path_templates:
+            with open(os.path.join(path_templates, "main.jinja"), "w") as f:
+                f.write("fallback {{ key }}")
 
-        with patch(
-            "kai.service.kai_application.util.Environment", return_value=mock_env
-        ):
             result = get_prompt(
-                template_name="test_template", pb_vars={"key": "value"}, fallback=True
+                template_name="test_template",
+                pb_vars={"key": "value"},
+                path_templates=path_templates,
+                fallback=True,
             )
 
             self.assertEqual(mock_warning.call_count, 0)
-            self.assertEqual(result, "fallback template")
+            self.assertEqual(result, "fallback value")
 
     def test_get_prompt_without_fallback(self):
         with self.assertRaises(TemplateNotFound):
@@ -100,57 +95,57 @@ class TestBatchIncidents(unittest.TestCase):
             ExtendedIncident(
                 **self.incident_dict,
                 ruleset_name="ruleset1",
-                violation_name="violation1"
+                violation_name="violation1",
             ),
             ExtendedIncident(
                 **self.incident_dict,
                 ruleset_name="ruleset1",
-                violation_name="violation1"
+                violation_name="violation1",
             ),
             ExtendedIncident(
                 **self.incident_dict,
                 ruleset_name="ruleset1",
-                violation_name="violation2"
+                violation_name="violation2",
             ),
             ExtendedIncident(
                 **self.incident_dict,
                 ruleset_name="ruleset1",
-                violation_name="violation2"
+                violation_name="violation2",
             ),
             ExtendedIncident(
                 **self.incident_dict,
                 ruleset_name="ruleset1",
-                violation_name="violation2"
+                violation_name="violation2",
             ),
             ExtendedIncident(
                 **self.incident_dict,
                 ruleset_name="ruleset2",
-                violation_name="violation1"
+                violation_name="violation1",
             ),
             ExtendedIncident(
                 **self.incident_dict,
                 ruleset_name="ruleset2",
-                violation_name="violation1"
+                violation_name="violation1",
             ),
             ExtendedIncident(
                 **self.incident_dict,
                 ruleset_name="ruleset2",
-                violation_name="violation1"
+                violation_name="violation1",
             ),
             ExtendedIncident(
                 **self.incident_dict,
                 ruleset_name="ruleset2",
-                violation_name="violation1"
+                violation_name="violation1",
             ),
             ExtendedIncident(
                 **self.incident_dict,
                 ruleset_name="ruleset2",
-                violation_name="violation1"
+                violation_name="violation1",
             ),
             ExtendedIncident(
                 **self.incident_dict,
                 ruleset_name="ruleset2",
-                violation_name="violation1"
+                violation_name="violation1",
             ),
         ]
 
@@ -176,5 +171,34 @@ class TestBatchIncidents(unittest.TestCase):
         self.assertEqual(len(result[2][1]), 6)
 
 
+class TestMergeFileEdits(unittest.TestCase):
+    original = "a\nb\nc\nd\n"
+
+    def test_independent_edits(self):
+        self.assertEqual(
+            merge_file_edits(
+                self.original, ["A\nb\nc\nd\n", "a\nb\nc\nD\nE\n", self.original]
+            ),
+            "A\nb\nc\nD\nE\n",
+        )
+
+    def test_identical_edits(self):
+        self.assertEqual(
+            merge_file_edits(self.original, ["a\nB\nc\nd\n", "a\nB\nc\nd\n"]),
+            "a\nB\nc\nd\n",
+        )
+
+    def test_conflicting_edits(self):
+        self.assertIsNone(
+            merge_file_edits(self.original, ["a\nB\nc\nd\n", "a\nX\nc\nd\n"])
+        )
+        self.assertIsNone(
+            merge_file_edits(self.original, ["a\nx\nb\nc\nd\n", "a\ny\nb\nc\nd\n"])
+        )
+        self.assertIsNone(
+            merge_file_edits(self.original, ["a\nB\nC\nd\n", "a\nb\nX\nd\n"])
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
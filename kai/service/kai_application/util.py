@@ -1,21 +1,17 @@
+import difflib
 import itertools
 import logging
 import os
 from contextlib import contextmanager
 from enum import StrEnum
-from typing import Callable
+from typing import Callable, Optional
 
 import vcr
-from jinja2 import (
-    Environment,
-    FileSystemLoader,
-    StrictUndefined,
-    Template,
-    TemplateNotFound,
-)
+from jinja2 import Template, TemplateNotFound
 
 from kai.constants import PATH_DATA, PATH_TEMPLATES
 from kai.models.report_types import ExtendedIncident
+from kai.template_registry import TEMPLATE_REGISTRY
 
 KAI_LOG = logging.getLogger(__name__)
 
@@ -32,7 +28,8 @@ def get_prompt(
     Generate a prompt using Jinja templates based on the provided model
     provider, variable dictionary, and optional path templates and Jinja
     arguments. `fallback` is a boolean that determines whether to fall back to
-    main.jinja or error out.
+    main.jinja or error out. Templates are compiled once and cached in
+    `TEMPLATE_REGISTRY`.
     """
 
     if add_ext_if_not_present and not template_name.endswith(".jinja"):
@@ -41,46 +38,29 @@ def get_prompt(
     if jinja_kwargs is None:
         jinja_kwargs = {}
 
-    jinja_kwargs = {
-        "loader": FileSystemLoader(path_templates),
-        "undefined": StrictUndefined,
-        "trim_blocks": True,
-        "lstrip_blocks": True,
-        "autoescape": True,
-        **jinja_kwargs,
-    }
-
-    jinja_env = Environment(**jinja_kwargs)  # trunk-ignore(bandit/B701)
-
     template: Template
 
     try:
         try:
-            template = jinja_env.get_template(template_name)
+            template = TEMPLATE_REGISTRY.get_template(
+                path_templates, template_name, **jinja_kwargs
+            )
         except TemplateNotFound:
-            # Template might be a full path, create new Jinja environment
+            # Template might be a full path
             template_dir = os.path.abspath(os.path.join(template_name, ".."))
             template_filename = os.path.basename(template_name)
 
-            template_kwargs = {
-                **jinja_kwargs,
-                "loader": FileSystemLoader(template_dir),
-            }
-
-            # NOTE: Have to use ignore-begin and ignore-end because `trunk` will
-            # push the comments to the next line, which will break the ignore
-
-            # trunk-ignore-begin(bandit/B701)
-            template_jinja_env = Environment(**template_kwargs)
-            # trunk-ignore-end(bandit/B701)
-
-            template = template_jinja_env.get_template(template_filename)
+            template = TEMPLATE_REGISTRY.get_template(
+                template_dir, template_filename, **jinja_kwargs
+            )
     except TemplateNotFound as e:
         if not fallback:
             raise e
 
         KAI_LOG.debug(f"Template '{e.name}' not found. Falling back to main.jinja")
-        template = jinja_env.get_template("main.jinja")
+        template = TEMPLATE_REGISTRY.get_template(
+            path_templates, "main.jinja", **jinja_kwargs
+        )
 
     KAI_LOG.debug(f"Template {template.filename} loaded")
 
@@ -183,3 +163,64 @@ def batch_incidents(incidents: list[ExtendedIncident], batch_mode: BatchMode):
     batched_groupby = itertools.groupby(incidents, key_fn)
 
     return [(res_fn(key), list(grp)) for key, grp in batched_groupby]
+
+
+class BatchStrategy(StrEnum):
+    # Each batch updates the file as updated by the previous batch
+    SEQUENTIAL = "sequential"
+    # Every batch updates the original file concurrently, then the updated
+    # files are merged. If the edits conflict, the LLM is asked to consolidate
+    # them.
+    PARALLEL_MERGE = "parallel_merge"
+
+
+class FileOrder(StrEnum):
+    """
+    Order in which the files of an application are started when migrating
+    it. Larger files go first, so the longest-running ones don't hold up the
+    end of the run.
+    """
+
+    # As listed in the report
+    REPORT = "report"
+    INCIDENT_COUNT = "incident_count"
+    # Estimated tokens of the file's contents
+    TOKEN_SIZE = "token_size"
+
+
+def merge_file_edits(original: str, updated_files: list[str]) -> Optional[str]:
+    """
+    Three-way merge of several independently updated versions of `original`,
+    line by line. Returns None if two versions change the same lines
+    differently, or insert different lines at the same place.
+    """
+    base = original.splitlines(keepends=True)
+
+    # (start, end, replacement) over the lines of `base`. Identical edits made
+    # by several versions are only applied once.
+    hunks: set[tuple[int, int, tuple[str, ...]]] = set()
+
+    for updated_file in updated_files:
+        updated = updated_file.splitlines(keepends=True)
+        matcher = difflib.SequenceMatcher(None, base, updated, autojunk=False)
+
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag != "equal":
+                hunks.add((i1, i2, tuple(updated[j1:j2])))
+
+    merged: list[str] = []
+    position = 0
+    previous: Optional[tuple[int, int]] = None
+
+    for start, end, replacement in sorted(hunks):
+        if previous is not None and (start < previous[1] or start == previous[0]):
+            return None
+
+        merged.extend(base[position:start])
+        merged.extend(replacement)
+        position = end
+        previous = (start, end)
+
+    merged.extend(base[position:])
+
+    return "".join(merged)
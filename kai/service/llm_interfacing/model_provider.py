@@ -1,147 +1,47 @@
-import os
-
-from genai import Client, Credentials
-from genai.extensions.langchain.chat_llm import LangChainChatInterface
-from genai.schema import DecodingMethod
-from langchain_aws import ChatBedrock
-from langchain_community.chat_models import ChatOllama, ChatOpenAI
-from langchain_community.chat_models.fake import FakeListChatModel
+import asyncio
+import logging
+import random
+from typing import Any, AsyncIterator, Iterator, Optional
+
 from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_google_genai import ChatGoogleGenerativeAI
-from pydantic.v1.utils import deep_update
+from langchain_core.messages import AIMessageChunk, BaseMessage, BaseMessageChunk
 
 from kai.models.kai_config import KaiConfigModels
-from kai.util import get_env_bool
+from kai.service.llm_interfacing.providers import provider_factory
+from kai.service.llm_interfacing.request_limiter import RequestLimiter
+from kai.service.llm_interfacing.response_cache import (
+    LLMResponseCache,
+    prompt_cache_key,
+)
+
+KAI_LOG = logging.getLogger(__name__)
 
 
 class ModelProvider:
     def __init__(self, config: KaiConfigModels):
         self.llm_retries: int = config.llm_retries
         self.llm_retry_delay: float = config.llm_retry_delay
+        self.llm_retry_max_delay: float = config.llm_retry_max_delay
+
+        self.limiter = RequestLimiter(
+            max_concurrent_requests=config.max_concurrent_requests,
+            requests_per_minute=config.requests_per_minute,
+            burst=config.request_burst,
+        )
 
-        model_class: BaseChatModel
-        defaults: dict
-        model_args: dict
-        model_id: str
-        # Set the model class, model args, and model id based on the provider
-        match config.provider:
-            case "ChatOllama":
-                model_class = ChatOllama
-
-                defaults = {
-                    "model": "mistral",
-                    "temperature": 0.1,
-                    "max_tokens": None,
-                    "streaming": True,
-                }
-
-                model_args = deep_update(defaults, config.args)
-                model_id = model_args["model"]
-
-            case "ChatOpenAI":
-                model_class = ChatOpenAI
-
-                defaults = {
-                    "model": "gpt-3.5-turbo",
-                    "temperature": 0.1,
-                    # "model_kwargs": {
-                    #     "max_tokens": None,
-                    # },
-                    "streaming": True,
-                }
-
-                model_args = deep_update(defaults, config.args)
-                model_id = model_args["model"]
-
-            case "ChatIBMGenAI":
-                model_class = LangChainChatInterface
-                if get_env_bool("KAI__DEMO_MODE", False):
-                    api_key = os.getenv("GENAI_KEY", "dummy_value")
-                    api_endpoint = os.getenv("GENAI_API", "")
-                    credentials = Credentials(
-                        api_key=api_key, api_endpoint=api_endpoint
-                    )
-                else:
-                    credentials = Credentials.from_env()
-                defaults = {
-                    "client": Client(credentials=credentials),
-                    "model_id": "ibm-mistralai/mixtral-8x7b-instruct-v01-q",
-                    "parameters": {
-                        "decoding_method": DecodingMethod.SAMPLE,
-                        # NOTE: probably have to do some more clever stuff regarding
-                        # config. max_new_tokens and such varies between models
-                        "max_new_tokens": 4096,
-                        "min_new_tokens": 10,
-                        "temperature": 0.05,
-                        "top_k": 20,
-                        "top_p": 0.9,
-                        "return_options": {"input_text": False, "input_tokens": True},
-                    },
-                    "moderations": {
-                        # Threshold is set to very low level to flag everything
-                        # (testing purposes) or set to True to enable HAP with
-                        # default settings
-                        "hap": {"input": True, "output": False, "threshold": 0.01}
-                    },
-                    "streaming": True,
-                }
-
-                model_args = deep_update(defaults, config.args)
-                model_id = model_args["model_id"]
-
-            case "ChatBedrock":
-                model_class = ChatBedrock
-
-                defaults = {
-                    "model_id": "meta.llama3-70b-instruct-v1:0",
-                }
-
-                model_args = deep_update(defaults, config.args)
-                model_id = model_args["model_id"]
-
-            case "FakeListChatModel":
-                model_class = FakeListChatModel
-
-                defaults = {
-                    "responses": [
-                        "## Reasoning\n"
-                        "\n"
-                        "Default reasoning.\n"
-                        "\n"
-                        "## Updated File\n"
-                        "\n"
-                        "```\n"
-                        "Default updated file.\n"
-                        "```\n"
-                        "\n"
-                        "## Additional Information\n"
-                        "\n"
-                        "Default additional information.\n"
-                        "\n"
-                    ],
-                    "sleep": None,
-                }
-
-                model_args = deep_update(defaults, config.args)
-                model_id = "fake-list-chat-model"
-
-            case "ChatGoogleGenerativeAI":
-                model_class = ChatGoogleGenerativeAI
-                api_key = os.getenv("GOOGLE_API_KEY", "dummy_value")
-                defaults = {
-                    "model": "gemini-pro",
-                    "temperature": 0.7,
-                    "streaming": False,
-                    "google_api_key": api_key,
-                }
-                model_args = deep_update(defaults, config.args)
-                model_id = model_args["model"]
-
-            case _:
-                raise Exception(f"Unrecognized provider '{config.provider}'")
+        self.cache: Optional[LLMResponseCache] = (
+            LLMResponseCache(config.cache) if config.cache is not None else None
+        )
+        self.model_args: dict = config.args
+
+        # Set to False once counting tokens with the model's tokenizer fails
+        self.exact_token_counts = True
+
+        # Only the selected provider's module is imported
+        llm, model_id = provider_factory(config.provider)(config.args)
 
         self.provider_id: str = config.provider
-        self.llm: BaseChatModel = model_class(**model_args)
+        self.llm: BaseChatModel = llm
         self.model_id: str = model_id
 
         if config.template is None:
@@ -167,3 +67,135 @@ class ModelProvider:
             ]
         else:
             self.llama_header = config.llama_header
+
+    def after_fork(self):
+        """
+        Call in a forked child before sending requests. Clients may hold
+        connections opened by the parent, so the model is created anew.
+        The provider's packages are already imported, which is what makes
+        creating it slow.
+        """
+        self.llm, _ = provider_factory(self.provider_id)(self.model_args)
+
+        if self.cache is not None:
+            self.cache.after_fork()
+
+    def retry_delay(self, retry_attempt_count: int) -> float:
+        """
+        Seconds to wait before retrying after the given (0-indexed) failed
+        attempt. Doubles with every attempt, with random jitter so that
+        clients that failed together don't retry together.
+        """
+        delay = min(
+            self.llm_retry_max_delay, self.llm_retry_delay * 2**retry_attempt_count
+        )
+
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def count_tokens(self, text: str) -> int:
+        """
+        Number of tokens `text` takes up in the model's context. Uses the
+        model's tokenizer where LangChain knows it. Otherwise, e.g. when the
+        tokenizer can't be loaded, estimates about 4 characters per token.
+        """
+        if self.exact_token_counts:
+            try:
+                return self.llm.get_num_tokens(text)
+            except Exception as e:
+                KAI_LOG.warning(
+                    f"Can't count tokens for model '{self.model_id}', estimating instead: {e}"
+                )
+                self.exact_token_counts = False
+
+        return (len(text) + 3) // 4
+
+    def cache_key(self, prompt: Any) -> str:
+        return prompt_cache_key(
+            self.provider_id, self.model_id, self.model_args, prompt
+        )
+
+    # Requests to the model should go through these methods rather than
+    # `self.llm`, so that they are subject to `self.limiter` and `self.cache`.
+    # Pass `use_cache=False` to skip the cache lookup, e.g. when retrying
+    # because the previous response was unusable. The new response still
+    # replaces the cached one.
+
+    def invoke(self, prompt: Any, use_cache: bool = True) -> BaseMessage:
+        if self.cache is None:
+            with self.limiter.slot():
+                return self.llm.invoke(prompt)
+
+        key = self.cache_key(prompt)
+        if use_cache and (cached := self.cache.get(key)) is not None:
+            return cached
+
+        with self.limiter.slot():
+            response = self.llm.invoke(prompt)
+
+        self.cache.put(key, self.model_id, response)
+        return response
+
+    async def ainvoke(self, prompt: Any, use_cache: bool = True) -> BaseMessage:
+        if self.cache is None:
+            async with self.limiter.aslot():
+                return await self.llm.ainvoke(prompt)
+
+        key = self.cache_key(prompt)
+        if (
+            use_cache
+            and (cached := await asyncio.to_thread(self.cache.get, key)) is not None
+        ):
+            return cached
+
+        async with self.limiter.aslot():
+            response = await self.llm.ainvoke(prompt)
+
+        await asyncio.to_thread(self.cache.put, key, self.model_id, response)
+        return response
+
+    def stream(self, prompt: Any, use_cache: bool = True) -> Iterator[BaseMessageChunk]:
+        if self.cache is None:
+            with self.limiter.slot():
+                yield from self.llm.stream(prompt)
+            return
+
+        key = self.cache_key(prompt)
+        if use_cache and (cached := self.cache.get(key)) is not None:
+            yield AIMessageChunk(content=cached.content)
+            return
+
+        response: Optional[BaseMessageChunk] = None
+        with self.limiter.slot():
+            for chunk in self.llm.stream(prompt):
+                response = chunk if response is None else response + chunk
+                yield chunk
+
+        # Only complete responses are cached
+        if response is not None:
+            self.cache.put(key, self.model_id, response)
+
+    async def astream(
+        self, prompt: Any, use_cache: bool = True
+    ) -> AsyncIterator[BaseMessageChunk]:
+        if self.cache is None:
+            async with self.limiter.aslot():
+                async for chunk in self.llm.astream(prompt):
+                    yield chunk
+            return
+
+        key = self.cache_key(prompt)
+        if (
+            use_cache
+            and (cached := await asyncio.to_thread(self.cache.get, key)) is not None
+        ):
+            yield AIMessageChunk(content=cached.content)
+            return
+
+        response: Optional[BaseMessageChunk] = None
+        async with self.limiter.aslot():
+            async for chunk in self.llm.astream(prompt):
+                response = chunk if response is None else response + chunk
+                yield chunk
+
+        if response is not None:
+            await asyncio.to_thread(self.cache.put, key, self.model_id, response)
@@ -0,0 +1,178 @@
+import logging
+import os
+from importlib.metadata import entry_points
+from typing import Callable
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from pydantic.v1.utils import deep_update
+
+from kai.util import get_env_bool
+
+KAI_LOG = logging.getLogger(__name__)
+
+# Creates the chat model of a provider from the `args` of the models config.
+# Returns the model and its model id.
+ProviderFactory = Callable[[dict], tuple[BaseChatModel, str]]
+
+# Third-party packages add providers with entry points in this group, named
+# after the provider and pointing to its `ProviderFactory`
+PROVIDER_ENTRY_POINT_GROUP = "kai.model_providers"
+
+_providers: dict[str, ProviderFactory] = {}
+
+
+def register_provider(name: str) -> Callable[[ProviderFactory], ProviderFactory]:
+    """
+    Registers the decorated function as the factory of the `name` provider.
+    Factories should import the module backing the provider themselves, so
+    it's only imported if the provider is selected.
+    """
+
+    def decorator(factory: ProviderFactory) -> ProviderFactory:
+        _providers[name] = factory
+        return factory
+
+    return decorator
+
+
+def provider_factory(name: str) -> ProviderFactory:
+    """
+    Returns the factory of the `name` provider, looking through the entry
+    points of installed packages if it isn't built in.
+    """
+    if name in _providers:
+        return _providers[name]
+
+    for entry_point in entry_points(group=PROVIDER_ENTRY_POINT_GROUP, name=name):
+        KAI_LOG.info(f"Loading provider '{name}' from {entry_point.value}")
+        _providers[name] = entry_point.load()
+        return _providers[name]
+
+    raise Exception(f"Unrecognized provider '{name}'")
+
+
+@register_provider("ChatOllama")
+def chat_ollama(args: dict) -> tuple[BaseChatModel, str]:
+    from langchain_community.chat_models import ChatOllama
+
+    defaults = {
+        "model": "mistral",
+        "temperature": 0.1,
+        "max_tokens": None,
+        "streaming": True,
+    }
+
+    model_args = deep_update(defaults, args)
+    return ChatOllama(**model_args), model_args["model"]
+
+
+@register_provider("ChatOpenAI")
+def chat_openai(args: dict) -> tuple[BaseChatModel, str]:
+    from langchain_community.chat_models import ChatOpenAI
+
+    defaults = {
+        "model": "gpt-3.5-turbo",
+        "temperature": 0.1,
+        # "model_kwargs": {
+        #     "max_tokens": None,
+        # },
+        "streaming": True,
+    }
+
+    model_args = deep_update(defaults, args)
+    return ChatOpenAI(**model_args), model_args["model"]
+
+
+@register_provider("ChatIBMGenAI")
+def chat_ibm_genai(args: dict) -> tuple[BaseChatModel, str]:
+    from genai import Client, Credentials
+    from genai.extensions.langchain.chat_llm import LangChainChatInterface
+    from genai.schema import DecodingMethod
+
+    if get_env_bool("KAI__DEMO_MODE", False):
+        api_key = os.getenv("GENAI_KEY", "dummy_value")
+        api_endpoint = os.getenv("GENAI_API", "")
+        credentials = Credentials(api_key=api_key, api_endpoint=api_endpoint)
+    else:
+        credentials = Credentials.from_env()
+    defaults = {
+        "client": Client(credentials=credentials),
+        "model_id": "ibm-mistralai/mixtral-8x7b-instruct-v01-q",
+        "parameters": {
+            "decoding_method": DecodingMethod.SAMPLE,
+            # NOTE: probably have to do some more clever stuff regarding
+            # config. max_new_tokens and such varies between models
+            "max_new_tokens": 4096,
+            "min_new_tokens": 10,
+            "temperature": 0.05,
+            "top_k": 20,
+            "top_p": 0.9,
+            "return_options": {"input_text": False, "input_tokens": True},
+        },
+        "moderations": {
+            # Threshold is set to very low level to flag everything
+            # (testing purposes) or set to True to enable HAP with
+            # default settings
+            "hap": {"input": True, "output": False, "threshold": 0.01}
+        },
+        "streaming": True,
+    }
+
+    model_args = deep_update(defaults, args)
+    return LangChainChatInterface(**model_args), model_args["model_id"]
+
+
+@register_provider("ChatBedrock")
+def chat_bedrock(args: dict) -> tuple[BaseChatModel, str]:
+    from langchain_aws import ChatBedrock
+
+    defaults = {
+        "model_id": "meta.llama3-70b-instruct-v1:0",
+    }
+
+    model_args = deep_update(defaults, args)
+    return ChatBedrock(**model_args), model_args["model_id"]
+
+
+@register_provider("FakeListChatModel")
+def fake_list_chat_model(args: dict) -> tuple[BaseChatModel, str]:
+    from langchain_community.chat_models.fake import FakeListChatModel
+
+    defaults = {
+        "responses": [
+            "## Reasoning\n"
+            "\n"
+            "Default reasoning.\n"
+            "\n"
+            "## Updated File\n"
+            "\n"
+            "```\n"
+            "Default updated file.\n"
+            "```\n"
+            "\n"
+            "## Additional Information\n"
+            "\n"
+            "Default additional information.\n"
+            "\n"
+        ],
+        "sleep": None,
+    }
+
+    model_args = deep_update(defaults, args)
+    return FakeListChatModel(**model_args), "fake-list-chat-model"
+
+
+@register_provider("ChatGoogleGenerativeAI")
+def chat_google_generative_ai(args: dict) -> tuple[BaseChatModel, str]:
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    api_key = os.getenv("GOOGLE_API_KEY", "dummy_value")
+    defaults = {
+        "model": "gemini-pro",
+        "temperature": 0.7,
+        "streaming": False,
+        "google_api_key": api_key,
+    }
+
+    model_args = deep_update(defaults, args)
+    return ChatGoogleGenerativeAI(**model_args), model_args["model"]
@@ -0,0 +1,187 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+
+@dataclass
+class _Waiter:
+    wake: Callable[[], None]
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class RequestLimiter:
+    """
+    Admission control for requests to an LLM provider. At most
+    `max_concurrent_requests` requests run at the same time, and requests are
+    started at no more than `requests_per_minute`, with bursts of up to
+    `burst` requests (a token bucket). Either limit is disabled if None.
+
+    Waiting requests are admitted strictly in arrival order, whether they wait
+    from a thread (`slot`) or from an event loop (`aslot`). Async waiters
+    don't occupy a thread while queued.
+    """
+
+    def __init__(
+        self,
+        max_concurrent_requests: Optional[int] = None,
+        requests_per_minute: Optional[float] = None,
+        burst: int = 1,
+    ):
+        self.max_concurrent_requests = max_concurrent_requests
+        self.requests_per_minute = requests_per_minute
+        self.burst = max(1, burst)
+
+        self._lock = threading.Lock()
+        self._waiters: deque[_Waiter] = deque()
+        self._active = 0
+
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._timer: Optional[threading.Timer] = None
+
+        self._admitted = 0
+        self._total_wait_time = 0.0
+        self._max_wait_time = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Number of requests waiting to be admitted.
+        """
+        return len(self._waiters)
+
+    @property
+    def active(self) -> int:
+        """
+        Number of admitted requests that haven't finished yet.
+        """
+        return self._active
+
+    def stats(self) -> dict[str, float | int]:
+        with self._lock:
+            return {
+                "queue_depth": len(self._waiters),
+                "active": self._active,
+                "admitted": self._admitted,
+                "total_wait_time": self._total_wait_time,
+                "average_wait_time": self._total_wait_time / max(self._admitted, 1),
+                "max_wait_time": self._max_wait_time,
+            }
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """
+        Blocks the current thread until the request is admitted, and releases
+        the slot on exit.
+        """
+        admitted = threading.Event()
+        self._enqueue(_Waiter(admitted.set))
+        admitted.wait()
+
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def aslot(self) -> AsyncIterator[None]:
+        """
+        Async version of `slot`.
+        """
+        loop = asyncio.get_running_loop()
+        admitted: asyncio.Future[None] = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(
+                lambda: admitted.done() or admitted.set_result(None)
+            )
+
+        waiter = _Waiter(wake)
+        self._enqueue(waiter)
+
+        try:
+            await admitted
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove(waiter)
+                    was_admitted = False
+                except ValueError:
+                    was_admitted = True
+
+            # The slot may have been granted right as we were cancelled
+            if was_admitted:
+                self._release()
+            raise
+
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _enqueue(self, waiter: _Waiter):
+        with self._lock:
+            self._waiters.append(waiter)
+            self._dispatch()
+
+    def _release(self):
+        with self._lock:
+            self._active -= 1
+            self._dispatch()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            self._dispatch()
+
+    def _refill(self, now: float):
+        if self.requests_per_minute is None:
+            return
+
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._tokens = min(
+            float(self.burst), self._tokens + elapsed * self.requests_per_minute / 60
+        )
+
+    def _dispatch(self):
+        """
+        Admits waiters from the front of the queue while there is capacity.
+        Must be called with the lock held.
+        """
+        now = time.monotonic()
+        self._refill(now)
+
+        while self._waiters:
+            if (
+                self.max_concurrent_requests is not None
+                and self._active >= self.max_concurrent_requests
+            ):
+                # A release will dispatch again
+                return
+
+            if self.requests_per_minute is not None and self._tokens < 1:
+                # Come back when the next token is available
+                if self._timer is None:
+                    delay = (1 - self._tokens) * 60 / self.requests_per_minute
+                    self._timer = threading.Timer(delay, self._on_timer)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+
+            waiter = self._waiters.popleft()
+
+            self._active += 1
+            if self.requests_per_minute is not None:
+                self._tokens -= 1
+
+            wait_time = now - waiter.enqueued_at
+            self._admitted += 1
+            self._total_wait_time += wait_time
+            self._max_wait_time = max(self._max_wait_time, wait_time)
+
+            waiter.wake()
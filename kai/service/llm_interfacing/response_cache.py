@@ -0,0 +1,212 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Optional
+
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+from sqlalchemy import Engine, Float, Text, create_engine, delete, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+from sqlalchemy.pool import StaticPool
+
+from kai.models.kai_config import KaiConfigLLMCache
+
+KAI_LOG = logging.getLogger(__name__)
+
+
+class SQLCacheBase(DeclarativeBase):
+    pass
+
+
+class SQLCachedResponse(SQLCacheBase):
+    __tablename__ = "llm_response_cache"
+
+    cache_key: Mapped[str] = mapped_column(primary_key=True)
+    model_id: Mapped[str]
+    # The response, serialized with `message_to_dict`
+    response: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[float] = mapped_column(Float)
+    last_accessed_at: Mapped[float] = mapped_column(Float, index=True)
+
+
+def prompt_cache_key(
+    provider_id: str, model_id: str, model_args: dict, prompt: Any
+) -> str:
+    """
+    Returns a hash identifying a request: the provider, the model and its
+    arguments, and the rendered prompt.
+    """
+    if isinstance(prompt, str):
+        prompt_str = prompt
+    elif isinstance(prompt, list) and all(isinstance(x, BaseMessage) for x in prompt):
+        prompt_str = json.dumps([message_to_dict(x) for x in prompt], sort_keys=True)
+    else:
+        prompt_str = str(prompt)
+
+    return hashlib.sha256(
+        json.dumps(
+            {
+                "provider_id": provider_id,
+                "model_id": model_id,
+                "model_args": model_args,
+                "prompt_hash": hashlib.sha256(prompt_str.encode()).hexdigest(),
+            },
+            sort_keys=True,
+            default=str,
+        ).encode()
+    ).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Persistent cache of LLM responses, keyed by `prompt_cache_key`. Works on
+    any database SQLAlchemy supports, in practice SQLite and PostgreSQL.
+
+    Entries expire `ttl_seconds` after they were stored, and only the
+    `max_entries` most recently used entries are kept.
+    """
+
+    def __init__(self, config: KaiConfigLLMCache):
+        self.ttl_seconds = config.ttl_seconds
+        self.max_entries = config.max_entries
+        self.engine = self._create_engine(config.connection_string)
+
+        SQLCacheBase.metadata.create_all(self.engine)
+
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def _create_engine(connection_string: str) -> Engine:
+        url = make_url(connection_string)
+
+        # In-memory databases only live as long as their connection, so every
+        # thread must share one.
+        if url.get_backend_name() == "sqlite" and url.database in (
+            None,
+            "",
+            ":memory:",
+        ):
+            return create_engine(
+                connection_string,
+                connect_args={"check_same_thread": False},
+                poolclass=StaticPool,
+            )
+
+        return create_engine(connection_string)
+
+    def after_fork(self):
+        """
+        Call in a forked child before using the cache. Drops the connections
+        inherited from the parent without closing them, since the parent
+        still owns them. A shared in-memory database is kept, as it only
+        exists in that one connection.
+        """
+        if not isinstance(self.engine.pool, StaticPool):
+            self.engine.dispose(close=False)
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+            }
+
+    def _count(self, hits: int = 0, misses: int = 0, evictions: int = 0):
+        with self._lock:
+            self._hits += hits
+            self._misses += misses
+            self._evictions += evictions
+
+    def get(self, cache_key: str) -> Optional[BaseMessage]:
+        now = time.time()
+
+        with Session(self.engine) as session:
+            entry = session.get(SQLCachedResponse, cache_key)
+
+            if entry is not None and self._expired(entry, now):
+                session.delete(entry)
+                session.commit()
+                self._count(evictions=1)
+                entry = None
+
+            if entry is None:
+                self._count(misses=1)
+                return None
+
+            session.execute(
+                update(SQLCachedResponse)
+                .where(SQLCachedResponse.cache_key == cache_key)
+                .values(last_accessed_at=now)
+            )
+            session.commit()
+
+            response = entry.response
+
+        self._count(hits=1)
+
+        return messages_from_dict([json.loads(response)])[0]
+
+    def put(self, cache_key: str, model_id: str, response: BaseMessage):
+        now = time.time()
+
+        with Session(self.engine) as session:
+            session.merge(
+                SQLCachedResponse(
+                    cache_key=cache_key,
+                    model_id=model_id,
+                    response=json.dumps(message_to_dict(response)),
+                    created_at=now,
+                    last_accessed_at=now,
+                )
+            )
+            session.flush()
+
+            evicted = self._evict(session, now)
+            session.commit()
+
+        if evicted:
+            self._count(evictions=evicted)
+            KAI_LOG.debug(f"Evicted {evicted} cached LLM response(s)")
+
+    def _expired(self, entry: SQLCachedResponse, now: float) -> bool:
+        return (
+            self.ttl_seconds is not None and entry.created_at < now - self.ttl_seconds
+        )
+
+    def _evict(self, session: Session, now: float) -> int:
+        evicted = 0
+
+        if self.ttl_seconds is not None:
+            evicted += session.execute(
+                delete(SQLCachedResponse).where(
+                    SQLCachedResponse.created_at < now - self.ttl_seconds
+                )
+            ).rowcount
+
+        if self.max_entries is not None:
+            least_recently_used = (
+                select(SQLCachedResponse.cache_key)
+                .order_by(SQLCachedResponse.last_accessed_at.desc())
+                .offset(self.max_entries)
+                .scalar_subquery()
+            )
+            evicted += session.execute(
+                delete(SQLCachedResponse).where(
+                    SQLCachedResponse.cache_key.in_(least_recently_used)
+                )
+            ).rowcount
+
+        return evicted
+
+    def clear(self):
+        with Session(self.engine) as session:
+            session.execute(delete(SQLCachedResponse))
+            session.commit()
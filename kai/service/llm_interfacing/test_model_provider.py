@@ -32,3 +32,43 @@ class TestModelProvider(unittest.TestCase):
             result = model_provider.llm.invoke("test").content
             print(f"{result} == {x}")
             assert result == x
+
+    def test_limited_invoke_and_retry_delay(self):
+        config = KaiConfigModels(
+            provider="FakeListChatModel",
+            args={"responses": ["alfa", "beta"], "sleep": 0.0},
+            llm_retry_delay=1.0,
+            llm_retry_max_delay=5.0,
+            max_concurrent_requests=1,
+        )
+
+        model_provider = ModelProvider(config)
+
+        self.assertEqual(model_provider.invoke("test").content, "alfa")
+        self.assertEqual(
+            "".join(chunk.content for chunk in model_provider.stream("test")), "beta"
+        )
+        self.assertEqual(model_provider.limiter.stats()["admitted"], 2)
+        self.assertEqual(model_provider.limiter.active, 0)
+
+        for attempt, (low, high) in enumerate([(0.5, 1), (1, 2), (2, 4), (2.5, 5)]):
+            delay = model_provider.retry_delay(attempt)
+            self.assertGreaterEqual(delay, low)
+            self.assertLessEqual(delay, high)
+
+    def test_after_fork(self):
+        config = KaiConfigModels(
+            provider="FakeListChatModel",
+            args={"responses": ["alfa", "beta"], "sleep": 0.0},
+        )
+
+        model_provider = ModelProvider(config)
+        llm = model_provider.llm
+        self.assertEqual(model_provider.invoke("test").content, "alfa")
+
+        model_provider.after_fork()
+
+        # A new model with the same args
+        self.assertIsNot(model_provider.llm, llm)
+        self.assertEqual(model_provider.model_id, "fake-list-chat-model")
+        self.assertEqual(model_provider.invoke("test").content, "alfa")
@@ -0,0 +1,67 @@
+import subprocess
+import sys
+import unittest
+from importlib.metadata import EntryPoint
+from unittest.mock import patch
+
+from langchain_community.chat_models.fake import FakeListChatModel
+
+from kai.service.llm_interfacing import providers
+from kai.service.llm_interfacing.providers import (
+    PROVIDER_ENTRY_POINT_GROUP,
+    provider_factory,
+)
+
+
+def create_model(args: dict):
+    return FakeListChatModel(responses=args["responses"]), "entry-point-model"
+
+
+class TestProviders(unittest.TestCase):
+    def test_builtin_provider(self):
+        llm, model_id = provider_factory("FakeListChatModel")({"sleep": 0.0})
+
+        self.assertIsInstance(llm, FakeListChatModel)
+        self.assertEqual(model_id, "fake-list-chat-model")
+        self.assertIn("Default updated file.", llm.invoke("test").content)
+
+    def test_unrecognized_provider(self):
+        with self.assertRaisesRegex(Exception, "Unrecognized provider 'Nope'"):
+            provider_factory("Nope")
+
+    @patch("kai.service.llm_interfacing.providers.entry_points")
+    def test_entry_point_provider(self, mock_entry_points):
+        self.addCleanup(providers._providers.pop, "EntryPointModel", None)
+        mock_entry_points.return_value = [
+            EntryPoint(
+                name="EntryPointModel",
+                value=f"{__name__}:create_model",
+                group=PROVIDER_ENTRY_POINT_GROUP,
+            )
+        ]
+
+        llm, model_id = provider_factory("EntryPointModel")({"responses": ["alfa"]})
+
+        self.assertEqual(model_id, "entry-point-model")
+        self.assertEqual(llm.invoke("test").content, "alfa")
+        mock_entry_points.assert_called_once_with(
+            group=PROVIDER_ENTRY_POINT_GROUP, name="EntryPointModel"
+        )
+
+        # Loaded entry points are remembered
+        provider_factory("EntryPointModel")
+        mock_entry_points.assert_called_once()
+
+    def test_providers_imported_lazily(self):
+        # Run in a fresh interpreter, as other tests may have imported them
+        code = (
+            "import sys\n"
+            "from kai.service.llm_interfacing.model_provider import ModelProvider\n"
+            "print([m for m in ('genai', 'langchain_aws', 'langchain_google_genai')"
+            " if m in sys.modules])\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        )
+
+        self.assertEqual(result.stdout.strip(), "[]")
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from kai.service.llm_interfacing.request_limiter import RequestLimiter
+
+
+class TestRequestLimiter(unittest.TestCase):
+    def test_unlimited(self):
+        limiter = RequestLimiter()
+
+        with limiter.slot():
+            with limiter.slot():
+                self.assertEqual(limiter.active, 2)
+
+        self.assertEqual(limiter.active, 0)
+        self.assertEqual(limiter.stats()["admitted"], 2)
+
+    def test_max_concurrent_requests(self):
+        limiter = RequestLimiter(max_concurrent_requests=2)
+
+        lock = threading.Lock()
+        running = 0
+        max_running = 0
+
+        def request():
+            nonlocal running, max_running
+            with limiter.slot():
+                with lock:
+                    running += 1
+                    max_running = max(max_running, running)
+                time.sleep(0.02)
+                with lock:
+                    running -= 1
+
+        threads = [threading.Thread(target=request) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(max_running, 2)
+        self.assertEqual(limiter.queue_depth, 0)
+        self.assertEqual(limiter.stats()["admitted"], 6)
+        self.assertGreater(limiter.stats()["max_wait_time"], 0)
+
+    def test_requests_per_minute(self):
+        # 20 requests per second, no bursts
+        limiter = RequestLimiter(requests_per_minute=1200, burst=1)
+
+        start = time.monotonic()
+        for _ in range(3):
+            with limiter.slot():
+                pass
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_async_fifo_order(self):
+        limiter = RequestLimiter(max_concurrent_requests=1)
+        order: list[int] = []
+
+        async def request(i: int):
+            async with limiter.aslot():
+                order.append(i)
+                await asyncio.sleep(0.01)
+
+        async def main():
+            await asyncio.gather(*(request(i) for i in range(5)))
+
+        asyncio.run(main())
+
+        self.assertEqual(order, [0, 1, 2, 3, 4])
+
+    def test_async_cancelled_waiter_leaves_queue(self):
+        limiter = RequestLimiter(max_concurrent_requests=1)
+
+        async def main():
+            async with limiter.aslot():
+                waiter = asyncio.create_task(limiter.aslot().__aenter__())
+                await asyncio.sleep(0.01)
+                self.assertEqual(limiter.queue_depth, 1)
+
+                waiter.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await waiter
+
+                self.assertEqual(limiter.queue_depth, 0)
+
+            self.assertEqual(limiter.active, 0)
+
+        asyncio.run(main())
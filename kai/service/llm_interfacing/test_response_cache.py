@@ -0,0 +1,163 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from kai.models.kai_config import KaiConfigLLMCache, KaiConfigModels
+from kai.service.llm_interfacing.model_provider import ModelProvider
+from kai.service.llm_interfacing.response_cache import (
+    LLMResponseCache,
+    prompt_cache_key,
+)
+
+
+class TestLLMResponseCache(unittest.TestCase):
+    def cache(self, **kwargs) -> LLMResponseCache:
+        return LLMResponseCache(
+            KaiConfigLLMCache(connection_string="sqlite:///:memory:", **kwargs)
+        )
+
+    def test_prompt_cache_key(self):
+        key = prompt_cache_key("FakeListChatModel", "fake", {"temperature": 0}, "hi")
+
+        self.assertEqual(
+            key,
+            prompt_cache_key("FakeListChatModel", "fake", {"temperature": 0}, "hi"),
+        )
+        self.assertNotEqual(
+            key, prompt_cache_key("FakeListChatModel", "fake", {"temperature": 1}, "hi")
+        )
+        self.assertNotEqual(
+            key,
+            prompt_cache_key("FakeListChatModel", "other", {"temperature": 0}, "hi"),
+        )
+        self.assertNotEqual(
+            key, prompt_cache_key("FakeListChatModel", "fake", {"temperature": 0}, "ho")
+        )
+        self.assertNotEqual(
+            prompt_cache_key("p", "m", {}, [HumanMessage(content="hi")]),
+            prompt_cache_key("p", "m", {}, [HumanMessage(content="ho")]),
+        )
+
+    def test_get_and_put(self):
+        cache = self.cache()
+
+        self.assertIsNone(cache.get("key"))
+
+        cache.put("key", "model", AIMessage(content="response"))
+        response = cache.get("key")
+
+        self.assertIsInstance(response, AIMessage)
+        self.assertEqual(response.content, "response")
+        self.assertEqual(
+            cache.stats(), {"hits": 1, "misses": 1, "hit_rate": 0.5, "evictions": 0}
+        )
+
+    def test_ttl(self):
+        cache = self.cache(ttl_seconds=60)
+
+        with patch("kai.service.llm_interfacing.response_cache.time.time") as mock_time:
+            mock_time.return_value = 1000.0
+            cache.put("key", "model", AIMessage(content="response"))
+
+            mock_time.return_value = 1059.0
+            self.assertIsNotNone(cache.get("key"))
+
+            mock_time.return_value = 1061.0
+            self.assertIsNone(cache.get("key"))
+
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_least_recently_used_are_evicted(self):
+        cache = self.cache(max_entries=2)
+
+        with patch("kai.service.llm_interfacing.response_cache.time.time") as mock_time:
+            mock_time.return_value = 1.0
+            cache.put("a", "model", AIMessage(content="a"))
+            mock_time.return_value = 2.0
+            cache.put("b", "model", AIMessage(content="b"))
+
+            # "a" is now the most recently used
+            mock_time.return_value = 3.0
+            cache.get("a")
+
+            mock_time.return_value = 4.0
+            cache.put("c", "model", AIMessage(content="c"))
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+
+class TestModelProviderCache(unittest.TestCase):
+    def model_provider(self) -> ModelProvider:
+        return ModelProvider(
+            KaiConfigModels(
+                provider="FakeListChatModel",
+                args={"responses": ["alfa", "beta", "charlie"], "sleep": 0.0},
+                cache=KaiConfigLLMCache(connection_string="sqlite:///:memory:"),
+            )
+        )
+
+    def test_invoke(self):
+        model_provider = self.model_provider()
+
+        self.assertEqual(model_provider.invoke("test").content, "alfa")
+        self.assertEqual(model_provider.invoke("test").content, "alfa")
+        self.assertEqual(model_provider.invoke("other").content, "beta")
+
+        # Bypassing the cache replaces the cached response
+        self.assertEqual(
+            model_provider.invoke("test", use_cache=False).content, "charlie"
+        )
+        self.assertEqual(model_provider.invoke("test").content, "charlie")
+
+        self.assertEqual(model_provider.limiter.stats()["admitted"], 3)
+
+    def test_stream(self):
+        model_provider = self.model_provider()
+
+        def stream(prompt: str) -> str:
+            return "".join(chunk.content for chunk in model_provider.stream(prompt))
+
+        self.assertEqual(stream("test"), "alfa")
+        self.assertEqual(stream("test"), "alfa")
+        self.assertEqual(model_provider.invoke("test").content, "alfa")
+
+    def test_async(self):
+        model_provider = self.model_provider()
+
+        async def astream(prompt: str) -> str:
+            return "".join(
+                [chunk.content async for chunk in model_provider.astream(prompt)]
+            )
+
+        async def main():
+            self.assertEqual((await model_provider.ainvoke("test")).content, "alfa")
+            self.assertEqual(await astream("test"), "alfa")
+            self.assertEqual(await astream("other"), "beta")
+            self.assertEqual((await model_provider.ainvoke("other")).content, "beta")
+
+        asyncio.run(main())
+
+        self.assertEqual(model_provider.cache.stats()["hits"], 2)
+
+    def test_falsy_cached_response(self):
+        model_provider = self.model_provider()
+        model_provider.invoke("test")
+
+        # Any cached response is a hit, as on the sync paths
+        with patch.object(AIMessage, "__bool__", return_value=False, create=True):
+
+            async def main():
+                self.assertEqual((await model_provider.ainvoke("test")).content, "alfa")
+                self.assertEqual(
+                    [chunk.content async for chunk in model_provider.astream("test")],
+                    ["alfa"],
+                )
+
+            asyncio.run(main())
+
+        self.assertEqual(model_provider.cache.stats()["hits"], 2)
@@ -1,11 +1,12 @@
 import os
-from typing import Callable
+from typing import Callable, Optional
 
 import jinja2
 
 from kai.constants import PATH_TEMPLATES
 from kai.models.kai_config import SolutionConsumerKind
 from kai.service.solution_handling.solution_types import Solution
+from kai.template_registry import TEMPLATE_REGISTRY
 
 # TODO: Potentially add fallback functionality. For example, before_and_after
 # might be too large, so we should fall back to diff_only.
@@ -16,14 +17,8 @@ SolutionConsumerAlgorithm = Callable[[Solution], str]
 
 
 def __create_jinja_env() -> jinja2.Environment:
-    return jinja2.Environment(
-        loader=jinja2.FileSystemLoader(
-            os.path.join(PATH_TEMPLATES, "solution_handling/")
-        ),
-        undefined=jinja2.StrictUndefined,
-        trim_blocks=True,
-        lstrip_blocks=True,
-        autoescape=True,
+    return TEMPLATE_REGISTRY.environment(
+        os.path.join(PATH_TEMPLATES, "solution_handling/")
     )
 
 
@@ -67,3 +62,54 @@ def solution_consumer_factory(
             return solution_consumer_llm_summary
         case _:
             raise ValueError(f"Unknown solution consumer kind: {kind}")
+
+
+def solution_consumer_fields(
+    kind: SolutionConsumerKind | list[SolutionConsumerKind],
+) -> Optional[set[str]]:
+    """
+    Returns the large text fields of a solution (diff, before and after code)
+    that the consumer reads, so the rest don't have to be loaded from the
+    store. Returns None if unknown, meaning every field is needed.
+    """
+    if isinstance(kind, list):
+        fields: set[str] = set()
+        for single_kind in kind:
+            single_fields = solution_consumer_fields(single_kind)
+            if single_fields is None:
+                return None
+            fields |= single_fields
+        return fields
+
+    match kind:
+        case SolutionConsumerKind.DIFF_ONLY:
+            return {"file_diff"}
+        case SolutionConsumerKind.BEFORE_AND_AFTER:
+            return {"original_code", "updated_code"}
+        case SolutionConsumerKind.LLM_SUMMARY:
+            return set()
+        case _:
+            return None
+
+
+def solution_consumer_downgrades(
+    kind: SolutionConsumerKind | list[SolutionConsumerKind],
+) -> list[list[SolutionConsumerKind]]:
+    """
+    Returns cheaper alternatives to the consumer, from most to least detailed,
+    for when its output doesn't fit in the prompt. Leaving the solution out
+    entirely comes after the last one.
+    """
+    kinds = kind if isinstance(kind, list) else [kind]
+
+    if SolutionConsumerKind.BEFORE_AND_AFTER not in kinds:
+        return []
+
+    downgraded: list[SolutionConsumerKind] = []
+    for single_kind in kinds:
+        if single_kind == SolutionConsumerKind.BEFORE_AND_AFTER:
+            single_kind = SolutionConsumerKind.DIFF_ONLY
+        if single_kind not in downgraded:
+            downgraded.append(single_kind)
+
+    return [downgraded]
@@ -1,29 +1,33 @@
 import json
-import os
 from collections import defaultdict
-from dataclasses import dataclass
-from typing import Callable, cast
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from typing import Callable, Optional
 from urllib.parse import unquote, urlparse
 
-import tree_sitter as ts
-import tree_sitter_java
 from git import Repo
-from sequoia_diff import loaders
-from sequoia_diff.matching import generate_mappings
-from sequoia_diff.models import Node
 
 from kai.models.kai_config import SolutionDetectorKind
 from kai.models.util import remove_known_prefixes
+from kai.scm import RepoBlobReader
 from kai.service.incident_store.sql_types import SQLIncident
+from kai.service.solution_handling.line_match import match_file_lines
 
 
 @dataclass
 class SolutionDetectorContext:
+    # The application's open incidents
     old_incidents: list[SQLIncident]
     new_incidents: list[SQLIncident]
     repo: Repo
     old_commit: str
     new_commit: str
+    # Shared with the solution producer so each file is only read once. Closed
+    # by the caller.
+    blob_reader: RepoBlobReader
+    # If given, per-file detection work is spread over this executor. It must
+    # be able to run `match_file_lines`, e.g. a ProcessPoolExecutor.
+    executor: Optional[Executor] = field(default=None)
 
 
 @dataclass
@@ -99,36 +103,6 @@ def line_match_hash(x: SQLIncident) -> int:
     )
 
 
-def node_with_tightest_bounds(node: Node, start_byte: int, end_byte: int) -> Node:
-    """
-    Find the node with the tightest bounds that still contains the given byte
-    range.
-    """
-
-    best = node
-    while True:
-        best.orig_node = cast(ts.Node, best.orig_node)
-        another_iteration = False
-
-        for child in best.children:
-            ts_node = cast(ts.Node, child.orig_node)
-
-            if (
-                ts_node.start_byte > start_byte
-                or ts_node.end_byte < end_byte
-                or ts_node.start_byte < best.orig_node.start_byte
-                or ts_node.end_byte > best.orig_node.end_byte
-            ):
-                continue
-            best = child
-            another_iteration = True
-
-        if not another_iteration:
-            break
-
-    return best
-
-
 def solution_detection_line_match(
     ctx: SolutionDetectorContext,
 ) -> SolutionDetectorResult:
@@ -145,11 +119,11 @@ def solution_detection_line_match(
     3.  Get the smallest node that still contains the line under question.
     4.  Check if the mapping contains the node. If it does, the incident is
         unsolved. If not, it's solved
-    """
-    # TODO: Support multiple languages
-    ts_language = ts.Language(tree_sitter_java.language())
-    parser = ts.Parser(ts_language)
 
+    Steps 2 and 3 share the parsed trees and mapping of each file between all
+    of the file's incidents, and different files are processed on
+    `ctx.executor` if one is given.
+    """
     result = SolutionDetectorResult([], [], [])
     # new_incidents = ctx.new_incidents.copy()
     new_incidents = [x for x in ctx.new_incidents]
@@ -187,73 +161,71 @@ def solution_detection_line_match(
     for x in naive_old_incidents.values():
         line_match_old_incidents[line_match_hash(x)].add(x)
 
-    # Check each remaining incident in new_incidents
+    # Check each remaining incident in new_incidents. Incidents that share a
+    # line match hash also share a file, so grouping them by file keeps the
+    # order in which they claim old incidents the same.
 
-    for incident in new_incidents:
-        incident_line_match_hash = line_match_hash(incident)
+    pending_by_file: dict[str, list[SQLIncident]] = defaultdict(list)
 
+    for incident in new_incidents:
         # Check if the incident is in the remaining old incidents. If not, then
         # it's a new incident.
 
-        if incident_line_match_hash not in line_match_old_incidents:
+        if line_match_hash(incident) not in line_match_old_incidents:
             result.new.append(incident)
             continue
-        if len(line_match_old_incidents[incident_line_match_hash]) == 0:
-            result.new.append(incident)
-            del line_match_old_incidents[incident_line_match_hash]
-            continue
-
-        # Construct the trees for the old and new files
 
         # NOTE: Both file paths should be the same, but just in case we might
         # want to use the old file path.
 
-        file_path = os.path.join(
-            cast(str, ctx.repo.working_tree_dir),
-            remove_known_prefixes(unquote(urlparse(incident.incident_uri).path)),
-        )
-
-        # TODO: See if we should cache these files/trees for performance
-
-        old_file: str = ctx.repo.git.show(f"{ctx.old_commit}:{file_path}")
-        new_file: str = ctx.repo.git.show(f"{ctx.new_commit}:{file_path}")
-
-        old_tree = parser.parse(bytes(old_file, "utf-8"))
-        new_tree = parser.parse(bytes(new_file, "utf-8"))
+        file_path = remove_known_prefixes(unquote(urlparse(incident.incident_uri).path))
+        pending_by_file[file_path].append(incident)
 
-        old_node = loaders.from_tree_sitter_tree(old_tree, "java")
-        new_node = loaders.from_tree_sitter_tree(new_tree, "java")
+    # Files are read here since the blob reader can't be shared with other
+    # processes. Only the contents and line numbers are sent to the workers.
 
-        # Get the byte offsets for the incident line
+    file_groups = list(pending_by_file.items())
 
-        old_line_start_byte = 0
-        old_line_end_byte = 0
-        for _ in range(incident.incident_line + 1):
-            old_line_start_byte = old_file.find("\n", old_line_start_byte) + 1
-            old_line_end_byte = old_file.find("\n", old_line_start_byte)
+    old_files = [
+        ctx.blob_reader.file_contents(ctx.old_commit, file_path) or ""
+        for file_path, _ in file_groups
+    ]
+    new_files = [
+        ctx.blob_reader.file_contents(ctx.new_commit, file_path) or ""
+        for file_path, _ in file_groups
+    ]
+    lines = [[x.incident_line for x in incidents] for _, incidents in file_groups]
 
-        # Get the node with the tightest bounds
-
-        best = node_with_tightest_bounds(
-            old_node, old_line_start_byte, old_line_end_byte
+    if ctx.executor is not None and len(file_groups) > 1:
+        mapped_lines = list(
+            ctx.executor.map(match_file_lines, old_files, new_files, lines)
         )
+    else:
+        mapped_lines = list(map(match_file_lines, old_files, new_files, lines))
 
-        # Get the mappings from old_tree to new_tree
+    # Assign old incidents in order. This happens here rather than in the
+    # workers so that unsolved incidents are the objects from old_incidents.
 
-        mappings = generate_mappings(old_node, new_node)
+    for (_, incidents), mapped in zip(file_groups, mapped_lines):
+        for incident, is_mapped in zip(incidents, mapped):
+            incident_line_match_hash = line_match_hash(incident)
 
-        if best not in mappings.src_to_dst:
-            result.new.append(incident)
-            continue
+            if len(line_match_old_incidents[incident_line_match_hash]) == 0:
+                result.new.append(incident)
+                continue
+
+            if not is_mapped:
+                result.new.append(incident)
+                continue
 
-        # NOTE: Right now we're just assuming that if the mapping algorithm
-        # successfully finds a mapping, then the incident is unsolved. This is a
-        # very naive approach and should be improved in the future. Some static
-        # analysis may be required.
+            # NOTE: Right now we're just assuming that if the mapping algorithm
+            # successfully finds a mapping, then the incident is unsolved. This
+            # is a very naive approach and should be improved in the future.
+            # Some static analysis may be required.
 
-        old_incident = line_match_old_incidents[incident_line_match_hash].pop()
-        old_incident.incident_line = incident.incident_line
-        result.unsolved.append(old_incident)
+            old_incident = line_match_old_incidents[incident_line_match_hash].pop()
+            old_incident.incident_line = incident.incident_line
+            result.unsolved.append(old_incident)
 
     # These are the incidents that weren't matched to any incident in
     # new_incidents, meaning they were solved.
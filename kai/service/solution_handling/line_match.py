@@ -0,0 +1,105 @@
+"""
+Per-file work for line-match solution detection. This module deliberately
+doesn't import the rest of kai so that it is cheap to load in the worker
+processes that `solution_detection_line_match` may hand files to.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import cast
+
+import tree_sitter as ts
+import tree_sitter_java
+from sequoia_diff import loaders
+from sequoia_diff.matching import generate_mappings
+from sequoia_diff.models import MappingDict, Node
+
+
+def node_with_tightest_bounds(node: Node, start_byte: int, end_byte: int) -> Node:
+    """
+    Find the node with the tightest bounds that still contains the given byte
+    range.
+    """
+
+    best = node
+    while True:
+        best.orig_node = cast(ts.Node, best.orig_node)
+        another_iteration = False
+
+        for child in best.children:
+            ts_node = cast(ts.Node, child.orig_node)
+
+            if (
+                ts_node.start_byte > start_byte
+                or ts_node.end_byte < end_byte
+                or ts_node.start_byte < best.orig_node.start_byte
+                or ts_node.end_byte > best.orig_node.end_byte
+            ):
+                continue
+            best = child
+            another_iteration = True
+
+        if not another_iteration:
+            break
+
+    return best
+
+
+@dataclass
+class FileMatch:
+    """
+    The parsed old version of a file, the offsets of its lines, and the mapping
+    from its AST to the AST of the new version. Computed once per file and
+    shared by all of the file's incidents.
+    """
+
+    old_node: Node
+    # Byte offset of every newline in the old file
+    old_newlines: list[int]
+    mappings: MappingDict
+
+    @staticmethod
+    def from_files(parser: ts.Parser, old_file: str, new_file: str) -> "FileMatch":
+        old_bytes = bytes(old_file, "utf-8")
+
+        old_node = loaders.from_tree_sitter_tree(parser.parse(old_bytes), "java")
+        new_node = loaders.from_tree_sitter_tree(
+            parser.parse(bytes(new_file, "utf-8")), "java"
+        )
+
+        return FileMatch(
+            old_node=old_node,
+            old_newlines=[m.start() for m in re.finditer(b"\n", old_bytes)],
+            mappings=generate_mappings(old_node, new_node),
+        )
+
+    def old_line_bytes(self, line: int) -> tuple[int, int]:
+        """
+        Returns the (start, end) byte offsets of the incident line in the old
+        file. The end is -1 if the line is not terminated by a newline.
+        """
+        start = self.old_newlines[line] + 1 if line < len(self.old_newlines) else 0
+        end = self.old_newlines[line + 1] if line + 1 < len(self.old_newlines) else -1
+
+        return start, end
+
+    def maps_line(self, line: int) -> bool:
+        """
+        Whether the smallest node containing the incident line in the old file
+        has a counterpart in the new file.
+        """
+        best = node_with_tightest_bounds(self.old_node, *self.old_line_bytes(line))
+
+        return best in self.mappings.src_to_dst
+
+
+def match_file_lines(old_file: str, new_file: str, lines: list[int]) -> list[bool]:
+    """
+    Runs `FileMatch.maps_line` for each of the given incident lines of one file.
+    Only takes and returns plain values so it can run in another process.
+    """
+    # TODO: Support multiple languages
+    parser = ts.Parser(ts.Language(tree_sitter_java.language()))
+    file_match = FileMatch.from_files(parser, old_file, new_file)
+
+    return [file_match.maps_line(line) for line in lines]
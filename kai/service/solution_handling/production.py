@@ -2,37 +2,51 @@ import os
 from abc import ABC, abstractmethod
 from urllib.parse import unquote, urlparse
 
-import jinja2
 from git import Repo
 
 from kai.constants import PATH_TEMPLATES
 from kai.models.file_solution import guess_language
 from kai.models.kai_config import SolutionProducerKind
 from kai.models.util import remove_known_prefixes
-from kai.service.incident_store.incident_store import SQLIncident
+from kai.scm import RepoBlobReader
+from kai.service.incident_store.sql_types import SQLIncident
 from kai.service.llm_interfacing.model_provider import ModelProvider
 from kai.service.solution_handling.solution_types import Solution
+from kai.template_registry import TEMPLATE_REGISTRY
 
 
 class SolutionProducer(ABC):
     @abstractmethod
     def produce_one(
-        self, incident: SQLIncident, repo: Repo, old_commit: str, new_commit: str
+        self,
+        incident: SQLIncident,
+        repo: Repo,
+        old_commit: str,
+        new_commit: str,
+        blob_reader: RepoBlobReader,
     ) -> Solution:
         """
         Creates a single solution for a single incident. Designed to be called
         right before inserting it into the store.
+
+        Files are read through `blob_reader`, which is shared with the other
+        incidents of the same report and closed by the caller.
         """
         pass
 
     def produce_many(
-        self, incidents: list[SQLIncident], repo: Repo, old_commit: str, new_commit: str
+        self,
+        incidents: list[SQLIncident],
+        repo: Repo,
+        old_commit: str,
+        new_commit: str,
+        blob_reader: RepoBlobReader,
     ) -> list[Solution]:
         """
         See `produce_one`.
         """
         return [
-            self.produce_one(incident, repo, old_commit, new_commit)
+            self.produce_one(incident, repo, old_commit, new_commit, blob_reader)
             for incident in incidents
         ]
 
@@ -60,47 +74,32 @@ class SolutionProducer(ABC):
             for incident, solution in zip(incidents, solutions)
         ]
 
+    def needs_post_processing(self, solution: Solution) -> bool:
+        """
+        Whether `post_process_one` would do any work for this solution. Lets
+        the store skip queueing solutions that are already complete.
+        """
+        return False
+
 
 class SolutionProducerTextOnly(SolutionProducer):
     def produce_one(
-        self, incident: SQLIncident, repo: Repo, old_commit: str, new_commit: str
+        self,
+        incident: SQLIncident,
+        repo: Repo,
+        old_commit: str,
+        new_commit: str,
+        blob_reader: RepoBlobReader,
     ) -> Solution:
         local_file_path = remove_known_prefixes(
             unquote(urlparse(incident.incident_uri).path)
         )
-        file_path = os.path.join(
-            repo.working_tree_dir,
-            local_file_path,
-        )
 
         # NOTE: `repo_diff` functionality is not implemented
 
-        # TODO: Some of the sample repos have invalid utf-8 characters,
-        # thus the encode-then-decode hack. Not very performant, there's
-        # probably a better way to handle this.
-        try:
-            original_code = (
-                repo.git.show(f"{old_commit}:{local_file_path}")
-                .encode("utf-8")
-                .decode("utf-8")
-            )
-        except Exception:
-            original_code = ""
-
-        try:
-            updated_code = (
-                repo.git.show(f"{new_commit}:{local_file_path}")
-                .encode("utf-8")
-                .decode("utf-8")
-            )
-        except Exception:
-            updated_code = ""
-
-        file_diff = (
-            repo.git.diff(old_commit, new_commit, "--", file_path)
-            .encode("utf-8", errors="ignore")
-            .decode()
-        )
+        original_code = blob_reader.file_contents(old_commit, local_file_path) or ""
+        updated_code = blob_reader.file_contents(new_commit, local_file_path) or ""
+        file_diff = blob_reader.file_diff(old_commit, new_commit, local_file_path)
 
         return Solution(
             uri=incident.incident_uri,
@@ -119,32 +118,34 @@ class SolutionProducerLLMLazy(SolutionProducer):
         self.text_only = SolutionProducerTextOnly()
 
     def produce_one(
-        self, incident: SQLIncident, repo: Repo, old_commit: str, new_commit: str
+        self,
+        incident: SQLIncident,
+        repo: Repo,
+        old_commit: str,
+        new_commit: str,
+        blob_reader: RepoBlobReader,
     ) -> Solution:
-        solution = self.text_only.produce_one(incident, repo, old_commit, new_commit)
+        solution = self.text_only.produce_one(
+            incident, repo, old_commit, new_commit, blob_reader
+        )
 
         solution.llm_summary_generated = False
 
         return solution
 
+    def needs_post_processing(self, solution: Solution) -> bool:
+        return solution.llm_summary_generated is False
+
     def post_process_one(self, incident: SQLIncident, solution: Solution) -> Solution:
         if solution.llm_summary_generated:
             return solution
 
         # Generate the LLM summary to be stored in the solution
 
-        jinja_env = jinja2.Environment(
-            loader=jinja2.FileSystemLoader(
-                os.path.join(PATH_TEMPLATES, "solution_handling")
-            ),
-            undefined=jinja2.StrictUndefined,
-            trim_blocks=True,
-            lstrip_blocks=True,
-            autoescape=True,
+        template = TEMPLATE_REGISTRY.get_template(
+            os.path.join(PATH_TEMPLATES, "solution_handling"), "generation.jinja"
         )
 
-        template = jinja_env.get_template("generation.jinja")
-
         # get just the file name and extension from solution.uri
         rendered_template = template.render(
             model_provider=self.model_provider,
@@ -164,7 +165,7 @@ class SolutionProducerLLMLazy(SolutionProducer):
             sln_file_contents=solution.updated_code,
         )
 
-        llm_result = self.model_provider.llm.invoke(rendered_template)
+        llm_result = self.model_provider.invoke(rendered_template)
 
         # TODO: Parse LLM result. For now, just returning the content fully
 
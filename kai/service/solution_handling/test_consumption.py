@@ -3,10 +3,12 @@ from unittest.mock import MagicMock, patch
 
 import jinja2
 
+from kai.models.kai_config import SolutionConsumerKind
 from kai.service.solution_handling.consumption import (
     solution_consumer_before_and_after,
     solution_consumer_diff_only,
     solution_consumer_factory,
+    solution_consumer_fields,
     solution_consumer_llm_summary,
 )
 from kai.service.solution_handling.solution_types import Solution
@@ -91,6 +93,19 @@ class TestSolutionConsumers(unittest.TestCase):
             solution_consumer_factory("invalid_kind")
         self.assertTrue("Unknown solution consumer kind" in str(context.exception))
 
+    def test_solution_consumer_fields(self):
+        self.assertEqual(solution_consumer_fields("diff_only"), {"file_diff"})
+        self.assertEqual(solution_consumer_fields("llm_summary"), set())
+        self.assertEqual(
+            solution_consumer_fields(["diff_only", "before_and_after"]),
+            {"file_diff", "original_code", "updated_code"},
+        )
+        self.assertIsNone(solution_consumer_fields(["diff_only", "invalid_kind"]))
+
+        # Every consumer's fields are known, so none loads every field
+        for kind in SolutionConsumerKind:
+            self.assertIsNotNone(solution_consumer_fields(kind), kind)
+
     def test_solution_consumer_diff_only_empty_solution(self):
         empty_solution = MagicMock(spec=Solution)
         empty_solution.file_diff = ""
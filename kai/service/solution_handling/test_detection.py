@@ -1,19 +1,56 @@
+import multiprocessing
 import os
 import unittest
-from unittest.mock import MagicMock, create_autospec
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import MagicMock, create_autospec, patch
 
 import tree_sitter as ts
+import tree_sitter_java
 import yaml
 from sequoia_diff.models import Node
 
 from kai.constants import PATH_TEST_DATA
+from kai.scm import RepoBlobReader
 from kai.service.incident_store.sql_types import SQLIncident
+from kai.service.solution_handling import line_match
 from kai.service.solution_handling.detection import (
     SolutionDetectorContext,
-    node_with_tightest_bounds,
     solution_detection_line_match,
     solution_detection_naive,
 )
+from kai.service.solution_handling.line_match import (
+    FileMatch,
+    node_with_tightest_bounds,
+)
+
+LINE_MATCH_SIMPLE_DIR = os.path.join(
+    PATH_TEST_DATA, "test_detection", "test_line_match_simple"
+)
+
+
+def read_line_match_simple(*args) -> tuple[str, str, int, bytes]:
+    """
+    Stands in for `Git.get_object_data`. Reads "<commit>:<path>" from
+    "<commit>_<path>" in the test_line_match_simple directory.
+    """
+    commit, file_path = args[0].split(":")
+
+    with open(os.path.join(LINE_MATCH_SIMPLE_DIR, f"{commit}_{file_path}"), "rb") as f:
+        data = f.read()
+        return ("", "blob", len(data), data)
+
+
+def line_match_incident(uri: str, line: int) -> SQLIncident:
+    return SQLIncident(
+        violation_name="test_violation",
+        ruleset_name="test_ruleset",
+        application_name="test_application",
+        incident_uri=uri,
+        incident_message="Test incident message",
+        incident_snip="",
+        incident_line=line,
+        incident_variables={},
+    )
 
 
 class TestDetection(unittest.TestCase):
@@ -77,7 +114,14 @@ class TestDetection(unittest.TestCase):
         ]
 
         result = solution_detection_naive(
-            SolutionDetectorContext(db_incidents, report_incidents, MagicMock(), "", "")
+            SolutionDetectorContext(
+                db_incidents,
+                report_incidents,
+                MagicMock(),
+                "",
+                "",
+                MagicMock(spec=RepoBlobReader),
+            )
         )
 
         self.assertTrue(len(result.new) == 1)
@@ -90,17 +134,22 @@ class TestDetection(unittest.TestCase):
         self.assertTrue(report_incidents[1] == result.new[0])
 
     def test_line_match_simple(self):
-        def local_read(*args) -> str:
+        working_tree_dir = os.path.join(
+            PATH_TEST_DATA, "test_detection", "test_line_match_simple"
+        )
+
+        def local_read(*args) -> tuple[str, str, int, bytes]:
             sections = args[0].split(":")
             stuff = sections[0]
-            file_path = sections[1]
+            file_path = os.path.join(working_tree_dir, sections[1])
             dirname = os.path.dirname(os.path.realpath(file_path))
             basename = os.path.basename(file_path)
 
             file_name = os.path.join(dirname, f"{stuff}_{basename}")
 
-            with open(file_name, "r") as file:
-                return file.read()
+            with open(file_name, "rb") as file:
+                data = file.read()
+                return ("", "blob", len(data), data)
 
         def local_yaml(file_path: str) -> dict | list:
             with open(
@@ -115,10 +164,8 @@ class TestDetection(unittest.TestCase):
                 return yaml.safe_load(file)
 
         mock_repo = MagicMock()
-        mock_repo.git.show.side_effect = local_read
-        mock_repo.working_tree_dir = os.path.join(
-            PATH_TEST_DATA, "test_detection", "test_line_match_simple"
-        )
+        mock_repo.git.get_object_data.side_effect = local_read
+        mock_repo.working_tree_dir = working_tree_dir
 
         old_commit = "old"
         new_commit = "new"
@@ -126,7 +173,9 @@ class TestDetection(unittest.TestCase):
         # No incidents, no changes
 
         result = solution_detection_line_match(
-            SolutionDetectorContext([], [], mock_repo, old_commit, new_commit)
+            SolutionDetectorContext(
+                [], [], mock_repo, old_commit, new_commit, RepoBlobReader(mock_repo)
+            )
         )
 
         self.assertEqual(result.new, [], "Failed no incidents no changes")
@@ -140,7 +189,12 @@ class TestDetection(unittest.TestCase):
 
         result = solution_detection_line_match(
             SolutionDetectorContext(
-                old_incidents, new_incidents, mock_repo, old_commit, new_commit
+                old_incidents,
+                new_incidents,
+                mock_repo,
+                old_commit,
+                new_commit,
+                RepoBlobReader(mock_repo),
             )
         )
 
@@ -159,7 +213,12 @@ class TestDetection(unittest.TestCase):
 
         result = solution_detection_line_match(
             SolutionDetectorContext(
-                old_incidents, new_incidents, mock_repo, old_commit, new_commit
+                old_incidents,
+                new_incidents,
+                mock_repo,
+                old_commit,
+                new_commit,
+                RepoBlobReader(mock_repo),
             )
         )
 
@@ -178,7 +237,12 @@ class TestDetection(unittest.TestCase):
 
         result = solution_detection_line_match(
             SolutionDetectorContext(
-                old_incidents, new_incidents, mock_repo, old_commit, new_commit
+                old_incidents,
+                new_incidents,
+                mock_repo,
+                old_commit,
+                new_commit,
+                RepoBlobReader(mock_repo),
             )
         )
 
@@ -186,6 +250,112 @@ class TestDetection(unittest.TestCase):
         self.assertEqual(result.unsolved, old_incidents, "Failed added whitespace")
         self.assertEqual(result.solved, [], "Failed added whitespace")
 
+    def test_line_match_maps_each_file_once(self):
+        mock_repo = MagicMock()
+        mock_repo.git.get_object_data.side_effect = read_line_match_simple
+
+        old_incidents = [
+            line_match_incident("added_whitespace.java", 3),
+            line_match_incident("added_whitespace.java", 4),
+        ]
+        new_incidents = [
+            line_match_incident("added_whitespace.java", 5),
+            line_match_incident("added_whitespace.java", 10),
+        ]
+
+        with patch.object(
+            line_match, "generate_mappings", wraps=line_match.generate_mappings
+        ) as mock_generate_mappings:
+            result = solution_detection_line_match(
+                SolutionDetectorContext(
+                    old_incidents,
+                    new_incidents,
+                    mock_repo,
+                    "old",
+                    "new",
+                    RepoBlobReader(mock_repo),
+                )
+            )
+
+        mock_generate_mappings.assert_called_once()
+        self.assertEqual(mock_repo.git.get_object_data.call_count, 2)
+
+        self.assertEqual(result.new, [])
+        self.assertCountEqual(result.unsolved, old_incidents)
+        self.assertEqual(result.solved, [])
+        self.assertCountEqual([x.incident_line for x in result.unsolved], [5, 10])
+
+    def test_line_match_executor(self):
+        mock_repo = MagicMock()
+        mock_repo.git.get_object_data.side_effect = read_line_match_simple
+
+        old_incidents = [
+            line_match_incident("added_whitespace.java", 3),
+            line_match_incident("exact_matches.java", 2),
+        ]
+        new_incidents = [
+            line_match_incident("added_whitespace.java", 5),
+            line_match_incident("exact_matches.java", 3),
+        ]
+
+        with ProcessPoolExecutor(
+            max_workers=2, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            result = solution_detection_line_match(
+                SolutionDetectorContext(
+                    old_incidents,
+                    new_incidents,
+                    mock_repo,
+                    "old",
+                    "new",
+                    RepoBlobReader(mock_repo),
+                    executor=executor,
+                )
+            )
+
+        serial_result = solution_detection_line_match(
+            SolutionDetectorContext(
+                [
+                    line_match_incident("added_whitespace.java", 3),
+                    line_match_incident("exact_matches.java", 2),
+                ],
+                new_incidents,
+                mock_repo,
+                "old",
+                "new",
+                RepoBlobReader(mock_repo),
+            )
+        )
+
+        # Unsolved incidents must be the old incidents themselves
+        for x in result.unsolved:
+            self.assertTrue(any(x is y for y in old_incidents))
+
+        self.assertEqual(len(result.new), len(serial_result.new))
+        self.assertEqual(len(result.solved), len(serial_result.solved))
+        self.assertEqual(
+            sorted((x.incident_uri, x.incident_line) for x in result.unsolved),
+            sorted((x.incident_uri, x.incident_line) for x in serial_result.unsolved),
+        )
+
+
+class TestFileMatch(unittest.TestCase):
+    def test_old_line_bytes(self):
+        file_match = FileMatch(
+            old_node=MagicMock(), old_newlines=[3, 8, 12], mappings=MagicMock()
+        )
+
+        self.assertEqual(file_match.old_line_bytes(0), (4, 8))
+        self.assertEqual(file_match.old_line_bytes(1), (9, 12))
+        self.assertEqual(file_match.old_line_bytes(2), (13, -1))
+        self.assertEqual(file_match.old_line_bytes(3), (0, -1))
+
+    def test_newlines_are_byte_offsets(self):
+        parser = ts.Parser(ts.Language(tree_sitter_java.language()))
+        file_match = FileMatch.from_files(parser, "// é\nclass A {}\n", "")
+
+        self.assertEqual(file_match.old_newlines, [5, 16])
+
 
 class TestNodeWithTightestBounds(unittest.TestCase):
     def setUp(self):
@@ -3,6 +3,7 @@ from unittest.mock import MagicMock, patch
 
 from git import Repo
 
+from kai.scm import RepoBlobReader
 from kai.service.incident_store.sql_types import SQLIncident
 from kai.service.llm_interfacing.model_provider import ModelProvider
 from kai.service.solution_handling.production import (
@@ -32,7 +33,10 @@ class TestSolutionProducerTextOnly(unittest.TestCase):
     def test_produce_one(self):
         # Arrange
         repo = MagicMock(spec=Repo)
-        repo.git.show.side_effect = ["original code", "updated code"]
+        repo.git.get_object_data.side_effect = [
+            ("", "blob", 13, b"original code"),
+            ("", "blob", 12, b"updated code"),
+        ]
         repo.git.diff.return_value = "diff"
 
         incident = create_test_incident()
@@ -43,7 +47,10 @@ class TestSolutionProducerTextOnly(unittest.TestCase):
         new_commit = "cafefeed"
 
         # Act
-        solution = solution_producer.produce_one(incident, repo, old_commit, new_commit)
+        with RepoBlobReader(repo) as blob_reader:
+            solution = solution_producer.produce_one(
+                incident, repo, old_commit, new_commit, blob_reader
+            )
 
         # Assert
         self.assertEqual(solution.uri, incident.incident_uri)
@@ -74,7 +81,10 @@ class TestSolutionProducerLLMLazy(unittest.TestCase):
     def test_produce_one(self):
         # Arrange
         repo = MagicMock(spec=Repo)
-        repo.git.show.side_effect = ["original code", "updated code"]
+        repo.git.get_object_data.side_effect = [
+            ("", "blob", 13, b"original code"),
+            ("", "blob", 12, b"updated code"),
+        ]
         repo.git.diff.return_value = "diff"
 
         incident = create_test_incident()
@@ -86,13 +96,16 @@ class TestSolutionProducerLLMLazy(unittest.TestCase):
         new_commit = "cafefeed"
 
         # Act
-        solution = solution_producer.produce_one(incident, repo, old_commit, new_commit)
+        with RepoBlobReader(repo) as blob_reader:
+            solution = solution_producer.produce_one(
+                incident, repo, old_commit, new_commit, blob_reader
+            )
 
         # Assert
         self.assertEqual(solution.llm_summary_generated, False)
 
-    @patch("kai.service.solution_handling.production.jinja2.Environment")
-    def test_post_process_one(self, mock_jinja_env):
+    @patch("kai.service.solution_handling.production.TEMPLATE_REGISTRY")
+    def test_post_process_one(self, mock_template_registry):
         # Arrange
         incident = create_test_incident()
         solution = Solution(
@@ -102,11 +115,11 @@ class TestSolutionProducerLLMLazy(unittest.TestCase):
             updated_code="updated code",
         )
 
-        mock_template = mock_jinja_env.return_value.get_template.return_value
+        mock_template = mock_template_registry.get_template.return_value
         mock_template.render.return_value = "rendered template"
 
         model_provider = MagicMock()
-        model_provider.llm.invoke.return_value.content = "LLM summary"
+        model_provider.invoke.return_value.content = "LLM summary"
         solution_producer = SolutionProducerLLMLazy(model_provider=model_provider)
 
         # Act
@@ -114,5 +127,5 @@ class TestSolutionProducerLLMLazy(unittest.TestCase):
 
         # Assert
         self.assertEqual(processed_solution.llm_summary, "LLM summary")
-        model_provider.llm.invoke.assert_called_with("rendered template")
+        model_provider.invoke.assert_called_with("rendered template")
         self.assertTrue(processed_solution.llm_summary_generated)
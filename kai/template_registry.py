@@ -0,0 +1,99 @@
+import logging
+import os
+import threading
+from typing import Any
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, Template
+
+KAI_LOG = logging.getLogger(__name__)
+
+# The environment options every Kai template is rendered with, unless
+# overridden
+DEFAULT_TEMPLATE_OPTIONS: dict[str, Any] = {
+    "undefined": StrictUndefined,
+    "trim_blocks": True,
+    "lstrip_blocks": True,
+    "autoescape": True,
+}
+
+
+class TemplateRegistry:
+    """
+    Process-wide cache of Jinja environments, one per template directory and
+    set of environment options. Each environment keeps every template it has
+    compiled, so a template is read from disk and compiled once rather than on
+    every render.
+
+    If `auto_reload` is set, the template file's mtime is checked whenever a
+    template is requested and the template is recompiled if it changed. This
+    is what you want during development; turn it off to skip the check.
+    """
+
+    def __init__(self, auto_reload: bool = True):
+        self._auto_reload = auto_reload
+        self._environments: dict[tuple, Environment] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def auto_reload(self) -> bool:
+        return self._auto_reload
+
+    @auto_reload.setter
+    def auto_reload(self, value: bool):
+        with self._lock:
+            self._auto_reload = value
+            for environment in self._environments.values():
+                environment.auto_reload = value
+
+    def environment(self, directory: str, **options: Any) -> Environment:
+        """
+        Returns the environment loading templates from `directory`. `options`
+        are passed to `jinja2.Environment` on top of `DEFAULT_TEMPLATE_OPTIONS`
+        and must be hashable.
+        """
+        options = {**DEFAULT_TEMPLATE_OPTIONS, **options}
+        key = (os.path.realpath(directory), tuple(sorted(options.items())))
+
+        with self._lock:
+            environment = self._environments.get(key)
+
+            if environment is None:
+                # trunk-ignore-begin(bandit/B701)
+                environment = Environment(
+                    loader=FileSystemLoader(key[0]),
+                    auto_reload=self._auto_reload,
+                    # Never evict compiled templates
+                    cache_size=-1,
+                    **options,
+                )
+                # trunk-ignore-end(bandit/B701)
+
+                self._environments[key] = environment
+
+        return environment
+
+    def get_template(self, directory: str, name: str, **options: Any) -> Template:
+        return self.environment(directory, **options).get_template(name)
+
+    def precompile(self, directory: str, **options: Any) -> int:
+        """
+        Compiles every `.jinja` template under `directory` ahead of time, so
+        that the first requests don't pay for it. Returns how many templates
+        were compiled.
+        """
+        environment = self.environment(directory, **options)
+        names = environment.list_templates(extensions=["jinja"])
+
+        for name in names:
+            environment.get_template(name)
+
+        KAI_LOG.debug(f"Precompiled {len(names)} templates in {directory}")
+
+        return len(names)
+
+    def clear(self):
+        with self._lock:
+            self._environments.clear()
+
+
+TEMPLATE_REGISTRY = TemplateRegistry()
@@ -0,0 +1,66 @@
+import unittest
+from unittest.mock import patch
+
+from kai.models import file_solution
+from kai.models.file_solution import guess_language, parse_file_solution_content
+
+
+class TestGuessLanguage(unittest.TestCase):
+    def setUp(self):
+        file_solution._language_cache.clear()
+
+    @patch("kai.models.file_solution.lexers.guess_lexer_for_filename")
+    def test_known_extensions(self, mock_guess_lexer_for_filename):
+        self.assertEqual(guess_language("class A {}", "src/A.java"), "java")
+        self.assertEqual(guess_language("<project/>", "pom.xml"), "xml")
+        self.assertEqual(guess_language("a=b", "app.PROPERTIES"), "properties")
+
+        mock_guess_lexer_for_filename.assert_not_called()
+
+    def test_falls_back_to_pygments(self):
+        self.assertEqual(guess_language("SELECT 1;", "query.sql"), "tsql")
+        self.assertEqual(guess_language("#!/usr/bin/env python\nprint(1)\n"), "python")
+        self.assertEqual(guess_language("", "no_such.extension"), "unknown")
+
+    @patch("kai.models.file_solution.lexers.guess_lexer")
+    def test_cache(self, mock_guess_lexer):
+        mock_guess_lexer.return_value.aliases = ["python"]
+
+        self.assertEqual(guess_language("print(1)"), "python")
+        self.assertEqual(guess_language("print(1)"), "python")
+        mock_guess_lexer.assert_called_once()
+
+        with patch("kai.models.file_solution.LANGUAGE_CACHE_SIZE", 1):
+            guess_language("print(2)")
+            guess_language("print(1)")
+
+        self.assertEqual(mock_guess_lexer.call_count, 3)
+
+
+class TestParseFileSolutionContent(unittest.TestCase):
+    @patch("kai.models.file_solution.guess_language")
+    def test_fence_info_string(self, mock_guess_language):
+        content = (
+            "## Reasoning\nBecause.\n\n"
+            "## Updated File\n"
+            "```xml\n<dependency/>\n```\n"
+            "```java\nclass A {}\n```\n"
+            "## Additional Information\nNone.\n"
+        )
+
+        result = parse_file_solution_content("java", content)
+
+        self.assertEqual(result.updated_file, "class A {}")
+        self.assertEqual(result.reasoning, "Because.")
+        mock_guess_language.assert_not_called()
+
+    def test_no_info_string(self):
+        content = "## Updated File\n```\n#!/usr/bin/env python\nprint(1)\n```\n"
+
+        result = parse_file_solution_content("python", content)
+
+        self.assertEqual(result.updated_file, "#!/usr/bin/env python\nprint(1)")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,14 @@
+import hashlib
 import os
 import pprint
+import tempfile
+import tracemalloc
 import unittest
 
-from kai.models.report import Report
-from kai.models.report_types import ExtendedIncident
+from pydantic import ValidationError
+
+from kai.models.report import Report, iter_report_rulesets
+from kai.models.report_types import ExtendedIncident, ReportIncident, RuleSet
 
 
 class TestReports(unittest.TestCase):
@@ -39,6 +44,123 @@ class TestReports(unittest.TestCase):
         self.assertTrue(len(test_entry) == 6)
         self.assertTrue(isinstance(test_entry[0], ExtendedIncident))
 
+    def test_incidents(self):
+        ruleset_dict = {
+            "name": "ruleset",
+            "violations": {
+                "violation": {
+                    "description": "description",
+                    "incidents": [
+                        {
+                            "uri": "file:///src/Main.java",
+                            "message": "message",
+                            "codeSnip": "snip",
+                            "lineNumber": 3,
+                        },
+                        # Coerced like `Incident` would
+                        {
+                            "uri": "file:///src/Main.java",
+                            "message": "m",
+                            "lineNumber": "4",
+                        },
+                    ],
+                }
+            },
+        }
+        report = Report(ruleset_dict, "report_id")
+
+        # Kept apart from the violations, which don't pretend to have none
+        self.assertFalse(
+            hasattr(report["ruleset"].violations["violation"], "incidents")
+        )
+        self.assertEqual(
+            report.violation_incidents("ruleset", "violation"),
+            [
+                ReportIncident("file:///src/Main.java", "message", "snip", 3, {}),
+                ReportIncident("file:///src/Main.java", "m", "", 4, {}),
+            ],
+        )
+        self.assertEqual(
+            report.ruleset_dict("ruleset"),
+            RuleSet.model_validate(ruleset_dict).model_dump(mode="json"),
+        )
+
+        with self.assertRaises(ValidationError):
+            Report({"violations": {"v": {"incidents": [{"uri": "uri"}]}}}, "id")
+
+    def test_incremental(self):
+        report = Report.load_report_from_file(self.get_coolstuff_yaml())
+        incremental_report = Report.load_report_from_file(
+            self.get_coolstuff_yaml(), incremental=True
+        )
+
+        self.assertEqual(
+            {k: incremental_report.ruleset_dict(k) for k in incremental_report},
+            {k: report.ruleset_dict(k) for k in report},
+        )
+
+        with open(self.get_coolstuff_yaml(), "rb") as f:
+            self.assertEqual(
+                incremental_report.report_id, hashlib.sha256(f.read()).hexdigest()
+            )
+
+    def test_iter_report_rulesets(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            file_name = os.path.join(tmpdir, "output.yaml")
+
+            with open(file_name, "w") as f:
+                f.write(
+                    "# comment\n"
+                    "---\n"
+                    "- name: first\n"
+                    "  description: |-\n"
+                    "    - not an item\n"
+                    "-\n"
+                    "  name: second\n"
+                )
+            self.assertEqual(
+                list(iter_report_rulesets(file_name)),
+                [
+                    {"name": "first", "description": "- not an item"},
+                    {"name": "second"},
+                ],
+            )
+
+            # A single ruleset is parsed in one go
+            with open(file_name, "w") as f:
+                f.write("name: only\nviolations: {}\n")
+            self.assertEqual(
+                list(iter_report_rulesets(file_name)),
+                [{"name": "only", "violations": {}}],
+            )
+
+    def test_iter_report_rulesets_memory(self):
+        def peak_memory(ruleset_count: int) -> int:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                file_name = os.path.join(tmpdir, "output.yaml")
+
+                with open(file_name, "w") as f:
+                    for i in range(ruleset_count):
+                        f.write(f"- name: ruleset-{i}\n  violations:\n    v:\n")
+                        f.write("      incidents:\n")
+                        for j in range(200):
+                            f.write(
+                                f"      - uri: file:///src/File{j}.java\n"
+                                f"        message: message {j}\n"
+                                f"        lineNumber: {j}\n"
+                            )
+
+                tracemalloc.start()
+                try:
+                    for _ in iter_report_rulesets(file_name, hashlib.sha256()):
+                        pass
+                    return tracemalloc.get_traced_memory()[1]
+                finally:
+                    tracemalloc.stop()
+
+        # Peak memory depends on the size of a ruleset, not on their number
+        self.assertLess(peak_memory(40), 2 * peak_memory(10))
+
 
 if __name__ == "__main__":
     unittest.main()
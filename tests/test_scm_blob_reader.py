@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from git import Repo
+
+from kai.scm import RepoBlobReader
+
+
+class TestRepoBlobReader(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.repo_path = tempfile.mkdtemp()
+        self.repo = Repo.init(self.repo_path)
+
+    def tearDown(self):
+        super().tearDown()
+        self.repo.close()
+        shutil.rmtree(self.repo_path)
+
+    def commit_file(self, file_path: str, contents: bytes) -> str:
+        with open(os.path.join(self.repo_path, file_path), "wb") as f:
+            f.write(contents)
+
+        self.repo.index.add([file_path])
+        return self.repo.index.commit(f"Update {file_path}").hexsha
+
+    def test_file_contents(self):
+        old_commit = self.commit_file("Main.java", b"class Main {}\n")
+        new_commit = self.commit_file("Main.java", b"class Main { int x; }\n")
+
+        with RepoBlobReader(self.repo) as reader:
+            self.assertEqual(
+                reader.file_contents(old_commit, "Main.java"), "class Main {}\n"
+            )
+            self.assertEqual(
+                reader.file_contents(new_commit, "Main.java"),
+                "class Main { int x; }\n",
+            )
+            self.assertIsNone(reader.file_contents(new_commit, "Missing.java"))
+
+            diff = reader.file_diff(old_commit, new_commit, "Main.java")
+            self.assertIn("-class Main {}", diff)
+            self.assertIn("+class Main { int x; }", diff)
+
+    def test_invalid_utf8_is_replaced(self):
+        commit = self.commit_file("Main.java", b"// caf\xe9\n")
+
+        with RepoBlobReader(self.repo) as reader:
+            self.assertEqual(reader.file_contents(commit, "Main.java"), "// caf�\n")
+
+    def test_reads_are_memoized(self):
+        old_commit = self.commit_file("Main.java", b"class Main {}\n")
+        new_commit = self.commit_file("Main.java", b"class Main { int x; }\n")
+
+        reader = RepoBlobReader(self.repo)
+        reader.file_contents(old_commit, "Main.java")
+        reader.file_diff(old_commit, new_commit, "Main.java")
+
+        # Rewriting history would change the result if the repo were read again
+        shutil.rmtree(os.path.join(self.repo_path, ".git", "objects"))
+
+        self.assertEqual(
+            reader.file_contents(old_commit, "Main.java"), "class Main {}\n"
+        )
+        self.assertIn(
+            "+class Main { int x; }",
+            reader.file_diff(old_commit, new_commit, "Main.java"),
+        )
+
+        reader.close()
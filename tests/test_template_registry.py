@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+
+from jinja2 import TemplateNotFound
+
+from kai.template_registry import TemplateRegistry
+
+
+class TestTemplateRegistry(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path_templates = self.tmp_dir.name
+
+    def tearDown(self):
+        super().tearDown()
+        self.tmp_dir.cleanup()
+
+    def write_template(self, name: str, contents: str, mtime: float):
+        path = os.path.join(self.path_templates, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(contents)
+        os.utime(path, (mtime, mtime))
+
+    def test_templates_are_compiled_once(self):
+        self.write_template("main.jinja", "Hello {{ name }}", mtime=1000)
+        registry = TemplateRegistry()
+
+        template = registry.get_template(self.path_templates, "main.jinja")
+
+        self.assertEqual(template.render(name="Kai"), "Hello Kai")
+        self.assertIs(
+            registry.get_template(self.path_templates, "main.jinja"), template
+        )
+        self.assertIs(
+            registry.environment(self.path_templates + "/"),
+            registry.environment(self.path_templates),
+        )
+        self.assertIsNot(
+            registry.environment(self.path_templates, autoescape=False),
+            registry.environment(self.path_templates),
+        )
+
+    def test_auto_reload(self):
+        self.write_template("main.jinja", "old", mtime=1000)
+        registry = TemplateRegistry()
+
+        self.assertEqual(
+            registry.get_template(self.path_templates, "main.jinja").render(), "old"
+        )
+
+        self.write_template("main.jinja", "new", mtime=2000)
+        self.assertEqual(
+            registry.get_template(self.path_templates, "main.jinja").render(), "new"
+        )
+
+        registry.auto_reload = False
+        self.write_template("main.jinja", "newer", mtime=3000)
+        self.assertEqual(
+            registry.get_template(self.path_templates, "main.jinja").render(), "new"
+        )
+
+    def test_precompile(self):
+        self.write_template("main.jinja", "main", mtime=1000)
+        self.write_template("sub/other.jinja", "other", mtime=1000)
+        self.write_template("README.md", "not a template", mtime=1000)
+        registry = TemplateRegistry(auto_reload=False)
+
+        self.assertEqual(registry.precompile(self.path_templates), 2)
+
+        # Compiled templates no longer need the files
+        os.remove(os.path.join(self.path_templates, "main.jinja"))
+        self.assertEqual(
+            registry.get_template(self.path_templates, "main.jinja").render(), "main"
+        )
+
+        registry.clear()
+        with self.assertRaises(TemplateNotFound):
+            registry.get_template(self.path_templates, "main.jinja")